@@ -11,10 +11,13 @@ import os
 import asyncio
 import shutil
 import json
+from contextlib import asynccontextmanager
 from datetime import datetime
 from aiogram import Bot
 from config import BOT_TOKEN, ADMINS
 import database as db
+from broadcaster import broadcast_worker
+from segments import segment_refresher
 
 # Backup sozlamalari
 BACKUP_FOLDER = "backups"
@@ -37,8 +40,9 @@ def create_backup():
     backup_filename = f"backup_{timestamp}.db"
     backup_path = os.path.join(BACKUP_FOLDER, backup_filename)
     
-    # Database faylini nusxalash
+    # Database faylini nusxalash (avval WAL jurnalini faylga yozish)
     if os.path.exists(DATABASE_FILE):
+        db.checkpoint()
         shutil.copy2(DATABASE_FILE, backup_path)
         return backup_path
     return None
@@ -57,32 +61,38 @@ def create_json_backup():
     # Barcha ma'lumotlarni olish
     data = {
         "backup_date": timestamp,
-        "users": get_all_users_data(),
+        "users": [],
         "movies": get_all_movies_data(),
         "channels": get_all_channels_data(),
         "statistics": get_statistics_data()
     }
     
+    # Foydalanuvchilar sahifalab yoziladi - ro'yxat xotirada to'liq yig'ilmaydi
+    head, tail = json.dumps(data, ensure_ascii=False, indent=2).split('"users": []', 1)
     with open(backup_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write(head + '"users": [')
+        for i, user in enumerate(iter_users_data()):
+            f.write((',' if i else '') + '\n    ' + json.dumps(user, ensure_ascii=False))
+        f.write('\n  ]' + tail)
     
     return backup_path
 
-def get_all_users_data():
-    """Barcha foydalanuvchilar ma'lumotlarini olish"""
+def iter_users_data(page_size: int = db.USER_PAGE_SIZE):
+    """Foydalanuvchilar ma'lumotlari - users.id bo'yicha sahifalab (keyset)"""
     try:
         conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users")
-        columns = [description[0] for description in cursor.description]
-        users = []
-        for row in cursor.fetchall():
-            users.append(dict(zip(columns, row)))
-        conn.close()
-        return users
+        last_id = 0
+        while True:
+            cursor = conn.execute("SELECT * FROM users WHERE id > ? ORDER BY id LIMIT ?", (last_id, page_size))
+            columns = [description[0] for description in cursor.description]
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield dict(zip(columns, row))
+            last_id = rows[-1]['id']
     except Exception as e:
         print(f"Foydalanuvchilarni olishda xato: {e}")
-        return []
 
 def get_all_movies_data():
     """Barcha kinolar ma'lumotlarini olish"""
@@ -119,9 +129,16 @@ def get_all_channels_data():
 def get_statistics_data():
     """Statistika ma'lumotlarini olish"""
     try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM users")
+        total_users = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM movies")
+        total_movies = cursor.fetchone()[0]
+        conn.close()
         return {
-            "total_users": db.get_users_count(),
-            "total_movies": db.get_movies_count(),
+            "total_users": total_users,
+            "total_movies": total_movies,
             "backup_time": datetime.now().isoformat()
         }
     except Exception as e:
@@ -150,6 +167,29 @@ def get_backup_list():
     backups.sort(key=lambda x: x['created'], reverse=True)
     return backups
 
+@asynccontextmanager
+async def restoring():
+    """Bot ishlayotganda tiklash: fon ishchilari to'xtatiladi, baza eksklyuziv (barcha ulanishlar yopiq),
+    tiklangandan keyin ishchilar qayta ishga tushiriladi"""
+    broadcasting, refreshing = broadcast_worker.running, segment_refresher.running
+    await broadcast_worker.close()
+    await segment_refresher.close()
+    try:
+        async with db.exclusive_access():
+            yield
+    finally:
+        if broadcasting:
+            broadcast_worker.start(broadcast_worker.bot)
+        if refreshing:
+            segment_refresher.start()
+
+
+async def restore_backup(backup_path: str):
+    """Bot ishlayotganda backupdan tiklash (restore_from_backup + restoring)"""
+    async with restoring():
+        return restore_from_backup(backup_path)
+
+
 def restore_from_backup(backup_path: str):
     """
     Backupdan tiklash
@@ -163,6 +203,9 @@ def restore_from_backup(backup_path: str):
             return False, "Backup fayl topilmadi"
         
         if backup_path.endswith('.db'):
+            # Ochiq ulanishlarni yopish - WAL asosiy faylga yoziladi, eski -wal/-shm yangi faylga qo'llanmasin
+            db.release_database_file()
+            
             # Joriy bazani zaxiralash
             if os.path.exists(DATABASE_FILE):
                 timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
@@ -170,6 +213,9 @@ def restore_from_backup(backup_path: str):
             
             # Backupdan tiklash
             shutil.copy2(backup_path, DATABASE_FILE)
+            # Eski backup bo'lsa - yetishmayotgan migratsiyalarni qo'llash
+            db.create_tables()
+            db.reload_caches()
             return True, "Ma'lumotlar muvaffaqiyatli tiklandi!"
         
         elif backup_path.endswith('.json'):
@@ -251,6 +297,8 @@ def restore_from_json(json_path: str):
         
         conn.commit()
         conn.close()
+        # Xotiradagi keshlar (sozlamalar, adminlar, premium, kinolar, kanallar) tiklangan ma'lumotni o'qisin
+        db.reload_caches()
         
         return True, f"✅ Tiklandi!\n👥 {users_restored} foydalanuvchi\n🎬 {movies_restored} kino\n📢 {channels_restored} kanal"
     
@@ -301,8 +349,8 @@ async def send_backup_to_telegram(bot: Bot = None):
         
         # Statistika
         stats = get_backup_stats()
-        users_count = db.get_users_count()
-        movies_count = db.get_movies_count()
+        users_count = await db.get_users_count()
+        movies_count = await db.get_movies_count()
         
         caption = f"""🗄 Avtomatik Backup
 
@@ -380,7 +428,10 @@ if __name__ == "__main__":
             print(message)
         
         elif command == "send":
-            asyncio.run(send_backup_to_telegram())
+            async def send():
+                await send_backup_to_telegram()
+                await db.close_pool()
+            asyncio.run(send())
             print("✅ Backup Telegramga yuborildi!")
         
         else:
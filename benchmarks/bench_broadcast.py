@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Reklama yuborish - bitta foydalanuvchiga sarflanadigan CPU vaqti
+- Eski usul: har bir foydalanuvchi uchun bot.send_*(...) - metod obyekti har safar qurilib tekshiriladi (pydantic)
+- Yangi usul: compile_payload() bir marta, keyin shablonning faqat chat_id si almashadi (model_copy)
+- Tarmoq hisobga olinmaydi: bot.__call__ so'rovni yubormaydi
+
+Ishga tushirish:
+    python benchmarks/bench_broadcast.py [foydalanuvchilar soni]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aiogram import Bot
+from aiogram.types import MessageEntity
+
+import broadcaster
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+TEXT = "🎬 Yangi kinolar qo'shildi! Eng so'nggi premyeralarni birinchi bo'lib ko'ring."
+ENTITIES = [MessageEntity(type='bold', offset=3, length=13), MessageEntity(type='italic', offset=20, length=10)]
+BUTTONS = [{"text": "📺 Kanal", "url": "https://t.me/example"}, {"text": "🤖 Bot", "url": "https://t.me/example_bot"}]
+
+
+class DryBot(Bot):
+    """So'rov yubormaydigan bot - faqat metod obyekti quriladi"""
+
+    async def __call__(self, method, request_timeout=None):
+        return None
+
+
+async def legacy_send_payload(bot, user_id: int, payload: dict, reply_markup=None):
+    """Eski send_payload - har chaqiruvda yangi metod obyekti"""
+    broadcast_type = payload['type']
+    if "photo" in broadcast_type:
+        await bot.send_photo(
+            chat_id=user_id, photo=payload['media_file_id'], caption=payload['text'],
+            caption_entities=payload['entities'], reply_markup=reply_markup
+        )
+    else:
+        await bot.send_message(
+            chat_id=user_id, text=payload['text'], entities=payload['entities'], reply_markup=reply_markup
+        )
+
+
+async def per_user_us(func) -> float:
+    started = time.process_time()
+    for user_id in range(10**9, 10**9 + USERS):
+        await func(user_id)
+    return (time.process_time() - started) / USERS * 1_000_000
+
+
+async def main():
+    bot = DryBot("123456:" + "A" * 35)
+    cases = (
+        ('text + tugmalar', {
+            'broadcast_type': 'text_buttons', 'message_text': TEXT, 'message_entities': ENTITIES,
+            'buttons': BUTTONS, 'source_chat_id': 1, 'source_message_id': 10
+        }),
+        ('photo + tugmalar', {
+            'broadcast_type': 'photo_buttons', 'message_text': TEXT, 'message_entities': ENTITIES,
+            'media_file_id': 'AgACAgIAAxkBAAI' + 'x' * 60, 'buttons': BUTTONS,
+            'source_chat_id': 1, 'source_message_id': 11
+        }),
+    )
+
+    print(f"{'':20}{'eski, us':>12}{'yangi, us':>12}{'tezlashish':>12}")
+    for name, data in cases:
+        # Saqlangan vazifa kabi: JSON dan o'qilgan payload
+        payload = broadcaster.build_payload(data)
+        markup = broadcaster.payload_markup(payload)
+        template = broadcaster.compile_payload(payload)
+
+        before = await per_user_us(lambda user_id: legacy_send_payload(bot, user_id, payload, markup))
+        after = await per_user_us(lambda user_id: broadcaster.send_template(bot, user_id, template))
+        print(f"{name:20}{before:12.2f}{after:12.2f}{before / after:11.1f}x")
+
+    await bot.session.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
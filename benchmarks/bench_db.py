@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Database ulanish benchmarki
+- Eski usul: har chaqiriqda yangi sqlite3 ulanish (rollback jurnal)
+- Yangi usul: doimiy aiosqlite havzasi (WAL + sozlangan PRAGMA)
+- add_view: buferga qo'shish va executemany bilan bitta commitda yozish
+
+Ishga tushirish:
+    python benchmarks/bench_db.py
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+LOOKUPS = 3000
+VIEWS = 500
+
+
+def legacy_get_movie_by_code(path: str, code: str):
+    """Eski get_movie_by_code - har safar yangi ulanish"""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM movies WHERE code = ?', (code,))
+    movie = cursor.fetchone()
+    conn.close()
+    return movie
+
+
+def legacy_add_view(path: str, movie_id: int, user_id: int):
+    """Eski add_view - har safar yangi ulanish va commit"""
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute('INSERT INTO statistics (movie_id, user_id) VALUES (?, ?)', (movie_id, user_id))
+    conn.commit()
+    conn.close()
+
+
+def per_call_us(started: float, count: int) -> float:
+    return (time.perf_counter() - started) / count * 1_000_000
+
+
+def prepare_legacy_db(source: str, path: str):
+    """Xuddi shu sxema va ma'lumotlar bilan eski rejimdagi baza"""
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(path)
+    src.backup(dst)
+    src.close()
+    dst.execute('PRAGMA journal_mode = DELETE')
+    dst.close()
+
+
+async def main():
+    workdir = tempfile.mkdtemp(prefix='kinobot_bench_')
+    os.chdir(workdir)
+    import database as db
+    db.create_tables()
+
+    for i in range(1000):
+        await db.add_movie(str(i), f'Kino {i}', f'file_{i}')
+    db.checkpoint()
+    prepare_legacy_db(db.DATABASE_NAME, 'legacy.db')
+
+    started = time.perf_counter()
+    for i in range(LOOKUPS):
+        legacy_get_movie_by_code('legacy.db', str(i % 1000))
+    legacy_lookup = per_call_us(started, LOOKUPS)
+
+    started = time.perf_counter()
+    for i in range(VIEWS):
+        legacy_add_view('legacy.db', i % 1000, i)
+    legacy_view = per_call_us(started, VIEWS)
+
+    await db.get_movie_by_code('0')  # havzani isitish
+    started = time.perf_counter()
+    for i in range(LOOKUPS):
+        await db.get_movie_by_code(str(i % 1000))
+    pooled_lookup = per_call_us(started, LOOKUPS)
+
+    # add_view endi faqat buferga qo'shadi; yozish vaqti alohida o'lchanadi
+    started = time.perf_counter()
+    for i in range(VIEWS):
+        db.add_view(i % 1000, i)
+    pooled_view = per_call_us(started, VIEWS)
+    await db.view_buffer.flush()
+    buffered_view = per_call_us(started, VIEWS)
+
+    await db.close_pool()
+
+    print(f"{'':22}{'eski, us':>12}{'yangi, us':>12}{'tezlashish':>12}")
+    for name, before, after in (
+        ('get_movie_by_code', legacy_lookup, pooled_lookup),
+        ('add_view', legacy_view, pooled_view),
+        ('add_view + flush', legacy_view, buffered_view),
+    ):
+        print(f"{name:22}{before:12.1f}{after:12.1f}{before / after:11.1f}x")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Klaviaturalar benchmarki
+- Eski usul: har javobda aiogram (pydantic) obyektlarini qaytadan qurish
+- Yangi usul: bayroqlar bo'yicha keshlangan tayyor klaviatura
+
+Ishga tushirish:
+    python benchmarks/bench_keyboards.py
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import keyboards
+
+CALLS = 20000
+
+PERMISSIONS = {
+    'can_stats': 1, 'can_channels': 0, 'can_movies': 1, 'can_broadcast': 1,
+    'can_premium': 0, 'can_admins': 0, 'can_settings': 1
+}
+
+
+def per_call_us(func, *args) -> float:
+    started = time.perf_counter()
+    for _ in range(CALLS):
+        func(*args)
+    return (time.perf_counter() - started) / CALLS * 1_000_000
+
+
+def main():
+    cases = (
+        ('main_menu', keyboards.main_menu_keyboard, (False, True)),
+        ('main_menu_referral', keyboards.main_menu_with_referral_keyboard, (False, True, True)),
+        ('admin_menu', keyboards.admin_menu_keyboard, ()),
+        ('statistics', keyboards.statistics_keyboard, ()),
+        ('admin_menu_dynamic', keyboards._admin_menu_keyboard,
+         (tuple(bool(PERMISSIONS[key]) for key in keyboards.ADMIN_MENU_PERMISSIONS),)),
+    )
+
+    print(f"{'':22}{'eski, us':>12}{'yangi, us':>12}{'tezlashish':>12}")
+    for name, builder, args in cases:
+        # __wrapped__ - keshsiz asl funksiya
+        before = per_call_us(builder.__wrapped__, *args)
+        after = per_call_us(builder, *args)
+        print(f"{name:22}{before:12.2f}{after:12.2f}{before / after:11.1f}x")
+
+    # Ochiq funksiya: dict -> bayroqlar kortej + kesh
+    after = per_call_us(keyboards.admin_menu_keyboard_dynamic, PERMISSIONS)
+    print(f"{'dynamic(dict)':22}{'':12}{after:12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Reklama paytida interaktiv javoblar kechikishi (ratelimit.py yo'laklari)
+- Reklama: BROADCAST_CONCURRENCY ta parallel yuborish, har biri yangi chatga
+- Interaktiv: sekundiga o'rtacha INTERACTIVE_RPS ta javob (kino kodi yuborgan foydalanuvchilar)
+- Telegram o'rniga make_request API_LATENCY kutadi (tarmoq)
+- Uch holat: reklamasiz, bitta yo'lak (eski - hammasi bitta navbatda), ikki yo'lak (reklama - bulk)
+
+Ishga tushirish:
+    python benchmarks/bench_lanes.py [davomiylik, s]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aiogram.methods import SendMessage
+
+from ratelimit import RateLimiter, LaneStats, send_lane, LANE_BULK, LANE_INTERACTIVE
+
+DURATION = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+GLOBAL_RATE = 30
+BROADCAST_CONCURRENCY = 25
+INTERACTIVE_RPS = 5
+API_LATENCY = 0.05
+
+
+async def make_request(bot, method):
+    await asyncio.sleep(API_LATENCY)
+
+
+async def run_case(broadcast: bool, bulk_lane: str) -> tuple:
+    """Foydalanuvchi javoblari kechikishi va reklama tezligi (xabar/s)"""
+    limiter = RateLimiter(GLOBAL_RATE, 1, 20, 60)
+    deadline = time.monotonic() + DURATION
+    chat_ids = iter(range(10**9, 2 * 10**9))
+    replies = LaneStats()
+    sent = [0]
+
+    async def broadcaster():
+        send_lane.set(bulk_lane)
+        while time.monotonic() < deadline:
+            await limiter(make_request, None, SendMessage(chat_id=next(chat_ids), text="reklama"))
+            sent[0] += 1
+
+    async def reply(chat_id: int):
+        started = time.monotonic()
+        await limiter(make_request, None, SendMessage(chat_id=chat_id, text="kino"))
+        replies.record(time.monotonic() - started)
+
+    async def users():
+        rng = random.Random(1)
+        tasks = []
+        while time.monotonic() < deadline:
+            tasks.append(asyncio.create_task(reply(rng.randrange(1, 10**6))))
+            await asyncio.sleep(rng.expovariate(INTERACTIVE_RPS))
+        await asyncio.gather(*tasks)
+
+    tasks = [users()]
+    if broadcast:
+        tasks += [broadcaster() for _ in range(BROADCAST_CONCURRENCY)]
+    await asyncio.gather(*tasks)
+    return replies.stats(), sent[0] / DURATION
+
+
+async def main():
+    cases = (
+        ('reklamasiz', False, LANE_INTERACTIVE),
+        ("bitta yo'lak (eski)", True, LANE_INTERACTIVE),
+        ("ikki yo'lak", True, LANE_BULK),
+    )
+    print(f"{'':22}{'javob p50, ms':>15}{'javob p95, ms':>15}{'reklama, xabar/s':>18}")
+    for name, broadcast, bulk_lane in cases:
+        stats, rate = await run_case(broadcast, bulk_lane)
+        print(f"{name:22}{stats['p50_ms']:15.1f}{stats['p95_ms']:15.1f}{rate:18.1f}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Kino qidiruv benchmarki (100 000 ta nom)
+- Eski usul: title LIKE '%q%' OR code LIKE '%q%' (to'liq jadval skaneri)
+- Yangi usul: FTS5 indeks, bm25 saralash, prefiks qidiruv
+
+Ishga tushirish:
+    python benchmarks/bench_search.py
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MOVIES = 100_000
+ROUNDS = 200
+
+# Haqiqiy o'zbekcha so'zlar + bo'g'inlardan yasalgan lug'at, Zipf taqsimoti bilan
+WORDS = [
+    "o'zbek", "qo'shiq", "g'alaba", "sevgi", "yo'l", "tun", "shahar", "bahor",
+    "qishloq", "do'st", "ona", "yulduz", "dengiz", "tog'", "osmon", "qalb",
+    "sir", "kelin", "qasos", "mehr", "orzu", "vatan", "kuz", "yomg'ir",
+]
+SYLLABLES = ['ba', 'ka', 'lo', 'mi', 'sa', 'to', 'ra', 'na', 'qo', 'yo', 'de', 'shi', 'go', 'zu', 'da', 'ri', 'ol', 'an']
+QUERIES = [
+    "sevgi",            # eng ko'p uchraydigan so'z
+    "g'alaba",
+    "ғалаба",           # kirillcha
+    "qo‘shiq",          # boshqa apostrof
+    "yulduz dengiz",
+    "sev",              # prefiks
+    "kamiri",           # kam uchraydigan so'z
+    "1234",             # kod
+    "topilmadi",        # yo'q so'z
+]
+
+
+def build_vocabulary(rnd):
+    """So'zlar ro'yxati va Zipf og'irliklari"""
+    generated = {
+        ''.join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 3)))
+        for _ in range(8000)
+    }
+    vocabulary = WORDS + sorted(generated - set(WORDS))
+    rnd.shuffle(vocabulary)
+    # "sevgi" eng ko'p uchraydigan so'z bo'lsin
+    vocabulary.remove("sevgi")
+    vocabulary.insert(0, "sevgi")
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    return vocabulary, weights
+
+
+def legacy_search(conn, query: str):
+    """Eski search_movies - LIKE bilan skaner"""
+    return conn.execute('''
+        SELECT * FROM movies
+        WHERE title LIKE ? OR code LIKE ?
+        LIMIT 10
+    ''', (f'%{query}%', f'%{query}%')).fetchall()
+
+
+def per_call_us(started: float, count: int) -> float:
+    return (time.perf_counter() - started) / count * 1_000_000
+
+
+async def main():
+    workdir = tempfile.mkdtemp(prefix='kinobot_bench_')
+    os.chdir(workdir)
+    import database as db
+    import migrations
+    db.create_tables()
+
+    rnd = random.Random(1)
+    vocabulary, weights = build_vocabulary(rnd)
+    conn = db.get_connection()
+    conn.executemany(
+        'INSERT INTO movies (code, title, file_id) VALUES (?, ?, ?)',
+        (
+            (str(i), ' '.join(rnd.choices(vocabulary, weights, k=rnd.randint(2, 4))).capitalize(), f'file_{i}')
+            for i in range(MOVIES)
+        )
+    )
+    migrations.movie_search_index(conn.cursor())
+    conn.commit()
+
+    print(f"{'':18}{'LIKE, us':>12}{'FTS5, us':>12}{'tezlashish':>12}{'natija':>10}")
+    for query in QUERIES:
+        started = time.perf_counter()
+        for _ in range(ROUNDS):
+            legacy_search(conn, query)
+        like_us = per_call_us(started, ROUNDS)
+
+        started = time.perf_counter()
+        for _ in range(ROUNDS):
+            found = await db.search_movies(query)
+        fts_us = per_call_us(started, ROUNDS)
+
+        print(f"{query:18}{like_us:12.1f}{fts_us:12.1f}{like_us / fts_us:11.1f}x{len(found):10}")
+
+    await db.close_pool()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
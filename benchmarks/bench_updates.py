@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Update boshiga DB round-trip lar soni (haqiqiy Dispatcher va routerlar, soxta Telegram sessiyasi)
+- database.connection() chaqiruvlari (round-trip) va keshdan o'qiladigan holat so'rovlari (LOOKUPS) sanaladi
+  (handlerlar import qilinishidan oldin o'raladi)
+- Har bir update turi bir necha marta yuboriladi, o'rtacha qiymat chiqariladi
+- RequestContextMiddleware bo'lsa, uning stats() natijasi ham ko'rsatiladi
+
+Ishga tushirish:
+    python benchmarks/bench_updates.py [takrorlar soni]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+REPEATS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+USER_ID = 555000111
+
+# Middleware update boshiga bir marta yig'adigan holat funksiyalari
+LOOKUPS = (
+    'is_admin', 'get_admin_permissions', 'is_premium_user',
+    'is_subscription_enabled', 'is_premium_enabled', 'is_referral_enabled',
+)
+
+UPDATES = (
+    ('/start', '/start'),
+    ('/start 123 (deep link)', '/start 123'),
+    ('kino kodi', '123'),
+    ('matn qidiruv', 'avatar'),
+    ('asosiy menyu', '🔙 Asosiy menyu'),
+    ('referal menyusi', '💵 Referal - Pul ishlash'),
+)
+
+
+def make_session():
+    """Telegram API ga chiqmaydigan sessiya - har bir metod uchun minimal javob"""
+    from aiogram.client.session.base import BaseSession
+    from aiogram.types import Chat, ChatMemberMember, Message, MessageId, User
+
+    class FakeSession(BaseSession):
+        async def make_request(self, bot, method, timeout=None):
+            returning = method.__returning__
+            if returning is Message:
+                return Message(
+                    message_id=1, date=datetime.now(), chat=Chat(id=USER_ID, type='private')
+                )
+            if returning is MessageId:
+                return MessageId(message_id=1)
+            if 'ChatMember' in str(returning):
+                return ChatMemberMember(user=User(id=USER_ID, is_bot=False, first_name='Test'))
+            return True
+
+        async def stream_content(self, *args, **kwargs):
+            yield b''
+
+        async def close(self):
+            pass
+
+    return FakeSession()
+
+
+def make_update(update_id: int, text: str):
+    from aiogram.types import Chat, Message, Update, User
+    return Update(
+        update_id=update_id,
+        message=Message(
+            message_id=update_id,
+            date=datetime.now(),
+            chat=Chat(id=USER_ID, type='private'),
+            from_user=User(id=USER_ID, is_bot=False, first_name='Test'),
+            text=text,
+        ),
+    )
+
+
+async def main():
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+
+    import database
+    database.create_tables()
+
+    calls = [0]
+    lookups = [0]
+    original = database.connection
+
+    def counted_connection():
+        calls[0] += 1
+        return original()
+
+    def counted_lookup(func):
+        def wrapper(*args, **kwargs):
+            lookups[0] += 1
+            return func(*args, **kwargs)
+        return wrapper
+
+    # Handlerlar `from database import ...` bilan bog'lanishidan oldin
+    database.connection = counted_connection
+    for name in LOOKUPS:
+        setattr(database, name, counted_lookup(getattr(database, name)))
+
+    from aiogram import Bot, Dispatcher
+    from handlers import user_handlers, admin_handlers, movie_handlers
+    try:
+        from middlewares import RequestContextMiddleware
+    except ImportError:
+        RequestContextMiddleware = None
+
+    await database.add_movie('123', 'Avatar', 'file_id', added_by=1)
+
+    bot = Bot(token='123456:' + 'A' * 35, session=make_session())
+    dp = Dispatcher()
+    middleware = None
+    if RequestContextMiddleware is not None:
+        middleware = RequestContextMiddleware()
+        dp.update.outer_middleware(middleware)
+    dp.include_router(user_handlers.router)
+    dp.include_router(admin_handlers.router)
+    dp.include_router(movie_handlers.router)
+
+    update_id = 0
+    # Birinchi /start foydalanuvchini ro'yxatdan o'tkazadi va keshlarni to'ldiradi
+    for _, text in UPDATES:
+        update_id += 1
+        await dp.feed_update(bot, make_update(update_id, text))
+
+    print(f"{'update':26}{'round-trip / update':>20}{'lookup / update':>18}")
+    for name, text in UPDATES:
+        calls[0] = lookups[0] = 0
+        for _ in range(REPEATS):
+            update_id += 1
+            await dp.feed_update(bot, make_update(update_id, text))
+        print(f"{name:26}{calls[0] / REPEATS:>20.2f}{lookups[0] / REPEATS:>18.2f}")
+
+    if middleware is not None:
+        print(f"middleware stats(): {middleware.stats()}")
+    await database.close_pool()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Foydalanuvchilar ro'yxati xotira benchmarki (1M sintetik foydalanuvchi)
+- Eski usul: get_all_users() - barcha user_id lar Python list da (har biri alohida int obyekt)
+- array('q') snapshot - har bir ID 8 bayt
+- Oqim (iter_user_ids) - xotirada faqat bitta sahifa
+
+Ishga tushirish:
+    python benchmarks/bench_users.py [foydalanuvchilar soni]
+"""
+
+import asyncio
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+
+async def legacy_get_all_users(db):
+    """Eski get_all_users - bitta so'rov, natija list da"""
+    async with db.connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('SELECT user_id FROM users')
+        users = [row[0] for row in await cursor.fetchall()]
+    return users
+
+
+def result_size(result) -> int:
+    """Natijaning o'zi egallagan xotira (bayt)"""
+    if isinstance(result, int):
+        return 0
+    if isinstance(result, list):
+        return sys.getsizeof(result) + sum(sys.getsizeof(item) for item in result)
+    return sys.getsizeof(result)
+
+
+async def measure(name: str, coro_func):
+    """Vaqt (tracemalloc siz), eng yuqori xotira (peak) va natija hajmi"""
+    started = time.perf_counter()
+    result = await coro_func()
+    elapsed = time.perf_counter() - started
+    count = result if isinstance(result, int) else len(result)
+    size = result_size(result)
+    del result
+    gc.collect()
+
+    tracemalloc.start()
+    await coro_func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:26}{count:>10}{peak / 2**20:12.1f}{size / 2**20:12.1f}{elapsed:10.2f}")
+
+
+async def main():
+    workdir = tempfile.mkdtemp(prefix='kinobot_bench_')
+    os.chdir(workdir)
+    import database as db
+    db.create_tables()
+
+    # Telegram ID lari katta sonlar - kichik int keshiga tushmaydi
+    random.seed(1)
+    conn = db.get_connection()
+    conn.executemany(
+        'INSERT OR IGNORE INTO users (user_id, full_name) VALUES (?, ?)',
+        ((random.randrange(10**8, 8 * 10**9), None) for _ in range(USERS))
+    )
+    conn.commit()
+    await db.get_users_count()  # havzani isitish
+
+    async def stream_count():
+        count = 0
+        async for _ in db.iter_user_ids():
+            count += 1
+        return count
+
+    print(f"{'':26}{'soni':>10}{'peak, MB':>12}{'natija, MB':>12}{'vaqt, s':>10}")
+    await measure('list (eski)', lambda: legacy_get_all_users(db))
+    await measure("array('q') snapshot", db.get_user_ids_snapshot)
+    await measure('oqim (iter_user_ids)', stream_count)
+
+    await db.close_pool()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
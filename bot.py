@@ -7,11 +7,16 @@ from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
 
-from config import BOT_TOKEN, ADMINS
+from config import BOT_TOKEN, ADMINS, BOT_MODE
 from handlers import user_router, admin_router, movie_router
 import backup
 import cloud_backup
-from database import create_tables
+from database import create_tables, close_pool
+from middlewares import request_context
+from webhook import run_webhook
+from ratelimit import rate_limiter
+from broadcaster import broadcast_worker
+from segments import segment_refresher
 
 
 async def scheduled_backup(bot: Bot):
@@ -65,6 +70,9 @@ async def main():
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
     
+    # Barcha chiquvchi xabarlar umumiy va chat bo'yicha cheklanadi
+    bot.session.middleware(rate_limiter)
+    
     dp = Dispatcher()
     
     # ⚡ MUHIM: Server qayta ishga tushganda clouddan tiklash
@@ -75,11 +83,20 @@ async def main():
     create_tables()
     logging.info("✅ Database tayyor")
     
+    # Har bir update uchun foydalanuvchi holati (user_ctx) - qiymatlar kerak bo'lganda bir marta o'qiladi
+    dp.update.outer_middleware(request_context)
+    
     # Routerlarni qo'shish
     dp.include_router(user_router)
     dp.include_router(admin_router)
     dp.include_router(movie_router)
     
+    # Reklama ishchisi - tugallanmagan vazifalar kursordan davom etadi
+    broadcast_worker.start(bot)
+    
+    # Reklama auditoriyalari (segmentlar) fonda yangilanib turadi
+    segment_refresher.start()
+    
     # Avtomatik zaxira vazifalarini ishga tushirish
     asyncio.create_task(scheduled_backup(bot))
     asyncio.create_task(cloud_backup_periodic(bot))
@@ -90,8 +107,16 @@ async def main():
     logging.info("☁️ Cloud backup faol (har 6 soatda)")
     
     try:
-        await dp.start_polling(bot)
+        if BOT_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            # Oldin webhook o'rnatilgan bo'lsa polling ishlamaydi
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
     finally:
+        await broadcast_worker.close()
+        await segment_refresher.close()
+        await close_pool()
         await bot.session.close()
 
 
@@ -0,0 +1,507 @@
+# -*- coding: utf-8 -*-
+"""
+Reklama yuborish (fon vazifasi)
+- Vazifa broadcasts jadvalida saqlanadi: xabar (payload JSON), holat, kursor (users.id) va auditoriya segmenti
+- Fon ishchisi foydalanuvchilarni BROADCAST_CONCURRENCY talik partiyalarda bir vaqtda yuboradi,
+  har partiyadan keyin kursor va hisoblagichlar saqlanadi (checkpoint)
+- Bot qayta ishga tushsa yuborilayotgan vazifalar kursordan davom etadi
+  (uzilish paytida yuborilayotgan partiya qayta yuborilishi mumkin)
+- Admin holat xabari fon vazifasida cheklangan tezlikda yangilanadi: tezlik, qolgan vaqt, cheklov holati
+- Xabar bir marta shablonga (copy_message) aylantiriladi - har bir foydalanuvchi uchun faqat chat_id almashadi
+- Tezlik chegarasi - ratelimit.py (session middleware), reklama bulk yo'lagida:
+  foydalanuvchilarga javoblar har doim birinchi yuboriladi
+- Admin vazifani to'xtatishi, davom ettirishi va bekor qilishi mumkin
+- Vazifa xatoligi: tarmoq/baza xatoliklarida MAX_JOB_ERRORS martagacha qayta uriniladi, boshqa xatoliklarda
+  (yaroqsiz xabar, o'chirilgan manba xabari) vazifa darhol failed bo'ladi va admin xabardor qilinadi -
+  navbatdagi vazifalar to'sib qo'yilmaydi
+"""
+
+import asyncio
+import html
+import json
+import logging
+import sqlite3
+import time
+from collections import deque
+
+from aiohttp import ClientError
+from aiogram.exceptions import (
+    TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter, TelegramNetworkError, TelegramServerError
+)
+from aiogram.methods import CopyMessage, SendMessage, SendPhoto, SendVideo
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from config import BROADCAST_CONCURRENCY, BROADCAST_PROGRESS_INTERVAL
+from database import (
+    create_broadcast, get_broadcast, get_next_broadcast, set_broadcast_status,
+    save_broadcast_progress, record_broadcast_error, iter_user_pages, set_users_reachable
+)
+from keyboards import broadcast_job_keyboard
+from ratelimit import get_rate_limit_stats, send_lane, LANE_BULK
+
+# To'xtashda joriy partiyani tugatish uchun maksimal vaqt (soniya)
+STOP_TIMEOUT = 30
+
+# Xatolikdan keyin qayta urinishdan oldin kutish (soniya)
+ERROR_DELAY = 5
+
+# Vaqtinchalik xatoliklarda vazifa shuncha marta ketma-ket yiqilsa failed bo'ladi
+MAX_JOB_ERRORS = 5
+
+# Vaqtinchalik xatoliklar (tarmoq, Telegram serveri, band baza) - qayta urinish mumkin
+TRANSIENT_JOB_ERRORS = (
+    TelegramNetworkError, TelegramServerError, ClientError, asyncio.TimeoutError, sqlite3.OperationalError
+)
+
+# Xabar shablonining o'zi yaroqsiz - hech kimga yetib bormaydi (masalan, manba xabari o'chirilgan)
+TEMPLATE_ERRORS = (
+    'message to copy not found',
+    'message_id_invalid',
+    'wrong file identifier',
+    'wrong remote file identifier',
+    "can't parse entities",
+)
+
+
+class BroadcastError(Exception):
+    """Vazifani davom ettirib bo'lmaydigan xatolik"""
+
+# Holat xabarini tahrirlashlar orasidagi eng kam oraliq (soniya) - bitta xabarni tez-tez tahrirlash 429 beradi
+MIN_PROGRESS_INTERVAL = 3
+
+# Yuborish tezligi o'lchanadigan oyna (soniya)
+RATE_WINDOW = 30
+
+# Doimiy xatoliklar - foydalanuvchiga keyingi reklamalar ham yetib bormaydi
+DEAD_RECIPIENT_ERRORS = (
+    ('blocked', 'bot was blocked'),
+    ('deactivated', 'user is deactivated'),
+    ('not_found', 'chat not found'),
+    ('not_found', 'user not found'),
+    ('no_conversation', "can't initiate conversation"),
+)
+
+
+def classify_send_error(error: Exception):
+    """Yuborish xatoligi sababi - doimiy bo'lsa sabab ('blocked', ...), vaqtinchalik bo'lsa None"""
+    if not isinstance(error, (TelegramForbiddenError, TelegramBadRequest)):
+        return None
+    message = str(error).lower()
+    for reason, marker in DEAD_RECIPIENT_ERRORS:
+        if marker in message:
+            return reason
+    # Boshqa Forbidden holatlari ham doimiy (masalan, botga xabar yuborib bo'lmaydi)
+    return 'forbidden' if isinstance(error, TelegramForbiddenError) else None
+
+
+def is_template_error(error: Exception) -> bool:
+    """Xatolik xabar shablonida (qabul qiluvchida emas)"""
+    if not isinstance(error, TelegramBadRequest):
+        return False
+    message = str(error).lower()
+    return any(marker in message for marker in TEMPLATE_ERRORS)
+
+
+def build_payload(data: dict) -> dict:
+    """FSM ma'lumotlaridan saqlanadigan xabar (JSON ga o'giriladigan)"""
+    entities = data.get("message_entities")
+    broadcast_type = data.get("broadcast_type", "text")
+    if broadcast_type == "forward":
+        source = (data.get("forward_chat_id"), data.get("forward_message_id"))
+    else:
+        source = (data.get("source_chat_id"), data.get("source_message_id"))
+    return {
+        'type': broadcast_type,
+        'text': data.get("message_text"),
+        'entities': [entity.model_dump(exclude_none=True) for entity in entities] if entities else None,
+        'media_file_id': data.get("media_file_id"),
+        'source_chat_id': source[0],
+        'source_message_id': source[1],
+        'buttons': data.get("buttons", [])
+    }
+
+
+def payload_markup(payload: dict):
+    """Xabar tugmalari (bo'lmasa None)"""
+    if not payload['buttons']:
+        return None
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=btn["text"], url=btn["url"])] for btn in payload['buttons']
+    ])
+
+
+def compile_payload(payload: dict):
+    """Xabarni yuborish shabloniga aylantirish - tayyor (tekshirilgan) metod, chat_id=0"""
+    broadcast_type = payload['type']
+    markup = payload_markup(payload)
+    # Eski vazifalarda forward manbasi forward_* kalitlarida saqlangan
+    from_chat_id = payload.get('source_chat_id') or payload.get('forward_chat_id')
+    message_id = payload.get('source_message_id') or payload.get('forward_message_id')
+
+    if message_id:
+        # Admin chatidagi xabardan nusxa: manba ko'rinmaydi, tugmalar qo'shiladi
+        options = {}
+        if "photo" in broadcast_type or "video" in broadcast_type:
+            # Matn alohida kiritilgan - media ostiga qo'yiladi ("" - asl izohni olib tashlaydi)
+            options = {'caption': payload['text'] or "", 'caption_entities': payload['entities']}
+        return CopyMessage(
+            chat_id=0, from_chat_id=from_chat_id, message_id=message_id, reply_markup=markup, **options
+        )
+
+    # Manba xabari saqlanmagan eski vazifalar
+    if "photo" in broadcast_type:
+        return SendPhoto(
+            chat_id=0, photo=payload['media_file_id'], caption=payload['text'],
+            caption_entities=payload['entities'], reply_markup=markup
+        )
+    if "video" in broadcast_type:
+        return SendVideo(
+            chat_id=0, video=payload['media_file_id'], caption=payload['text'],
+            caption_entities=payload['entities'], reply_markup=markup
+        )
+    return SendMessage(chat_id=0, text=payload['text'], entities=payload['entities'], reply_markup=markup)
+
+
+async def send_template(bot, user_id: int, template):
+    """Shablonni bitta foydalanuvchiga yuborish - model_copy qayta tekshiruvsiz faqat chat_id ni almashtiradi"""
+    await bot(template.model_copy(update={'chat_id': user_id}))
+
+
+BROADCAST_STATUS_NAMES = {
+    'running': "▶️ Yuborilmoqda",
+    'paused': "⏸ To'xtatilgan",
+    'cancelled': "⛔ Bekor qilingan",
+    'done': "✅ Tugagan",
+    'failed': "❌ Xatolik bilan to'xtatilgan",
+}
+
+
+def format_duration(seconds: float) -> str:
+    """Davomiylik: 1 soat 5 daq, 3 daq 20 s, 45 s"""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600} soat {seconds % 3600 // 60} daq"
+    if seconds >= 60:
+        return f"{seconds // 60} daq {seconds % 60} s"
+    return f"{seconds} s"
+
+
+def broadcast_status_text(job, progress: dict = None) -> str:
+    """Reklama vazifasi holati (progress - yuborilayotgan vazifaning jonli ko'rsatkichlari)"""
+    processed = job['sent'] + job['failed']
+    text = (
+        f"📤 <b>Reklama #{job['id']}</b>\n\n"
+        f"Holat: {BROADCAST_STATUS_NAMES.get(job['status'], job['status'])}\n"
+        f"👥 Jami: <b>{job['total']}</b>\n"
+        f"📨 Ishlangan: <b>{processed}</b>\n"
+        f"✅ Muvaffaqiyatli: <b>{job['sent']}</b>\n"
+        f"❌ Xatolik: <b>{job['failed']}</b>\n"
+        f"🚫 Bloklagan: <b>{job['blocked']}</b>"
+    )
+    if progress is None:
+        return text
+
+    eta = format_duration(progress['eta']) if progress['eta'] is not None else "hisoblanmoqda..."
+    if progress['paused'] > 0:
+        backoff = f"⏳ Telegram cheklovi (429): {format_duration(progress['paused'])} kutish"
+    elif progress['waiting']:
+        backoff = f"🚦 Tezlik chegarasida: {progress['waiting']} ta so'rov navbatda"
+    else:
+        backoff = "🟢 Cheklovsiz"
+    return text + (
+        f"\n\n⚡ Tezlik: <b>{progress['rate']:.1f}</b> xabar/s\n"
+        f"⏱ Qolgan vaqt: <b>{eta}</b>\n"
+        f"{backoff}"
+    )
+
+
+class ProgressReporter:
+    """Admin holat xabarini yangilash - interval da bir martadan ko'p emas, 429 da kutadi"""
+
+    def __init__(self, bot, broadcast_id: int, interval: float = 5):
+        self.bot = bot
+        self.broadcast_id = broadcast_id
+        self.interval = max(interval, MIN_PROGRESS_INTERVAL)
+        self._samples = deque()
+        self._next_edit = 0.0
+        self._last_text = None
+        self._dead_message = None
+        self.edits = 0
+
+    def record(self, job):
+        """Ishlangan xabarlar sonini yozib borish (tezlik uchun)"""
+        now = time.monotonic()
+        self._samples.append((now, job['sent'] + job['failed']))
+        while len(self._samples) > 2 and now - self._samples[0][0] > RATE_WINDOW:
+            self._samples.popleft()
+
+    def progress(self, job) -> dict:
+        """Jonli ko'rsatkichlar: tezlik (xabar/s), qolgan vaqt va cheklagich holati"""
+        rate = 0.0
+        if len(self._samples) > 1:
+            (first_time, first_count), (last_time, last_count) = self._samples[0], self._samples[-1]
+            rate = (last_count - first_count) / (last_time - first_time)
+        remaining = max(job['total'] - job['sent'] - job['failed'], 0)
+        limits = get_rate_limit_stats()
+        return {
+            'rate': rate,
+            'eta': remaining / rate if rate > 0 else None,
+            'paused': limits['paused_seconds'],
+            'waiting': limits['waiting']
+        }
+
+    async def run(self):
+        """Vazifa davomida holat xabarini yangilab turish (partiya qotib qolsa ham)"""
+        while True:
+            await asyncio.sleep(self.interval)
+            job = await get_broadcast(self.broadcast_id)
+            if job is None:
+                return
+            self.record(job)
+            await self.report(job)
+
+    async def report(self, job, force: bool = False):
+        """Holat xabarini tahrirlash (force - vazifa tugaganda, interval ichida bo'lsa kutib)"""
+        message = (job['status_chat_id'], job['status_message_id'])
+        if message[1] is None or message == self._dead_message:
+            return
+        wait = self._next_edit - time.monotonic()
+        if wait > 0:
+            if not force or wait > self.interval:
+                return
+            await asyncio.sleep(wait)
+
+        progress = self.progress(job) if job['status'] == 'running' else None
+        text = broadcast_status_text(job, progress)
+        if text == self._last_text:
+            return
+        try:
+            await self.bot.edit_message_text(
+                text,
+                chat_id=message[0],
+                message_id=message[1],
+                reply_markup=broadcast_job_keyboard(job['id'], job['status']),
+                parse_mode="HTML"
+            )
+            self._last_text = text
+            self.edits += 1
+            self._next_edit = time.monotonic() + self.interval
+        except TelegramRetryAfter as e:
+            self._next_edit = time.monotonic() + e.retry_after
+        except TelegramBadRequest as e:
+            if "not modified" in str(e):
+                self._last_text = text
+            else:
+                # Xabar o'chirilgan - admin boshqa xabarni ochmaguncha yangilanmaydi
+                self._dead_message = message
+                logging.debug(f"Reklama #{job['id']} holati yangilanmadi: {e}")
+        except Exception as e:
+            self._next_edit = time.monotonic() + self.interval
+            logging.debug(f"Reklama #{job['id']} holati yangilanmadi: {e}")
+
+
+class BroadcastWorker:
+    """Fon ishchisi - vazifalarni navbat bilan (eskisi birinchi) yuboradi"""
+
+    def __init__(self, concurrency: int = 25, progress_interval: float = 5):
+        self.concurrency = concurrency
+        self.progress_interval = progress_interval
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._stopping = False
+        self._reporter = None
+        self.bot = None
+
+    def start(self, bot):
+        """Ishchini ishga tushirish - tugallanmagan vazifalar davom ettiriladi"""
+        self.bot = bot
+        self._stopping = False
+        self._task = asyncio.get_running_loop().create_task(self._run(bot))
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def wake(self):
+        """Yangi yoki davom ettirilgan vazifa haqida xabar berish"""
+        self._wakeup.set()
+
+    async def _run(self, bot):
+        # Ishchi vazifasi (va undan ochilgan yuborishlar) bulk yo'lakda - faqat ortib qolgan chegara
+        send_lane.set(LANE_BULK)
+        while not self._stopping:
+            # Event so'rovdan oldin tozalanadi - so'rov paytidagi wake() yo'qolmaydi
+            self._wakeup.clear()
+            try:
+                job = await get_next_broadcast()
+                if job is None:
+                    await self._wakeup.wait()
+                    continue
+            except Exception as e:
+                logging.exception(f"Reklama ishchisida xatolik: {e}")
+                await asyncio.sleep(ERROR_DELAY)
+                continue
+            try:
+                await self._run_job(bot, job)
+            except Exception as e:
+                await self._job_error(bot, job, e)
+
+    async def _run_job(self, bot, job):
+        """Vazifani yuborish - holat xabari alohida fon vazifasida yangilanadi"""
+        reporter = self._reporter = ProgressReporter(bot, job['id'], self.progress_interval)
+        reporter.record(job)
+        reporting = asyncio.get_running_loop().create_task(reporter.run())
+        try:
+            finished = await self._send_job(bot, job)
+        finally:
+            reporting.cancel()
+            await asyncio.gather(reporting, return_exceptions=True)
+
+        if self._stopping:
+            return
+        job = await get_broadcast(job['id'])
+        if job is None:
+            return
+        # Yakuniy holat (tugagan, to'xtatilgan yoki bekor qilingan)
+        await reporter.report(job, force=True)
+        if finished:
+            await self._notify_done(bot, job)
+
+    async def _job_error(self, bot, job, error: Exception):
+        """Vazifa xatoligi - vaqtinchalik bo'lsa keyinroq qayta uriniladi, aks holda (yoki ko'p marta) failed"""
+        broadcast_id = job['id']
+        logging.exception(f"Reklama #{broadcast_id} xatolik bilan to'xtadi: {error}")
+        try:
+            errors = await record_broadcast_error(broadcast_id, f"{type(error).__name__}: {error}")
+            if isinstance(error, TRANSIENT_JOB_ERRORS) and errors < MAX_JOB_ERRORS:
+                await asyncio.sleep(ERROR_DELAY)
+                return
+            if await set_broadcast_status(broadcast_id, 'failed'):
+                job = await get_broadcast(broadcast_id)
+                await ProgressReporter(bot, broadcast_id).report(job, force=True)
+                await self._notify_failed(bot, job)
+        except Exception as e:
+            logging.exception(f"Reklama #{broadcast_id} xatoligini saqlab bo'lmadi: {e}")
+            await asyncio.sleep(ERROR_DELAY)
+
+    async def _send_job(self, bot, job) -> bool:
+        """Bitta vazifani kursordan oxirigacha yuborish - to'xtatilsa False"""
+        broadcast_id = job['id']
+        template = compile_payload(json.loads(job['payload']))
+        pages = iter_user_pages(
+            after_id=job['cursor'], max_id=job['max_user_id'], reachable_only=True,
+            page_size=self.concurrency, segment=job['segment']
+        )
+        async for batch in pages:
+            # To'xtatish/bekor qilish har partiyadan oldin tekshiriladi
+            job = await get_broadcast(broadcast_id)
+            if self._stopping or job is None or job['status'] != 'running':
+                return False
+
+            results = await asyncio.gather(*(
+                self._deliver(bot, user_id, template) for _, user_id in batch
+            ))
+            template_error = next((result for result in results if isinstance(result, Exception)), None)
+            if template_error is not None:
+                raise BroadcastError(f"Xabar shabloni yaroqsiz: {template_error}")
+            # Bloklagan/o'chirilgan foydalanuvchilar keyingi reklamalarda o'tkazib yuboriladi
+            dead = [user_id for (_, user_id), result in zip(batch, results) if result not in (True, None)]
+            if dead:
+                await set_users_reachable(dead, False)
+            sent = results.count(True)
+            await save_broadcast_progress(broadcast_id, batch[-1][0], sent, len(results) - sent, len(dead))
+
+        return await set_broadcast_status(broadcast_id, 'done')
+
+    async def _deliver(self, bot, user_id: int, template):
+        """Yuborish natijasi: True - yuborildi, None - vaqtinchalik xatolik, str - doimiy xatolik sababi,
+        Exception - xabar shablonining xatoligi"""
+        try:
+            await send_template(bot, user_id, template)
+            return True
+        except Exception as e:
+            logging.debug(f"Reklama {user_id} ga yuborilmadi: {e}")
+            if is_template_error(e):
+                return e
+            return classify_send_error(e)
+
+    async def _notify_done(self, bot, job):
+        """Vazifa tugagach adminga natija"""
+        try:
+            await bot.send_message(
+                job['admin_id'],
+                f"📬 <b>Reklama #{job['id']} yuborildi!</b>\n\n"
+                f"✅ Muvaffaqiyatli: <b>{job['sent']}</b>\n"
+                f"❌ Xatolik: <b>{job['failed']}</b>\n"
+                f"🚫 Bloklagan: <b>{job['blocked']}</b>",
+                parse_mode="HTML"
+            )
+        except Exception as e:
+            logging.warning(f"Reklama natijasini yuborib bo'lmadi: {e}")
+
+    async def _notify_failed(self, bot, job):
+        """Vazifa xatolik bilan to'xtaganda adminga xabar"""
+        try:
+            await bot.send_message(
+                job['admin_id'],
+                f"⚠️ <b>Reklama #{job['id']} xatolik bilan to'xtatildi</b>\n\n"
+                f"✅ Yuborildi: <b>{job['sent']}</b>\n"
+                f"❌ Xatolik: <code>{html.escape(job['last_error'] or '')}</code>",
+                parse_mode="HTML"
+            )
+        except Exception as e:
+            logging.warning(f"Reklama xatoligi haqida xabar yuborib bo'lmadi: {e}")
+
+    async def close(self):
+        """To'xtash - joriy partiya tugatiladi va saqlanadi"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logging.warning("Reklama partiyasi vaqtida tugamadi - qayta ishga tushganda qayta yuboriladi")
+        self._task = None
+
+    def progress(self, job):
+        """Yuborilayotgan vazifaning jonli ko'rsatkichlari (boshqa vazifa uchun None)"""
+        reporter = self._reporter
+        if reporter is None or reporter.broadcast_id != job['id'] or job['status'] != 'running':
+            return None
+        return reporter.progress(job)
+
+
+broadcast_worker = BroadcastWorker(BROADCAST_CONCURRENCY, BROADCAST_PROGRESS_INTERVAL)
+
+
+async def start_broadcast(admin_id: int, data: dict) -> int:
+    """FSM ma'lumotlaridan vazifa yaratish va ishchini uyg'otish (segment - tanlangan auditoriya)"""
+    broadcast_id = await create_broadcast(
+        admin_id, json.dumps(build_payload(data), ensure_ascii=False), data.get("segment")
+    )
+    broadcast_worker.wake()
+    return broadcast_id
+
+
+def broadcast_progress_text(job) -> str:
+    """Vazifa holati - yuborilayotgan bo'lsa tezlik, qolgan vaqt va cheklov holati bilan"""
+    return broadcast_status_text(job, broadcast_worker.progress(job))
+
+
+async def pause_broadcast(broadcast_id: int) -> bool:
+    """Vazifani to'xtatish (joriy partiyadan keyin)"""
+    return await set_broadcast_status(broadcast_id, 'paused')
+
+
+async def resume_broadcast(broadcast_id: int) -> bool:
+    """To'xtatilgan vazifani davom ettirish"""
+    resumed = await set_broadcast_status(broadcast_id, 'running')
+    if resumed:
+        broadcast_worker.wake()
+    return resumed
+
+
+async def cancel_broadcast(broadcast_id: int) -> bool:
+    """Vazifani bekor qilish"""
+    return await set_broadcast_status(broadcast_id, 'cancelled')
@@ -16,6 +16,8 @@ from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 
 from config import BOT_TOKEN, ADMINS
+import database as db
+from backup import restoring
 
 DATABASE_FILE = "kino_bot.db"
 BACKUP_CHANNEL_ID = None  # Admin ID ishlatiladi
@@ -45,6 +47,9 @@ async def upload_backup_to_cloud(bot: Bot = None):
             logging.warning("Database fayli topilmadi!")
             return None
         
+        # WAL jurnalini asosiy faylga yozish
+        db.checkpoint()
+        
         # Database hajmini tekshirish
         file_size = os.path.getsize(DATABASE_FILE)
         if file_size == 0:
@@ -129,8 +134,12 @@ async def restore_from_cloud(bot: Bot = None, file_id: str = None):
         # Faylni yuklab olish
         file = await bot.get_file(file_id)
         
-        # Faylni saqlash
-        await bot.download_file(file.file_path, DATABASE_FILE)
+        # Fon ishchilari to'xtatiladi, barcha ulanishlar yopiladi - keyin faylni almashtirish
+        async with restoring():
+            await bot.download_file(file.file_path, DATABASE_FILE)
+            # Eski backup bo'lsa - yetishmayotgan migratsiyalarni qo'llash
+            db.create_tables()
+            db.reload_caches()
         
         logging.info("☁️ Database clouddan tiklandi!")
         
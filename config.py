@@ -18,6 +18,65 @@ ADMINS = [int(digits)] if digits else [0]
 # Database fayl nomi
 DATABASE_NAME = "kino_bot.db"
 
+# Database ulanishlar havzasi hajmi (aiosqlite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE") or 4)
+
+# Ko'rish statistikasi buferi - N ta yozuv yoki M millisekundda bir marta bazaga yoziladi
+VIEW_FLUSH_SIZE = int(os.getenv("VIEW_FLUSH_SIZE") or 100)
+VIEW_FLUSH_INTERVAL_MS = int(os.getenv("VIEW_FLUSH_INTERVAL_MS") or 1000)
+
+# Premium holati keshi hajmi (foydalanuvchilar soni, LRU)
+PREMIUM_CACHE_SIZE = int(os.getenv("PREMIUM_CACHE_SIZE") or 10000)
+
+# Kinolar keshi hajmi (kodlar soni, LRU)
+MOVIE_CACHE_SIZE = int(os.getenv("MOVIE_CACHE_SIZE") or 5000)
+# Topilmagan kodlar (va kod sifatida tekshirilgan erkin matn) uchun alohida, kichikroq LRU
+MOVIE_NEGATIVE_CACHE_SIZE = int(os.getenv("MOVIE_NEGATIVE_CACHE_SIZE") or 1000)
+
+# Kanal a'zoligi keshi (soniya) - a'zo bo'lsa uzoqroq, a'zo bo'lmasa qisqaroq saqlanadi
+MEMBERSHIP_TTL_POSITIVE = int(os.getenv("MEMBERSHIP_TTL_POSITIVE") or 300)
+MEMBERSHIP_TTL_NEGATIVE = int(os.getenv("MEMBERSHIP_TTL_NEGATIVE") or 30)
+MEMBERSHIP_CACHE_SIZE = int(os.getenv("MEMBERSHIP_CACHE_SIZE") or 50000)
+
+# channel_members jurnali yozuvi shuncha soatdan eski bo'lsa jonli qayta tekshiriladi
+# (o'tkazib yuborilgan chat_member yangilanishi uchun xavfsizlik chegarasi)
+MEMBERSHIP_LEDGER_MAX_AGE_HOURS = float(os.getenv("MEMBERSHIP_LEDGER_MAX_AGE_HOURS") or 24)
+
+# Bitta kanal a'zoligini tekshirish uchun maksimal vaqt (soniya)
+SUBSCRIPTION_CHECK_TIMEOUT = float(os.getenv("SUBSCRIPTION_CHECK_TIMEOUT") or 5)
+
+# Telegram ga chiquvchi xabarlar chegarasi: umumiy (xabar/soniya), shaxsiy chat (xabar/soniya),
+# guruh/kanal (xabar/daqiqa). RetryAfter shu vaqtdan (soniya) uzun bo'lsa kutilmaydi - xatolik qaytadi
+RATE_LIMIT_GLOBAL = float(os.getenv("RATE_LIMIT_GLOBAL") or 30)
+RATE_LIMIT_PER_CHAT = float(os.getenv("RATE_LIMIT_PER_CHAT") or 1)
+RATE_LIMIT_GROUP_PER_MINUTE = float(os.getenv("RATE_LIMIT_GROUP_PER_MINUTE") or 20)
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT") or 60)
+
+# Reklama yuborish - bir vaqtda yuboriladigan xabarlar (partiya hajmi, har partiyadan keyin checkpoint)
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY") or 25)
+
+# Reklama holati xabarini yangilash oralig'i (soniya, kamida 3)
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL") or 5)
+
+# Auditoriya segmentlarini fonda yangilash oralig'i (soniya)
+SEGMENT_REFRESH_INTERVAL = float(os.getenv("SEGMENT_REFRESH_INTERVAL") or 600)
+
+# Ishga tushirish rejimi: "polling" (standart) yoki "webhook"
+BOT_MODE = (os.getenv("BOT_MODE") or "polling").lower()
+
+# Webhook sozlamalari - WEBHOOK_URL bo'sh bo'lsa Telegramda webhook o'rnatilmaydi
+# (server baribir ishlaydi - lokal test uchun update JSON ni qo'lda yuborish mumkin)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL") or ""
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH") or "/webhook"
+# Maxfiy kalit har doim tekshiriladi - bo'sh bo'lsa har ishga tushishda tasodifiy kalit yaratiladi
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or ""
+WEBAPP_HOST = os.getenv("WEBAPP_HOST") or "0.0.0.0"
+WEBAPP_PORT = int(os.getenv("PORT") or os.getenv("WEBAPP_PORT") or 8080)
+
+# Webhook navbati - N ta ishchi, navbat to'lsa Telegram update ni keyinroq qayta yuboradi
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS") or 8)
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE") or 1000)
+
 # Kanal (ixtiyoriy) - foydalanuvchilar a'zo bo'lishi kerak bo'lgan kanal
 CHANNEL_USERNAME = None  # Masalan: "@your_channel"
 CHANNEL_ID = None  # Masalan: -1001234567890
@@ -1,721 +1,1037 @@
+import asyncio
+import contextvars
+import json
+import os
 import sqlite3
-from config import DATABASE_NAME
+import threading
+from array import array
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import NamedTuple
+
+import aiosqlite
+
+from config import (
+    DATABASE_NAME, DB_POOL_SIZE, VIEW_FLUSH_SIZE, VIEW_FLUSH_INTERVAL_MS,
+    PREMIUM_CACHE_SIZE, MOVIE_CACHE_SIZE, MOVIE_NEGATIVE_CACHE_SIZE
+)
+from migrations import run_migrations
+from uzbek_text import normalize_text, search_terms
 from datetime import datetime, timedelta
 
 
+# SQLite sozlamalari - har bir yangi ulanishda qo'llaniladi
+PRAGMAS = (
+    ('journal_mode', 'WAL'),          # O'quvchilar yozuvchini kutib qolmaydi
+    ('synchronous', 'NORMAL'),        # WAL rejimida xavfsiz, har commitda fsync yo'q
+    ('mmap_size', 256 * 1024 * 1024), # 256 MB xotiraga proyeksiya
+    ('cache_size', -32000),           # ~32 MB sahifa keshi
+    ('temp_store', 'MEMORY'),
+    ('busy_timeout', 5000),
+)
+
+# Har bir ulanishdagi tayyorlangan (prepared) so'rovlar keshi hajmi
+STATEMENT_CACHE_SIZE = 256
+
+
+def pragma_statements():
+    """PRAGMA buyruqlari ro'yxati"""
+    return [f'PRAGMA {name} = {value}' for name, value in PRAGMAS]
+
+
+class PersistentConnection(sqlite3.Connection):
+    """Doimiy ulanish - close() ulanishni yopmaydi, faqat tranzaksiyani tozalaydi"""
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def shutdown(self):
+        """Ulanishni haqiqatan yopish"""
+        super().close()
+
+
+class ConnectionRegistry:
+    """Har bir oqim (thread) uchun bitta doimiy sqlite3 ulanish"""
+
+    def __init__(self, database: str):
+        self.database = database
+        self._lock = threading.Lock()
+        self._connections = {}
+
+    def get(self):
+        """Joriy oqim ulanishini olish (yo'q bo'lsa ochish)"""
+        ident = threading.get_ident()
+        conn = self._connections.get(ident)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.database,
+                factory=PersistentConnection,
+                check_same_thread=False,
+                cached_statements=STATEMENT_CACHE_SIZE
+            )
+            conn.row_factory = sqlite3.Row
+            for statement in pragma_statements():
+                conn.execute(statement)
+            with self._lock:
+                self._connections[ident] = conn
+        return conn
+
+    def close_all(self):
+        """Barcha oqimlar ulanishlarini yopish"""
+        with self._lock:
+            connections, self._connections = self._connections, {}
+        for conn in connections.values():
+            conn.shutdown()
+
+
+registry = ConnectionRegistry(DATABASE_NAME)
+
+
 def get_connection():
-    """Database ga ulanish"""
-    conn = sqlite3.connect(DATABASE_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Database ga ulanish (sinxron - migratsiya va backup uchun)"""
+    return registry.get()
+
+
+class ConnectionPool:
+    """aiosqlite ulanishlar havzasi - ulanishlar ochiq turadi va qayta ishlatiladi"""
+
+    def __init__(self, database: str, size: int = 4):
+        self.database = database
+        self.size = size
+        self._semaphore = asyncio.Semaphore(size)
+        self._idle = []
+        self._generation = 0
+
+    async def _open(self):
+        """Yangi ulanish ochish"""
+        conn = await aiosqlite.connect(self.database, cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+        for statement in pragma_statements():
+            await conn.execute(statement)
+        return conn
+
+    @asynccontextmanager
+    async def connection(self):
+        """Havzadan ulanish olish, ish tugagach qaytarish"""
+        async with self._semaphore:
+            generation = self._generation
+            conn = self._idle.pop() if self._idle else await self._open()
+            try:
+                yield conn
+            finally:
+                # Yakunlanmagan tranzaksiya keyingi so'rovga o'tib ketmasin
+                if conn.in_transaction:
+                    await conn.rollback()
+                if generation == self._generation:
+                    self._idle.append(conn)
+                else:
+                    await conn.close()
+
+    async def close(self):
+        """Barcha bo'sh ulanishlarni yopish (to'xtash yoki tiklashdan oldin)"""
+        self._generation += 1
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            await conn.close()
+
+    async def drain(self):
+        """Band ulanishlar qaytarilguncha kutish va hammasini yopish - resume() gacha yangi ulanish berilmaydi"""
+        for _ in range(self.size):
+            await self._semaphore.acquire()
+        await self.close()
+
+    def resume(self):
+        """drain() dan keyin havzani qayta ochish"""
+        for _ in range(self.size):
+            self._semaphore.release()
+
+
+pool = ConnectionPool(DATABASE_NAME, DB_POOL_SIZE)
+
+
+# Joriy update davomida bazaga murojaatlar soni (middleware o'rnatadi, [son] ko'rinishida)
+round_trips = contextvars.ContextVar('round_trips', default=None)
+
+
+def connection():
+    """Havzadan ulanish olish - `async with connection() as conn:`"""
+    counter = round_trips.get()
+    if counter is not None:
+        counter[0] += 1
+    return pool.connection()
+
+
+class ViewBuffer:
+    """Ko'rish statistikasi buferi - yozuvlar xotirada yig'iladi va bitta tranzaksiyada yoziladi"""
+
+    def __init__(self, batch_size: int = 100, interval: float = 1.0):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._events = []
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._closing = False
+
+    def add(self, movie_id: int, user_id: int):
+        """Yozuvni navbatga qo'shish - bazani kutmaydi"""
+        # Vaqt voqea paytida olinadi (CURRENT_TIMESTAMP formatida, UTC)
+        watched_date = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        self._events.append((movie_id, user_id, watched_date))
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        if len(self._events) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self):
+        """Navbat bo'shaguncha: N ta yozuv yig'ilganda yoki har M ms da yozish"""
+        # Fon yozuvlari ularni boshlagan update hisobiga qo'shilmasin
+        round_trips.set(None)
+        while self._events and not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._closing:
+                # Qolganini close() o'zi yozadi
+                break
+            await self.flush()
+
+    async def flush(self):
+        """Navbatdagi barcha yozuvlarni executemany bilan bitta commitda yozish"""
+        if not self._events:
+            return
+        events, self._events = self._events, []
+        try:
+            async with connection() as conn:
+                await conn.executemany('''
+                    INSERT INTO statistics (movie_id, user_id, watched_date)
+                    VALUES (?, ?, ?)
+                ''', events)
+                await conn.commit()
+        except Exception as e:
+            print(f"Ko'rishlarni yozishda xatolik: {e}")
+            # Yozilmagan yozuvlar keyingi urinish uchun qaytariladi
+            self._events[:0] = events
+
+    async def close(self):
+        """To'xtashdan oldin navbatni to'liq bo'shatish"""
+        # Vazifa bekor qilinmaydi: flush() o'rtasida to'xtatilsa olingan yozuvlar yo'qoladi.
+        # Bayroq qo'yiladi, joriy yozish tugaguncha kutiladi, qolgani shu yerda yoziladi
+        self._closing = True
+        try:
+            if self._task is not None and not self._task.done():
+                self._wakeup.set()
+                await self._task
+        finally:
+            self._task = None
+            self._closing = False
+        await self.flush()
+
+
+view_buffer = ViewBuffer(VIEW_FLUSH_SIZE, VIEW_FLUSH_INTERVAL_MS / 1000)
+
+
+def reload_caches():
+    """Xotiradagi barcha keshlarni tashlash (backupdan tiklangandan keyin)"""
+    settings_cache.reload()
+    admin_registry.invalidate()
+    premium_cache.invalidate()
+    movie_cache.invalidate()
+    channel_cache.invalidate()
+
+
+async def close_pool():
+    """Barcha ulanishlarni yopish (avval ko'rishlar buferi, keyin havza va sinxron ulanishlar)"""
+    await view_buffer.close()
+    await pool.close()
+    registry.close_all()
+
+
+def checkpoint():
+    """WAL jurnalini asosiy faylga yozish - fayldan nusxa olishdan oldin"""
+    conn = get_connection()
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+
+def release_database_file():
+    """Faylni almashtirishga tayyorlash: WAL yoziladi, sinxron ulanishlar yopiladi, qolgan -wal/-shm o'chiriladi"""
+    checkpoint()
+    registry.close_all()
+    # Eski WAL yangi faylga qo'llanib uni buzmasligi uchun
+    for suffix in ('-wal', '-shm'):
+        path = DATABASE_NAME + suffix
+        if os.path.exists(path):
+            os.remove(path)
+
+
+@asynccontextmanager
+async def exclusive_access():
+    """Bazani almashtirish (tiklash) uchun: ko'rishlar yoziladi, havzadagi barcha ulanishlar qaytarilib yopiladi,
+    WAL asosiy faylga yoziladi. Blok davomida havzadan ulanish so'raganlar kutib turadi"""
+    await view_buffer.close()
+    await pool.drain()
+    try:
+        release_database_file()
+        yield
+    finally:
+        pool.resume()
 
 
 def create_tables():
-    """Jadvallarni yaratish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Foydalanuvchilar jadvali
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY,
-            user_id INTEGER UNIQUE NOT NULL,
-            full_name TEXT,
-            username TEXT,
-            is_premium INTEGER DEFAULT 0,
-            referred_by INTEGER,
-            joined_date TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Kinolar jadvali
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS movies (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            code TEXT UNIQUE NOT NULL,
-            title TEXT NOT NULL,
-            genre TEXT,
-            duration TEXT,
-            file_id TEXT NOT NULL,
-            caption TEXT,
-            added_by INTEGER,
-            base_channel_id INTEGER,
-            message_id INTEGER,
-            added_date TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Kanallar jadvali (majburiy obuna)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS channels (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            channel_id INTEGER UNIQUE,
-            channel_username TEXT,
-            title TEXT,
-            url TEXT,
-            invite_link TEXT,
-            is_request_group INTEGER DEFAULT 0,
-            is_external_link INTEGER DEFAULT 0,
-            is_active INTEGER DEFAULT 1,
-            added_date TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # is_external_link ustunini qo'shish (eski bazalar uchun)
-    try:
-        cursor.execute('ALTER TABLE channels ADD COLUMN is_external_link INTEGER DEFAULT 0')
-    except:
-        pass
-    
-    # Bot sozlamalari jadvali
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS settings (
-            key TEXT PRIMARY KEY,
-            value TEXT
-        )
-    ''')
-    
-    # Qo'shilish so'rovlari jadvali
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS join_requests (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            channel_id INTEGER NOT NULL,
-            request_date TEXT DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(user_id, channel_id)
-        )
-    ''')
-    
-    # Adminlar jadvali (kengaytirilgan huquqlar bilan)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS admins (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER UNIQUE NOT NULL,
-            full_name TEXT,
-            added_date TEXT DEFAULT CURRENT_TIMESTAMP,
-            can_movies INTEGER DEFAULT 1,
-            can_channels INTEGER DEFAULT 1,
-            can_broadcast INTEGER DEFAULT 1,
-            can_stats INTEGER DEFAULT 1,
-            can_premium INTEGER DEFAULT 1,
-            can_admins INTEGER DEFAULT 0,
-            can_settings INTEGER DEFAULT 0
-        )
-    ''')
-    
-    # Statistika jadvali
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS statistics (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            movie_id INTEGER,
-            user_id INTEGER,
-            watched_date TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (movie_id) REFERENCES movies(id),
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-    ''')
-    
-    # Premium tariflar jadvali
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS premium_plans (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            duration_days INTEGER NOT NULL,
-            price INTEGER NOT NULL,
-            description TEXT,
-            is_active INTEGER DEFAULT 1,
-            created_date TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Premium obunalar jadvali
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS premium_subscriptions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            plan_id INTEGER,
-            start_date TEXT DEFAULT CURRENT_TIMESTAMP,
-            end_date TEXT NOT NULL,
-            is_active INTEGER DEFAULT 1,
-            FOREIGN KEY (plan_id) REFERENCES premium_plans(id)
-        )
-    ''')
-    
-    # Premium to'lov so'rovlari jadvali
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS premium_requests (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            plan_id INTEGER NOT NULL,
-            file_id TEXT,
-            file_type TEXT,
-            status TEXT DEFAULT 'pending',
-            admin_id INTEGER,
-            created_date TEXT DEFAULT CURRENT_TIMESTAMP,
-            processed_date TEXT,
-            FOREIGN KEY (plan_id) REFERENCES premium_plans(id)
-        )
-    ''')
-    
-    # Default sozlamalar
-    default_settings = [
-        ('subscription_enabled', '1'),
-        ('base_channel_id', ''),
-        ('subscription_message', '❗️ Botdan foydalanish uchun quyidagi kanallarga obuna bo\'ling:'),
-        ('channel_button_enabled', '1'),  # Kanal tugmasi yoniq/o'chiq
-        ('channel_button_text', '📢 Kanal'),  # Tugma matni
-        ('channel_button_url', ''),  # Tugma havolasi
-    ]
-    
-    for key, value in default_settings:
-        cursor.execute('''
-            INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)
-        ''', (key, value))
-    
-    # Admins jadvaliga yangi ustunlar qo'shish (migration)
-    try:
-        cursor.execute('ALTER TABLE admins ADD COLUMN can_movies INTEGER DEFAULT 1')
-    except:
-        pass
-    try:
-        cursor.execute('ALTER TABLE admins ADD COLUMN can_channels INTEGER DEFAULT 1')
-    except:
-        pass
-    try:
-        cursor.execute('ALTER TABLE admins ADD COLUMN can_broadcast INTEGER DEFAULT 1')
-    except:
-        pass
-    try:
-        cursor.execute('ALTER TABLE admins ADD COLUMN can_stats INTEGER DEFAULT 1')
-    except:
-        pass
-    try:
-        cursor.execute('ALTER TABLE admins ADD COLUMN can_premium INTEGER DEFAULT 1')
-    except:
-        pass
-    try:
-        cursor.execute('ALTER TABLE admins ADD COLUMN can_admins INTEGER DEFAULT 0')
-    except:
-        pass
-    try:
-        cursor.execute('ALTER TABLE admins ADD COLUMN can_settings INTEGER DEFAULT 0')
-    except:
-        pass
-    
-    # Referal tizimi uchun jadvallar
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS referral_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            referrer_id INTEGER NOT NULL,
-            referred_id INTEGER NOT NULL,
-            bonus_amount INTEGER NOT NULL,
-            created_date TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (referrer_id) REFERENCES users(user_id),
-            FOREIGN KEY (referred_id) REFERENCES users(user_id)
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS withdrawal_requests (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            amount INTEGER NOT NULL,
-            card_number TEXT NOT NULL,
-            status TEXT DEFAULT 'pending',
-            admin_id INTEGER,
-            created_date TEXT DEFAULT CURRENT_TIMESTAMP,
-            processed_date TEXT,
-            FOREIGN KEY (user_id) REFERENCES users(user_id)
-        )
-    ''')
-    
-    # Users jadvaliga referral_balance ustunini qo'shish
-    try:
-        cursor.execute('ALTER TABLE users ADD COLUMN referral_balance INTEGER DEFAULT 0')
-    except:
-        pass
-    
-    # Default referal sozlamalari
-    referral_settings = [
-        ('referral_enabled', '0'),
-        ('referral_bonus', '500'),
-        ('min_withdrawal', '10000'),
-    ]
-    
-    for key, value in referral_settings:
-        cursor.execute('''
-            INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)
-        ''', (key, value))
-    
-    conn.commit()
-    conn.close()
+    """Jadvallarni yaratish / yangilash - faqat qo'llanilmagan migratsiyalar bajariladi"""
+    return run_migrations(get_connection())
 
 
 # ===== FOYDALANUVCHILAR FUNKSIYALARI =====
 
-def add_user(user_id: int, full_name: str, username: str = None):
+async def add_user(user_id: int, full_name: str, username: str = None):
     """Yangi foydalanuvchi qo'shish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''
-            INSERT OR IGNORE INTO users (user_id, full_name, username)
-            VALUES (?, ?, ?)
-        ''', (user_id, full_name, username))
-        conn.commit()
-    except Exception as e:
-        print(f"Foydalanuvchi qo'shishda xatolik: {e}")
-    finally:
-        conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        try:
+            await cursor.execute('''
+                INSERT OR IGNORE INTO users (user_id, full_name, username)
+                VALUES (?, ?, ?)
+            ''', (user_id, full_name, username))
+            # /start bosgan foydalanuvchi botni blokdan chiqargan
+            await cursor.execute('''
+                UPDATE users SET is_reachable = 1 WHERE user_id = ? AND is_reachable = 0
+            ''', (user_id,))
+            await conn.commit()
+        except Exception as e:
+            print(f"Foydalanuvchi qo'shishda xatolik: {e}")
 
 
-def get_users_count():
+async def get_users_count():
     """Foydalanuvchilar sonini olish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT COUNT(*) FROM users')
-    count = cursor.fetchone()[0]
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('SELECT COUNT(*) FROM users')
+        count = (await cursor.fetchone())[0]
     return count
 
 
-def get_all_users():
-    """Barcha foydalanuvchilarni olish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT user_id FROM users')
-    users = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return users
+async def get_reachable_users_count():
+    """Xabar yetib boradigan foydalanuvchilar soni"""
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('SELECT COUNT(*) FROM users WHERE is_reachable = 1')
+        count = (await cursor.fetchone())[0]
+    return count
+
+
+async def set_users_reachable(user_ids: list, reachable: bool):
+    """Yetib borish belgisini o'rnatish (reklama xatoliklari yoki my_chat_member dan)"""
+    async with connection() as conn:
+        await conn.executemany(
+            'UPDATE users SET is_reachable = ? WHERE user_id = ?',
+            [(1 if reachable else 0, user_id) for user_id in user_ids]
+        )
+        await conn.commit()
+
+
+# Foydalanuvchilarni o'qishda bitta sahifa hajmi
+USER_PAGE_SIZE = 1000
+
+
+async def iter_user_pages(after_id: int = 0, max_id: int = None, reachable_only: bool = False,
+                          page_size: int = USER_PAGE_SIZE, segment: str = None):
+    """Foydalanuvchilar sahifalari - [(users.id, user_id), ...], users.id bo'yicha keyset"""
+    # Har bir sahifa alohida so'rov - ulanish sahifalar orasida havzaga qaytadi, xotirada bitta sahifa turadi.
+    # after_id - kursor, max_id - snapshot chegarasi (keyin qo'shilgan foydalanuvchilar kirmaydi),
+    # segment - faqat segment a'zolari (segment_members kaliti bo'yicha keyset)
+    if segment is None:
+        key = 'u.id'
+        query = 'SELECT id, user_id FROM users u WHERE u.id > ?'
+        prefix = ()
+    else:
+        # Tartib segment_members kaliti bo'yicha - sahifa PRIMARY KEY dan o'qiladi (saralashsiz)
+        key = 'm.user_row'
+        query = '''
+            SELECT u.id, u.user_id FROM segment_members m JOIN users u ON u.id = m.user_row
+            WHERE m.segment = ? AND m.user_row > ?
+        '''
+        prefix = (segment,)
+    if max_id is not None:
+        query += f' AND {key} <= ?'
+    if reachable_only:
+        query += ' AND u.is_reachable = 1'
+    query += f' ORDER BY {key} LIMIT ?'
+    while True:
+        params = prefix + ((after_id, max_id, page_size) if max_id is not None else (after_id, page_size))
+        async with connection() as conn:
+            cursor = await conn.cursor()
+            await cursor.execute(query, params)
+            page = [(row[0], row[1]) for row in await cursor.fetchall()]
+        if not page:
+            return
+        yield page
+        after_id = page[-1][0]
+
+
+async def iter_user_ids(reachable_only: bool = False):
+    """Foydalanuvchilar ID lari - bittadan (sahifalab o'qiladi)"""
+    async for page in iter_user_pages(reachable_only=reachable_only):
+        for _, user_id in page:
+            yield user_id
+
+
+async def get_user_ids_snapshot(reachable_only: bool = False) -> array:
+    """Barcha ID lar ixcham massivda - array('q'), har biri 8 bayt (list dagi int obyektlar o'rniga)"""
+    user_ids = array('q')
+    async for page in iter_user_pages(reachable_only=reachable_only):
+        user_ids.extend(user_id for _, user_id in page)
+    return user_ids
+
+
+async def get_all_users():
+    """Barcha foydalanuvchilarni olish (ixcham array('q'))"""
+    return await get_user_ids_snapshot()
 
 
 # ===== KINOLAR FUNKSIYALARI =====
 
-def add_movie(code: str, title: str, file_id: str, genre: str = None, duration: str = None,
-              caption: str = None, added_by: int = None):
+class MovieCache:
+    """Kinolar keshi - kod -> kino qatori, LRU. Yo'q kodlar alohida kichik LRU da -
+    erkin matn qidiruvlari mashhur kinolarni keshdan siqib chiqarmaydi"""
+
+    def __init__(self, max_size: int = 5000, negative_size: int = 1000):
+        self.max_size = max_size
+        self.negative_size = negative_size
+        self._entries = OrderedDict()
+        self._missing = OrderedDict()
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, code: str):
+        """Kod bo'yicha kino - keshda bo'lsa bazaga murojaat yo'q"""
+        if code in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(code)
+            return self._entries[code]
+        if code in self._missing:
+            self.hits += 1
+            self._missing.move_to_end(code)
+            return None
+
+        self.misses += 1
+        version = self._version
+        async with connection() as conn:
+            cursor = await conn.cursor()
+            await cursor.execute('SELECT * FROM movies WHERE code = ?', (code,))
+            movie = await cursor.fetchone()
+        # O'qish paytida kino qo'shilgan/o'chirilgan bo'lsa - saqlanmaydi
+        if version == self._version:
+            entries, size = (self._entries, self.max_size) if movie is not None else (self._missing, self.negative_size)
+            entries[code] = movie
+            if len(entries) > size:
+                entries.popitem(last=False)
+        return movie
+
+    def invalidate(self, code: str = None):
+        """Bitta kod (yoki hammasi) uchun keshni tashlash"""
+        self._version += 1
+        if code is None:
+            self._entries.clear()
+            self._missing.clear()
+        else:
+            code = normalize_code(code)
+            self._entries.pop(code, None)
+            self._missing.pop(code, None)
+
+    def stats(self) -> dict:
+        """Kesh statistikasi"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'missing': len(self._missing),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total * 100 if total else 0
+        }
+
+
+movie_cache = MovieCache(MOVIE_CACHE_SIZE, MOVIE_NEGATIVE_CACHE_SIZE)
+
+
+def normalize_code(code: str) -> str:
+    """Kino kodini bir xil ko'rinishga keltirish (chetdagi bo'shliqlarsiz)"""
+    return str(code).strip()
+
+
+def get_movie_cache_stats() -> dict:
+    """Kinolar keshi hit/miss hisoblagichlari"""
+    return movie_cache.stats()
+
+
+async def add_movie(code: str, title: str, file_id: str, genre: str = None, duration: str = None,
+                    caption: str = None, added_by: int = None):
     """Yangi kino qo'shish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''
-            INSERT INTO movies (code, title, genre, duration, file_id, caption, added_by)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (code, title, genre, duration, file_id, caption, added_by))
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False  # Code allaqachon mavjud
-    except Exception as e:
-        print(f"Kino qo'shishda xatolik: {e}")
-        return False
-    finally:
-        conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        try:
+            await cursor.execute('''
+                INSERT INTO movies (code, title, genre, duration, file_id, caption, added_by)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (code, title, genre, duration, file_id, caption, added_by))
+            await index_movie(cursor, cursor.lastrowid, code, title)
+            await conn.commit()
+            movie_cache.invalidate(code)
+            return True
+        except sqlite3.IntegrityError:
+            return False  # Code allaqachon mavjud
+        except Exception as e:
+            print(f"Kino qo'shishda xatolik: {e}")
+            return False
 
 
-def add_movie_with_message_id(code: str, title: str, file_id: str, genre: str = None, duration: str = None,
-                               caption: str = None, added_by: int = None, 
-                               base_channel_id: int = None, message_id: int = None):
+async def add_movie_with_message_id(code: str, title: str, file_id: str, genre: str = None, duration: str = None,
+                                     caption: str = None, added_by: int = None, 
+                                     base_channel_id: int = None, message_id: int = None):
     """Yangi kino qo'shish - baza kanal message_id bilan"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''
-            INSERT INTO movies (code, title, genre, duration, file_id, caption, added_by, base_channel_id, message_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (code, title, genre, duration, file_id, caption, added_by, base_channel_id, message_id))
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False  # Code allaqachon mavjud
-    except Exception as e:
-        print(f"Kino qo'shishda xatolik: {e}")
-        return False
-    finally:
-        conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        try:
+            await cursor.execute('''
+                INSERT INTO movies (code, title, genre, duration, file_id, caption, added_by, base_channel_id, message_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (code, title, genre, duration, file_id, caption, added_by, base_channel_id, message_id))
+            await index_movie(cursor, cursor.lastrowid, code, title)
+            await conn.commit()
+            movie_cache.invalidate(code)
+            return True
+        except sqlite3.IntegrityError:
+            return False  # Code allaqachon mavjud
+        except Exception as e:
+            print(f"Kino qo'shishda xatolik: {e}")
+            return False
 
 
-def get_movie_by_code(code: str):
+async def get_movie_by_code(code: str):
     """Kod bo'yicha kinoni topish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM movies WHERE code = ?', (code,))
-    movie = cursor.fetchone()
-    conn.close()
-    return movie
+    return await movie_cache.get(normalize_code(code))
 
 
-def delete_movie(code: str):
+async def delete_movie(code: str):
     """Kinoni o'chirish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM movies WHERE code = ?', (code,))
-    deleted = cursor.rowcount > 0
-    conn.commit()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('DELETE FROM movies_fts WHERE rowid IN (SELECT id FROM movies WHERE code = ?)', (code,))
+        await cursor.execute('DELETE FROM movies WHERE code = ?', (code,))
+        deleted = cursor.rowcount > 0
+        await conn.commit()
+    movie_cache.invalidate(code)
     return deleted
 
 
-def get_movies_count():
+async def get_movies_count():
     """Kinolar sonini olish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT COUNT(*) FROM movies')
-    count = cursor.fetchone()[0]
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('SELECT COUNT(*) FROM movies')
+        count = (await cursor.fetchone())[0]
     return count
 
 
-def search_movies(query: str):
-    """Kinolarni qidirish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM movies 
-        WHERE title LIKE ? OR code LIKE ?
-        LIMIT 10
-    ''', (f'%{query}%', f'%{query}%'))
-    movies = cursor.fetchall()
-    conn.close()
+async def index_movie(cursor, movie_id: int, code: str, title: str):
+    """Kinoni qidiruv indeksiga qo'shish (kino bilan bitta tranzaksiyada)"""
+    await cursor.execute('''
+        INSERT INTO movies_fts (rowid, code, title) VALUES (?, ?, ?)
+    ''', (movie_id, normalize_text(code), normalize_text(title)))
+
+
+# Qidiruv natijalari soni
+SEARCH_LIMIT = 10
+
+
+def search_match_query(query: str) -> str:
+    """Foydalanuvchi matnidan FTS5 so'rovi - har bir so'z prefiks sifatida"""
+    return ' '.join(f'"{term}"*' for term in search_terms(query))
+
+
+async def search_movies(query: str):
+    """Kinolarni qidirish (FTS5, bm25 bo'yicha saralangan, lotin/kirill farqsiz)"""
+    match = search_match_query(query)
+    if not match:
+        return []
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        # bm25 barcha mosliklar bo'yicha FTS so'rovi ichida saralanadi - eski kino ham kuchli moslikda chiqadi
+        await cursor.execute('''
+            SELECT m.* FROM (
+                SELECT rowid, bm25(movies_fts) AS score FROM movies_fts
+                WHERE movies_fts MATCH ?
+                ORDER BY bm25(movies_fts)
+                LIMIT ?
+            ) AS found
+            JOIN movies m ON m.id = found.rowid
+            ORDER BY found.score
+        ''', (match, SEARCH_LIMIT))
+        movies = await cursor.fetchall()
     return movies
 
 
-def get_all_movies():
+async def get_all_movies():
     """Barcha kinolarni olish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM movies ORDER BY id DESC')
-    movies = cursor.fetchall()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('SELECT * FROM movies ORDER BY id DESC')
+        movies = await cursor.fetchall()
     return movies
 
 
 # ===== STATISTIKA =====
 
 def add_view(movie_id: int, user_id: int):
-    """Ko'rish statistikasini qo'shish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO statistics (movie_id, user_id)
-        VALUES (?, ?)
-    ''', (movie_id, user_id))
-    conn.commit()
-    conn.close()
+    """Ko'rish statistikasini qo'shish (buferga - bazaga fonda yoziladi)"""
+    view_buffer.add(movie_id, user_id)
 
 
-def get_total_views():
+async def get_total_views():
     """Jami ko'rishlar soni"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT COUNT(*) FROM statistics')
-    count = cursor.fetchone()[0]
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('SELECT COUNT(*) FROM statistics')
+        count = (await cursor.fetchone())[0]
     return count
 
 
 # ===== KANALLAR FUNKSIYALARI =====
 
-def add_channel(channel_id: int, channel_username: str, title: str, url: str = None, 
-                invite_link: str = None, is_request_group: bool = False, is_external_link: bool = False):
+async def add_channel(channel_id: int, channel_username: str, title: str, url: str = None, 
+                      invite_link: str = None, is_request_group: bool = False, is_external_link: bool = False):
     """Yangi kanal qo'shish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        if not url and channel_username:
-            url = f"https://t.me/{channel_username.replace('@', '')}"
-        cursor.execute('''
-            INSERT INTO channels (channel_id, channel_username, title, url, invite_link, is_request_group, is_external_link)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (channel_id, channel_username, title, url, invite_link, 1 if is_request_group else 0, 1 if is_external_link else 0))
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False
-    except Exception as e:
-        print(f"Kanal qo'shishda xatolik: {e}")
-        return False
-    finally:
-        conn.close()
-
-
-def get_all_channels():
-    """Barcha faol kanallarni olish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM channels WHERE is_active = 1')
-    rows = cursor.fetchall()
-    conn.close()
-    # Row ni dict ga o'tkazish
-    channels = []
-    for row in rows:
-        channels.append({
-            'id': row['id'],
-            'channel_id': row['channel_id'],
-            'channel_username': row['channel_username'],
-            'title': row['title'],
-            'url': row['url'],
-            'invite_link': row['invite_link'],
-            'is_request_group': row['is_request_group'],
-            'is_external_link': row['is_external_link'] if 'is_external_link' in row.keys() else 0,
-            'is_active': row['is_active'],
-            'added_date': row['added_date']
-        })
-    return channels
-
-
-def get_channel_by_id(channel_id: int):
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        try:
+            if not url and channel_username:
+                url = f"https://t.me/{channel_username.replace('@', '')}"
+            await cursor.execute('''
+                INSERT INTO channels (channel_id, channel_username, title, url, invite_link, is_request_group, is_external_link)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (channel_id, channel_username, title, url, invite_link, 1 if is_request_group else 0, 1 if is_external_link else 0))
+            await conn.commit()
+            channel_cache.invalidate()
+            return True
+        except sqlite3.IntegrityError:
+            return False
+        except Exception as e:
+            print(f"Kanal qo'shishda xatolik: {e}")
+            return False
+
+
+class Channel(NamedTuple):
+    """Kanal yozuvi (o'zgarmas) - ch['title'] va ch.get('url') ko'rinishida ham o'qiladi"""
+    id: int
+    channel_id: int
+    channel_username: str
+    title: str
+    url: str
+    invite_link: str
+    is_request_group: int
+    is_external_link: int
+    is_active: int
+    added_date: str
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+
+class ChannelCache:
+    """Faol kanallar - o'zgarmas snapshot (tuple), kanal qo'shilganda/o'chirilganda yangilanadi"""
+
+    def __init__(self):
+        self.version = 0
+        self._channels = None
+
+    async def get(self) -> tuple:
+        """Joriy snapshot (birinchi marta bazadan yuklanadi)"""
+        while self._channels is None:
+            version = self.version
+            async with connection() as conn:
+                cursor = await conn.cursor()
+                await cursor.execute('''
+                    SELECT id, channel_id, channel_username, title, url, invite_link,
+                           is_request_group, is_external_link, is_active, added_date
+                    FROM channels WHERE is_active = 1
+                ''')
+                rows = await cursor.fetchall()
+            if version == self.version:
+                self._channels = tuple(Channel(*row) for row in rows)
+        return self._channels
+
+    def invalidate(self):
+        """Snapshotni tashlash - versiya oshadi"""
+        self.version += 1
+        self._channels = None
+
+
+channel_cache = ChannelCache()
+
+
+async def get_all_channels():
+    """Barcha faol kanallarni olish (keshlangan snapshot)"""
+    return await channel_cache.get()
+
+
+async def get_channel_by_id(channel_id: int):
     """Kanal ID bo'yicha topish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM channels WHERE channel_id = ?', (channel_id,))
-    channel = cursor.fetchone()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('SELECT * FROM channels WHERE channel_id = ?', (channel_id,))
+        channel = await cursor.fetchone()
     return channel
 
 
-def delete_channel(channel_id: int):
+async def delete_channel(channel_id: int):
     """Kanalni o'chirish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM channels WHERE channel_id = ?', (channel_id,))
-    deleted = cursor.rowcount > 0
-    conn.commit()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('DELETE FROM channels WHERE channel_id = ?', (channel_id,))
+        deleted = cursor.rowcount > 0
+        await cursor.execute('DELETE FROM channel_members WHERE channel_id = ?', (channel_id,))
+        await conn.commit()
+    channel_cache.invalidate()
     return deleted
 
 
-def get_channels_count():
+async def get_channels_count():
     """Kanallar sonini olish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT COUNT(*) FROM channels WHERE is_active = 1')
-    count = cursor.fetchone()[0]
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('SELECT COUNT(*) FROM channels WHERE is_active = 1')
+        count = (await cursor.fetchone())[0]
     return count
 
 
 # ===== SOZLAMALAR FUNKSIYALARI =====
 
-def get_setting(key: str, default: str = None):
+class SettingsCache:
+    """settings jadvali xotirada - bir marta yuklanadi, yozishda yangilanadi"""
+
+    def __init__(self):
+        self._values = None
+        self._version = 0
+
+    async def get(self, key: str, default: str = None):
+        """Sozlamani xotiradan olish (birinchi marta butun jadval yuklanadi)"""
+        while self._values is None:
+            version = self._version
+            async with connection() as conn:
+                cursor = await conn.cursor()
+                await cursor.execute('SELECT key, value FROM settings')
+                rows = await cursor.fetchall()
+            # Yuklash paytida yozuv bo'lgan bo'lsa - qaytadan yuklash
+            if version == self._version:
+                self._values = {row[0]: row[1] for row in rows}
+        return self._values.get(key, default)
+
+    def update(self, values: dict):
+        """Bazaga yozilgan qiymatlarni xotiraga ham yozish"""
+        self._version += 1
+        if self._values is not None:
+            self._values.update(values)
+
+    def remove(self, *keys):
+        """O'chirilgan kalitlarni xotiradan olib tashlash"""
+        self._version += 1
+        if self._values is not None:
+            for key in keys:
+                self._values.pop(key, None)
+
+    def reload(self):
+        """Keshni tashlash - keyingi o'qishda jadval qaytadan yuklanadi"""
+        self._version += 1
+        self._values = None
+
+
+settings_cache = SettingsCache()
+
+
+async def get_setting(key: str, default: str = None):
     """Sozlamani olish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT value FROM settings WHERE key = ?', (key,))
-    row = cursor.fetchone()
-    conn.close()
-    return row[0] if row else default
+    return await settings_cache.get(key, default)
+
 
+async def set_settings(values: dict):
+    """Bir nechta sozlamani bitta tranzaksiyada saqlash"""
+    async with connection() as conn:
+        await conn.executemany('''
+            INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)
+        ''', list(values.items()))
+        await conn.commit()
+    settings_cache.update(values)
 
-def set_setting(key: str, value: str):
+
+async def set_setting(key: str, value: str):
     """Sozlamani saqlash"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)
-    ''', (key, value))
-    conn.commit()
-    conn.close()
+    await set_settings({key: value})
+
 
+async def delete_settings(*keys):
+    """Sozlamalarni o'chirish"""
+    async with connection() as conn:
+        await conn.executemany('DELETE FROM settings WHERE key = ?', [(key,) for key in keys])
+        await conn.commit()
+    settings_cache.remove(*keys)
 
-def is_subscription_enabled():
+
+async def is_subscription_enabled():
     """Majburiy obuna yoqilganmi"""
-    return get_setting('subscription_enabled', '1') == '1'
+    return await get_setting('subscription_enabled', '1') == '1'
 
 
-def toggle_subscription():
+async def toggle_subscription():
     """Majburiy obunani yoqish/o'chirish"""
-    current = is_subscription_enabled()
-    set_setting('subscription_enabled', '0' if current else '1')
+    current = await is_subscription_enabled()
+    await set_setting('subscription_enabled', '0' if current else '1')
     return not current
 
 
-def get_base_channel():
+async def get_base_channel():
     """Baza kanalni olish"""
-    return get_setting('base_channel_id', '')
+    return await get_setting('base_channel_id', '')
 
 
-def set_base_channel(channel_id: str):
+async def set_base_channel(channel_id: str):
     """Baza kanalni sozlash"""
-    set_setting('base_channel_id', channel_id)
+    await set_setting('base_channel_id', channel_id)
 
 
-def get_subscription_message():
+async def get_subscription_message():
     """Obuna xabarini olish"""
-    return get_setting('subscription_message', '❗️ Botdan foydalanish uchun quyidagi kanallarga obuna bo\'ling:')
+    return await get_setting('subscription_message', '❗️ Botdan foydalanish uchun quyidagi kanallarga obuna bo\'ling:')
 
 
-def set_subscription_message(message: str):
+async def set_subscription_message(message: str):
     """Obuna xabarini o'zgartirish"""
-    set_setting('subscription_message', message)
+    await set_setting('subscription_message', message)
 
 
 # ===== KANAL TUGMASI SOZLAMALARI =====
 
-def is_channel_button_enabled():
+async def is_channel_button_enabled():
     """Kanal tugmasi yoniqmi"""
-    return get_setting('channel_button_enabled', '1') == '1'
+    return await get_setting('channel_button_enabled', '1') == '1'
 
 
-def toggle_channel_button():
+async def toggle_channel_button():
     """Kanal tugmasini yoniq/o'chiq qilish"""
-    current = is_channel_button_enabled()
-    set_setting('channel_button_enabled', '0' if current else '1')
+    current = await is_channel_button_enabled()
+    await set_setting('channel_button_enabled', '0' if current else '1')
     return not current
 
 
-def get_channel_button_text():
+async def get_channel_button_text():
     """Kanal tugmasi matnini olish"""
-    return get_setting('channel_button_text', '📢 Kanal')
+    return await get_setting('channel_button_text', '📢 Kanal')
 
 
-def set_channel_button_text(text: str):
+async def set_channel_button_text(text: str):
     """Kanal tugmasi matnini o'zgartirish"""
-    set_setting('channel_button_text', text)
+    await set_setting('channel_button_text', text)
 
 
-def get_channel_button_url():
+async def get_channel_button_url():
     """Kanal tugmasi havolasini olish"""
-    return get_setting('channel_button_url', '')
+    return await get_setting('channel_button_url', '')
 
 
-def set_channel_button_url(url: str):
+async def set_channel_button_url(url: str):
     """Kanal tugmasi havolasini o'zgartirish"""
-    set_setting('channel_button_url', url)
+    await set_setting('channel_button_url', url)
 
 
 # ===== ADMINLAR FUNKSIYALARI =====
 
-def add_admin(user_id: int, full_name: str = None, permissions: dict = None):
+# Config adminlari - barcha huquqlar
+SUPER_PERMISSIONS = {
+    'can_movies': True,
+    'can_channels': True,
+    'can_broadcast': True,
+    'can_stats': True,
+    'can_premium': True,
+    'can_admins': True,
+    'can_settings': True,
+    'is_super': True
+}
+
+
+ADMINS_QUERY = '''
+    SELECT user_id, can_movies, can_channels, can_broadcast, can_stats, can_premium, can_admins, can_settings
+    FROM admins
+'''
+
+
+class AdminRegistry:
+    """Adminlar xotirada - ID lar to'plami va huquqlar lug'ati.
+    Birinchi yuklash (ishga tushish, tiklash) sinxron; async o'zgartirishlardan keyin havza ulanishi orqali qayta to'ldiriladi"""
+
+    def __init__(self):
+        self._ids = None
+        self._permissions = {}
+        self._version = 0
+
+    def _load(self):
+        """admins jadvalini bitta so'rov bilan yuklash (sinxron - faqat birinchi murojaatda)"""
+        self._version += 1
+        self._fill(get_connection().execute(ADMINS_QUERY).fetchall())
+
+    async def reload(self, conn):
+        """O'zgartirish commit qilingandan keyin shu ulanish orqali qayta yuklash - event loop bloklanmaydi"""
+        self._version += 1
+        version = self._version
+        cursor = await conn.execute(ADMINS_QUERY)
+        rows = await cursor.fetchall()
+        # Parallel qayta yuklash boshlangan bo'lsa - uning natijasi yangiroq
+        if version == self._version:
+            self._fill(rows)
+
+    def _fill(self, rows):
+        """Qatorlardan ID lar to'plami va huquqlar lug'atini qurish"""
+        from config import ADMINS
+
+        permissions = {
+            row[0]: {
+                'can_movies': bool(row[1]),
+                'can_channels': bool(row[2]),
+                'can_broadcast': bool(row[3]),
+                'can_stats': bool(row[4]),
+                'can_premium': bool(row[5]),
+                'can_admins': bool(row[6]),
+                'can_settings': bool(row[7]),
+                'is_super': False
+            }
+            for row in rows
+        }
+        for user_id in ADMINS:
+            permissions[user_id] = SUPER_PERMISSIONS
+
+        self._permissions = permissions
+        self._ids = frozenset(permissions)
+
+    def contains(self, user_id: int) -> bool:
+        """Foydalanuvchi adminmi"""
+        if self._ids is None:
+            self._load()
+        return user_id in self._ids
+
+    def permissions(self, user_id: int):
+        """Admin huquqlari (admin bo'lmasa None)"""
+        if self._ids is None:
+            self._load()
+        return self._permissions.get(user_id)
+
+    def invalidate(self):
+        """Keshni tashlash - keyingi tekshiruvda qayta yuklanadi"""
+        self._version += 1
+        self._ids = None
+        self._permissions = {}
+
+
+admin_registry = AdminRegistry()
+
+
+async def add_admin(user_id: int, full_name: str = None, permissions: dict = None):
     """Admin qo'shish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Default huquqlar
-    default_perms = {
-        'can_movies': 1,
-        'can_channels': 1,
-        'can_broadcast': 1,
-        'can_stats': 1,
-        'can_premium': 1,
-        'can_admins': 0,
-        'can_settings': 0
-    }
-    
-    if permissions:
-        default_perms.update(permissions)
-    
-    try:
-        cursor.execute('''
-            INSERT OR REPLACE INTO admins 
-            (user_id, full_name, can_movies, can_channels, can_broadcast, can_stats, can_premium, can_admins, can_settings)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            user_id, full_name,
-            default_perms['can_movies'],
-            default_perms['can_channels'],
-            default_perms['can_broadcast'],
-            default_perms['can_stats'],
-            default_perms['can_premium'],
-            default_perms['can_admins'],
-            default_perms['can_settings']
-        ))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Admin qo'shishda xatolik: {e}")
-        return False
-    finally:
-        conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+
+        # Default huquqlar
+        default_perms = {
+            'can_movies': 1,
+            'can_channels': 1,
+            'can_broadcast': 1,
+            'can_stats': 1,
+            'can_premium': 1,
+            'can_admins': 0,
+            'can_settings': 0
+        }
+
+        if permissions:
+            default_perms.update(permissions)
+
+        try:
+            await cursor.execute('''
+                INSERT OR REPLACE INTO admins 
+                (user_id, full_name, can_movies, can_channels, can_broadcast, can_stats, can_premium, can_admins, can_settings)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                user_id, full_name,
+                default_perms['can_movies'],
+                default_perms['can_channels'],
+                default_perms['can_broadcast'],
+                default_perms['can_stats'],
+                default_perms['can_premium'],
+                default_perms['can_admins'],
+                default_perms['can_settings']
+            ))
+            await conn.commit()
+            await admin_registry.reload(conn)
+            return True
+        except Exception as e:
+            print(f"Admin qo'shishda xatolik: {e}")
+            return False
 
 
-def remove_admin(user_id: int):
+async def remove_admin(user_id: int):
     """Adminni o'chirish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM admins WHERE user_id = ?', (user_id,))
-    deleted = cursor.rowcount > 0
-    conn.commit()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('DELETE FROM admins WHERE user_id = ?', (user_id,))
+        deleted = cursor.rowcount > 0
+        await conn.commit()
+        await admin_registry.reload(conn)
     return deleted
 
 
-def get_all_admins():
+async def get_all_admins():
     """Barcha adminlarni olish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT user_id FROM admins')
-    admins = [row[0] for row in cursor.fetchall()]
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('SELECT user_id FROM admins')
+        admins = [row[0] for row in await cursor.fetchall()]
     return admins
 
 
 def get_admin_permissions(user_id: int):
     """Admin huquqlarini olish"""
-    from config import ADMINS
-    
-    # Config admin - barcha huquqlar
-    if user_id in ADMINS:
-        return {
-            'can_movies': True,
-            'can_channels': True,
-            'can_broadcast': True,
-            'can_stats': True,
-            'can_premium': True,
-            'can_admins': True,
-            'can_settings': True,
-            'is_super': True
-        }
-    
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT can_movies, can_channels, can_broadcast, can_stats, can_premium, can_admins, can_settings
-        FROM admins WHERE user_id = ?
-    ''', (user_id,))
-    row = cursor.fetchone()
-    conn.close()
-    
-    if row:
-        return {
-            'can_movies': bool(row[0]),
-            'can_channels': bool(row[1]),
-            'can_broadcast': bool(row[2]),
-            'can_stats': bool(row[3]),
-            'can_premium': bool(row[4]),
-            'can_admins': bool(row[5]),
-            'can_settings': bool(row[6]),
-            'is_super': False
-        }
-    return None
+    perms = admin_registry.permissions(user_id)
+    return dict(perms) if perms else None
 
 
-def update_admin_permission(user_id: int, permission: str, value: bool):
+async def update_admin_permission(user_id: int, permission: str, value: bool):
     """Admin huquqini yangilash"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(f'''
-            UPDATE admins SET {permission} = ? WHERE user_id = ?
-        ''', (1 if value else 0, user_id))
-        conn.commit()
-        return cursor.rowcount > 0
-    except Exception as e:
-        print(f"Huquq yangilashda xatolik: {e}")
-        return False
-    finally:
-        conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        try:
+            await cursor.execute(f'''
+                UPDATE admins SET {permission} = ? WHERE user_id = ?
+            ''', (1 if value else 0, user_id))
+            await conn.commit()
+            await admin_registry.reload(conn)
+            return cursor.rowcount > 0
+        except Exception as e:
+            print(f"Huquq yangilashda xatolik: {e}")
+            return False
 
 
 def is_admin(user_id: int):
     """Foydalanuvchi adminmi tekshirish"""
-    from config import ADMINS
-    db_admins = get_all_admins()
-    return user_id in ADMINS or user_id in db_admins
+    return admin_registry.contains(user_id)
 
 
 def has_permission(user_id: int, permission: str):
     """Admin ma'lum huquqga egami tekshirish"""
-    perms = get_admin_permissions(user_id)
+    perms = admin_registry.permissions(user_id)
     if not perms:
         return False
     return perms.get(permission, False)
@@ -723,717 +1039,964 @@ def has_permission(user_id: int, permission: str):
 
 # ===== STATISTIKA KENGAYTIRILGAN =====
 
-def get_today_users():
+def day_range(day: str):
+    """Kun uchun yarim ochiq oraliq [day, keyingi kun) - DATE(ustun) o'rniga indeks bilan qidirish"""
+    next_day = (datetime.strptime(day, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+    return day, next_day
+
+
+async def get_today_users():
     """Bugun qo'shilgan foydalanuvchilar"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    today = datetime.now().strftime('%Y-%m-%d')
-    cursor.execute('''
-        SELECT COUNT(*) FROM users 
-        WHERE DATE(joined_date) = ?
-    ''', (today,))
-    count = cursor.fetchone()[0]
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        today = datetime.now().strftime('%Y-%m-%d')
+        await cursor.execute('''
+            SELECT COUNT(*) FROM users 
+            WHERE joined_date >= ? AND joined_date < ?
+        ''', day_range(today))
+        count = (await cursor.fetchone())[0]
     return count
 
 
-def get_today_views():
+async def get_today_views():
     """Bugungi ko'rishlar"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    today = datetime.now().strftime('%Y-%m-%d')
-    cursor.execute('''
-        SELECT COUNT(*) FROM statistics 
-        WHERE DATE(watched_date) = ?
-    ''', (today,))
-    count = cursor.fetchone()[0]
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        today = datetime.now().strftime('%Y-%m-%d')
+        await cursor.execute('''
+            SELECT COUNT(*) FROM statistics 
+            WHERE watched_date >= ? AND watched_date < ?
+        ''', day_range(today))
+        count = (await cursor.fetchone())[0]
     return count
 
 
-def get_weekly_users():
+async def get_weekly_users():
     """Haftalik yangi foydalanuvchilar"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-    cursor.execute('''
-        SELECT COUNT(*) FROM users 
-        WHERE DATE(joined_date) >= ?
-    ''', (week_ago,))
-    count = cursor.fetchone()[0]
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+        await cursor.execute('''
+            SELECT COUNT(*) FROM users 
+            WHERE joined_date >= ?
+        ''', (week_ago,))
+        count = (await cursor.fetchone())[0]
     return count
 
 
 # ============ Qo'shilish so'rovlari ============
 
-def add_join_request(user_id: int, channel_id: int):
+async def add_join_request(user_id: int, channel_id: int):
     """Qo'shilish so'rovini saqlash"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''
-            INSERT OR REPLACE INTO join_requests (user_id, channel_id, request_date)
-            VALUES (?, ?, CURRENT_TIMESTAMP)
-        ''', (user_id, channel_id))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Join request saqlashda xatolik: {e}")
-        return False
-    finally:
-        conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        try:
+            await cursor.execute('''
+                INSERT OR REPLACE INTO join_requests (user_id, channel_id, request_date)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+            ''', (user_id, channel_id))
+            await conn.commit()
+            return True
+        except Exception as e:
+            print(f"Join request saqlashda xatolik: {e}")
+            return False
 
 
-def has_join_request(user_id: int, channel_id: int) -> bool:
+async def has_join_request(user_id: int, channel_id: int) -> bool:
     """Foydalanuvchi so'rov yuborgan yoki yo'qligini tekshirish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT COUNT(*) FROM join_requests 
-        WHERE user_id = ? AND channel_id = ?
-    ''', (user_id, channel_id))
-    count = cursor.fetchone()[0]
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+            SELECT COUNT(*) FROM join_requests 
+            WHERE user_id = ? AND channel_id = ?
+        ''', (user_id, channel_id))
+        count = (await cursor.fetchone())[0]
     return count > 0
 
 
-def remove_join_request(user_id: int, channel_id: int):
+async def remove_join_request(user_id: int, channel_id: int):
     """So'rovni o'chirish (qabul qilinganda yoki rad etilganda)"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        DELETE FROM join_requests WHERE user_id = ? AND channel_id = ?
-    ''', (user_id, channel_id))
-    conn.commit()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+            DELETE FROM join_requests WHERE user_id = ? AND channel_id = ?
+        ''', (user_id, channel_id))
+        await conn.commit()
+
+
+# ============ Kanal a'zoligi jurnali ============
+
+async def set_channel_member(user_id: int, channel_id: int, status: str):
+    """A'zolik holatini saqlash (chat_member yangilanishi yoki jonli tekshiruvdan)"""
+    async with connection() as conn:
+        await conn.execute('''
+            INSERT OR REPLACE INTO channel_members (user_id, channel_id, status, updated_date)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (user_id, channel_id, status))
+        await conn.commit()
+
+
+async def get_channel_statuses(user_id: int) -> dict:
+    """Foydalanuvchining barcha kanallardagi holati - {channel_id: (status, yozuv yoshi soniyada)}"""
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+            SELECT channel_id, status, (julianday('now') - julianday(updated_date)) * 86400
+            FROM channel_members WHERE user_id = ?
+        ''', (user_id,))
+        rows = await cursor.fetchall()
+    return {row[0]: (row[1], row[2]) for row in rows}
+
+
+async def forget_channel_members(channel_id: int):
+    """Kanal jurnalini tozalash (bot kanaldan chiqarilganda - yangilanishlar kelmaydi)"""
+    async with connection() as conn:
+        await conn.execute('DELETE FROM channel_members WHERE channel_id = ?', (channel_id,))
+        await conn.commit()
+
+
+# ============ Reklama yuborish vazifalari ============
+
+# Vazifa holatlari: running - yuborilmoqda, paused - to'xtatilgan, cancelled - bekor qilingan, done - tugagan,
+# failed - xatolik tufayli to'xtatilgan
+BROADCAST_ACTIVE_STATUSES = ('running', 'paused')
+
+
+async def create_broadcast(admin_id: int, payload: str, segment: str = None) -> int:
+    """Yangi vazifa - qabul qiluvchilar hozirgi yetib boradigan foydalanuvchilar (users.id <= MAX(id)),
+    segment berilsa - faqat uning a'zolari"""
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('SELECT COALESCE(MAX(id), 0) FROM users')
+        max_user_id = (await cursor.fetchone())[0]
+        total = await _count_segment_reachable(cursor, segment)
+        await cursor.execute('''
+            INSERT INTO broadcasts (admin_id, payload, max_user_id, total, segment)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (admin_id, payload, max_user_id, total, segment))
+        await conn.commit()
+        return cursor.lastrowid
+
+
+async def get_broadcast(broadcast_id: int):
+    """Vazifani olish"""
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('SELECT * FROM broadcasts WHERE id = ?', (broadcast_id,))
+        return await cursor.fetchone()
+
+
+async def get_active_broadcasts() -> list:
+    """Tugamagan vazifalar (yuborilayotgan va to'xtatilgan), eskisi birinchi"""
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute(
+            'SELECT * FROM broadcasts WHERE status IN (?, ?) ORDER BY id',
+            BROADCAST_ACTIVE_STATUSES
+        )
+        return await cursor.fetchall()
+
+
+async def get_next_broadcast():
+    """Navbatdagi yuborilayotgan vazifa"""
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute("SELECT * FROM broadcasts WHERE status = 'running' ORDER BY id LIMIT 1")
+        return await cursor.fetchone()
+
+
+async def set_broadcast_status(broadcast_id: int, status: str) -> bool:
+    """Holatni o'zgartirish (faqat tugamagan vazifalar uchun)"""
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+            UPDATE broadcasts SET status = ?,
+                finished_date = CASE WHEN ? IN ('cancelled', 'done', 'failed') THEN CURRENT_TIMESTAMP END
+            WHERE id = ? AND status IN (?, ?)
+        ''', (status, status, broadcast_id, *BROADCAST_ACTIVE_STATUSES))
+        await conn.commit()
+        return cursor.rowcount > 0
+
+
+async def save_broadcast_progress(broadcast_id: int, cursor_id: int, sent: int, failed: int, blocked: int = 0):
+    """Partiya natijasini saqlash (checkpoint) - blocked xatoliklar (failed) ichida, xatoliklar hisobi nolga"""
+    async with connection() as conn:
+        await conn.execute('''
+            UPDATE broadcasts SET cursor = ?, sent = sent + ?, failed = failed + ?, blocked = blocked + ?, errors = 0
+            WHERE id = ?
+        ''', (cursor_id, sent, failed, blocked, broadcast_id))
+        await conn.commit()
+
+
+async def record_broadcast_error(broadcast_id: int, error: str) -> int:
+    """Vazifa xatoligini yozish - ketma-ket xatoliklar soni qaytadi"""
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+            UPDATE broadcasts SET errors = errors + 1, last_error = ? WHERE id = ?
+        ''', (error[:500], broadcast_id))
+        await cursor.execute('SELECT errors FROM broadcasts WHERE id = ?', (broadcast_id,))
+        row = await cursor.fetchone()
+        await conn.commit()
+        return row[0] if row else 0
+
+
+async def set_broadcast_status_message(broadcast_id: int, chat_id: int, message_id: int):
+    """Vazifa holati ko'rsatiladigan xabar (fon ishchisi uni yangilab turadi)"""
+    async with connection() as conn:
+        await conn.execute('''
+            UPDATE broadcasts SET status_chat_id = ?, status_message_id = ?
+            WHERE id = ?
+        ''', (chat_id, message_id, broadcast_id))
+        await conn.commit()
+
+
+# ============ Auditoriya segmentlari ============
+
+# Segmentni yangilash bo'lagi (users.id oralig'i) - har bo'lak alohida qisqa tranzaksiya
+SEGMENT_CHUNK_SIZE = 5000
+
+# Faol premium obuna (premium_cache bilan bir xil shart)
+PREMIUM_CONDITION = '''EXISTS (
+    SELECT 1 FROM premium_subscriptions p
+    WHERE p.user_id = u.user_id AND p.is_active = 1 AND p.end_date > CURRENT_TIMESTAMP
+)'''
+
+# Oxirgi N kunda kino ko'rgan (idx_statistics_user_date)
+ACTIVE_CONDITION = '''EXISTS (
+    SELECT 1 FROM statistics s WHERE s.user_id = u.user_id AND s.watched_date >= datetime('now', ?)
+)'''
+
+
+def segment_condition(definition: dict) -> tuple:
+    """Segment mezonlari -> users u bo'yicha SQL sharti va parametrlar (mezonlar AND bilan)
+
+    active_days / inactive_days - oxirgi N kunda kino ko'rgan / ko'rmagan
+    premium - faol premium obunasi bor (true) yoki yo'q (false)
+    joined_within_days / joined_before_days - N kun ichida / N kundan oldin qo'shilgan
+    referred - referal orqali kelgan (true) yoki yo'q (false), referred_by - shu foydalanuvchi taklif qilgan
+    referrer - kamida bitta do'st taklif qilgan (true) yoki yo'q (false)
+    """
+    conditions, params = [], []
+    for key, value in definition.items():
+        if key == 'active_days':
+            conditions.append(ACTIVE_CONDITION)
+            params.append(f'-{int(value)} days')
+        elif key == 'inactive_days':
+            conditions.append(f'NOT {ACTIVE_CONDITION}')
+            params.append(f'-{int(value)} days')
+        elif key == 'premium':
+            conditions.append(PREMIUM_CONDITION if value else f'NOT {PREMIUM_CONDITION}')
+        elif key == 'joined_within_days':
+            conditions.append("u.joined_date >= datetime('now', ?)")
+            params.append(f'-{int(value)} days')
+        elif key == 'joined_before_days':
+            conditions.append("u.joined_date < datetime('now', ?)")
+            params.append(f'-{int(value)} days')
+        elif key == 'referred':
+            conditions.append('u.referred_by IS NOT NULL' if value else 'u.referred_by IS NULL')
+        elif key == 'referred_by':
+            conditions.append('u.referred_by = ?')
+            params.append(int(value))
+        elif key == 'referrer':
+            clause = 'EXISTS (SELECT 1 FROM users r WHERE r.referred_by = u.user_id)'
+            conditions.append(clause if value else f'NOT {clause}')
+        else:
+            raise ValueError(f"Noma'lum segment mezoni: {key}")
+    return ' AND '.join(conditions) or '1', params
+
+
+async def _count_segment_reachable(cursor, segment: str = None) -> int:
+    """Xabar yetib boradigan a'zolar soni (segment berilmasa - barcha foydalanuvchilar)"""
+    if segment is None:
+        await cursor.execute('SELECT COUNT(*) FROM users WHERE is_reachable = 1')
+    else:
+        await cursor.execute('''
+            SELECT COUNT(*) FROM segment_members m JOIN users u ON u.id = m.user_row
+            WHERE m.segment = ? AND u.is_reachable = 1
+        ''', (segment,))
+    return (await cursor.fetchone())[0]
+
+
+async def get_segments() -> list:
+    """Barcha segmentlar (hajmi oxirgi yangilanishdagi - darhol ko'rsatish uchun)"""
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('SELECT * FROM segments ORDER BY rowid')
+        return await cursor.fetchall()
+
+
+async def get_segment(key: str):
+    """Segmentni olish"""
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('SELECT * FROM segments WHERE key = ?', (key,))
+        return await cursor.fetchone()
+
+
+async def refresh_segment(key: str, stop: asyncio.Event = None) -> int:
+    """Segment a'zolarini yangilash - users.id bo'laklari bo'yicha faqat farq yoziladi.
+    O'zgargan a'zolar soni qaytadi (stop o'rnatilsa bo'laklar orasida to'xtaydi)"""
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('SELECT definition FROM segments WHERE key = ?', (key,))
+        row = await cursor.fetchone()
+        await cursor.execute('SELECT COALESCE(MAX(id), 0) FROM users')
+        max_user_id = (await cursor.fetchone())[0]
+    if row is None:
+        return 0
+    condition, params = segment_condition(json.loads(row[0]))
+
+    changes = 0
+    for low in range(0, max_user_id, SEGMENT_CHUNK_SIZE):
+        if stop is not None and stop.is_set():
+            return changes
+        high = low + SEGMENT_CHUNK_SIZE
+        async with connection() as conn:
+            cursor = await conn.cursor()
+            await cursor.execute(f'''
+                SELECT u.id FROM users u WHERE u.id > ? AND u.id <= ? AND {condition}
+            ''', (low, high, *params))
+            matching = {row[0] for row in await cursor.fetchall()}
+            await cursor.execute('''
+                SELECT user_row FROM segment_members WHERE segment = ? AND user_row > ? AND user_row <= ?
+            ''', (key, low, high))
+            current = {row[0] for row in await cursor.fetchall()}
+            removed, added = current - matching, matching - current
+            if removed:
+                await conn.executemany(
+                    'DELETE FROM segment_members WHERE segment = ? AND user_row = ?',
+                    [(key, user_row) for user_row in removed]
+                )
+            if added:
+                await conn.executemany(
+                    'INSERT INTO segment_members (segment, user_row) VALUES (?, ?)',
+                    [(key, user_row) for user_row in added]
+                )
+            await conn.commit()
+        changes += len(removed) + len(added)
+
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        # O'chirilgan foydalanuvchilar (MAX(id) dan keyingi qoldiqlar)
+        await cursor.execute('DELETE FROM segment_members WHERE segment = ? AND user_row > ?', (key, max_user_id))
+        size = await _count_segment_reachable(cursor, key)
+        await cursor.execute('''
+            UPDATE segments SET size = ?, refreshed_date = CURRENT_TIMESTAMP WHERE key = ?
+        ''', (size, key))
+        await conn.commit()
+    return changes
 
 
 # ============ Premium funksiyalari ============
 
-def add_premium_plan(name: str, duration_days: int, price: int, description: str = None):
+async def add_premium_plan(name: str, duration_days: int, price: int, description: str = None):
     """Yangi tarif qo'shish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''
-            INSERT INTO premium_plans (name, duration_days, price, description)
-            VALUES (?, ?, ?, ?)
-        ''', (name, duration_days, price, description))
-        conn.commit()
-        return True
-    except:
-        return False
-    finally:
-        conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        try:
+            await cursor.execute('''
+                INSERT INTO premium_plans (name, duration_days, price, description)
+                VALUES (?, ?, ?, ?)
+            ''', (name, duration_days, price, description))
+            await conn.commit()
+            return True
+        except:
+            return False
 
 
-def get_all_premium_plans():
+async def get_all_premium_plans():
     """Barcha tariflarni olish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM premium_plans WHERE is_active = 1')
-    plans = cursor.fetchall()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('SELECT * FROM premium_plans WHERE is_active = 1')
+        plans = await cursor.fetchall()
     return [dict(p) for p in plans]
 
 
-def get_premium_plan(plan_id: int):
+async def get_premium_plan(plan_id: int):
     """Tarif ma'lumotlarini olish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM premium_plans WHERE id = ?', (plan_id,))
-    plan = cursor.fetchone()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('SELECT * FROM premium_plans WHERE id = ?', (plan_id,))
+        plan = await cursor.fetchone()
     return dict(plan) if plan else None
 
 
-def delete_premium_plan(plan_id: int):
+async def delete_premium_plan(plan_id: int):
     """Tarifni o'chirish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('UPDATE premium_plans SET is_active = 0 WHERE id = ?', (plan_id,))
-    deleted = cursor.rowcount > 0
-    conn.commit()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('UPDATE premium_plans SET is_active = 0 WHERE id = ?', (plan_id,))
+        deleted = cursor.rowcount > 0
+        await conn.commit()
     return deleted
 
 
-def add_premium_request(user_id: int, plan_id: int, file_id: str, file_type: str):
+async def add_premium_request(user_id: int, plan_id: int, file_id: str, file_type: str):
     """Premium so'rov qo'shish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''
-            INSERT INTO premium_requests (user_id, plan_id, file_id, file_type)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, plan_id, file_id, file_type))
-        conn.commit()
-        return cursor.lastrowid
-    except:
-        return None
-    finally:
-        conn.close()
-
-
-def get_pending_premium_requests():
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        try:
+            await cursor.execute('''
+                INSERT INTO premium_requests (user_id, plan_id, file_id, file_type)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, plan_id, file_id, file_type))
+            await conn.commit()
+            return cursor.lastrowid
+        except:
+            return None
+
+
+async def get_pending_premium_requests():
     """Kutilayotgan so'rovlarni olish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT pr.*, pp.name as plan_name, pp.duration_days, pp.price,
-               u.full_name, u.username
-        FROM premium_requests pr
-        JOIN premium_plans pp ON pr.plan_id = pp.id
-        JOIN users u ON pr.user_id = u.user_id
-        WHERE pr.status = 'pending'
-        ORDER BY pr.created_date DESC
-    ''')
-    requests = cursor.fetchall()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+            SELECT pr.*, pp.name as plan_name, pp.duration_days, pp.price,
+                   u.full_name, u.username
+            FROM premium_requests pr
+            JOIN premium_plans pp ON pr.plan_id = pp.id
+            JOIN users u ON pr.user_id = u.user_id
+            WHERE pr.status = 'pending'
+            ORDER BY pr.created_date DESC
+        ''')
+        requests = await cursor.fetchall()
     return [dict(r) for r in requests]
 
 
-def get_premium_request(request_id: int):
+async def get_premium_request(request_id: int):
     """So'rov ma'lumotlarini olish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT pr.*, pp.name as plan_name, pp.duration_days, pp.price
-        FROM premium_requests pr
-        JOIN premium_plans pp ON pr.plan_id = pp.id
-        WHERE pr.id = ?
-    ''', (request_id,))
-    request = cursor.fetchone()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+            SELECT pr.*, pp.name as plan_name, pp.duration_days, pp.price
+            FROM premium_requests pr
+            JOIN premium_plans pp ON pr.plan_id = pp.id
+            WHERE pr.id = ?
+        ''', (request_id,))
+        request = await cursor.fetchone()
     return dict(request) if request else None
 
 
-def approve_premium_request(request_id: int, admin_id: int):
+async def approve_premium_request(request_id: int, admin_id: int):
     """Premium so'rovni tasdiqlash"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # So'rov ma'lumotlarini olish
-    cursor.execute('''
-        SELECT pr.user_id, pp.duration_days 
-        FROM premium_requests pr
-        JOIN premium_plans pp ON pr.plan_id = pp.id
-        WHERE pr.id = ?
-    ''', (request_id,))
-    result = cursor.fetchone()
-    
-    if not result:
-        conn.close()
-        return False
-    
-    user_id = result['user_id']
-    duration_days = result['duration_days']
-    
-    # Obunani qo'shish
-    end_date = (datetime.now() + timedelta(days=duration_days)).strftime('%Y-%m-%d %H:%M:%S')
-    
-    # Mavjud obunani tekshirish
-    cursor.execute('SELECT * FROM premium_subscriptions WHERE user_id = ? AND is_active = 1', (user_id,))
-    existing = cursor.fetchone()
-    
-    if existing:
-        # Mavjud obunaga qo'shish
-        current_end = datetime.strptime(existing['end_date'], '%Y-%m-%d %H:%M:%S')
-        new_end = current_end + timedelta(days=duration_days)
-        cursor.execute('UPDATE premium_subscriptions SET end_date = ? WHERE id = ?', 
-                      (new_end.strftime('%Y-%m-%d %H:%M:%S'), existing['id']))
-    else:
-        # Yangi obuna
-        cursor.execute('''
-            INSERT INTO premium_subscriptions (user_id, plan_id, end_date)
-            VALUES (?, (SELECT plan_id FROM premium_requests WHERE id = ?), ?)
-        ''', (user_id, request_id, end_date))
-    
-    # So'rovni yangilash
-    cursor.execute('''
-        UPDATE premium_requests 
-        SET status = 'approved', admin_id = ?, processed_date = CURRENT_TIMESTAMP
-        WHERE id = ?
-    ''', (admin_id, request_id))
-    
-    conn.commit()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+
+        # So'rov ma'lumotlarini olish
+        await cursor.execute('''
+            SELECT pr.user_id, pp.duration_days 
+            FROM premium_requests pr
+            JOIN premium_plans pp ON pr.plan_id = pp.id
+            WHERE pr.id = ?
+        ''', (request_id,))
+        result = await cursor.fetchone()
+
+        if not result:
+            return False
+
+        user_id = result['user_id']
+        duration_days = result['duration_days']
+
+        # Obunani qo'shish
+        end_date = (datetime.now() + timedelta(days=duration_days)).strftime('%Y-%m-%d %H:%M:%S')
+
+        # Mavjud obunani tekshirish
+        await cursor.execute('SELECT * FROM premium_subscriptions WHERE user_id = ? AND is_active = 1', (user_id,))
+        existing = await cursor.fetchone()
+
+        if existing:
+            # Mavjud obunaga qo'shish
+            current_end = datetime.strptime(existing['end_date'], '%Y-%m-%d %H:%M:%S')
+            new_end = current_end + timedelta(days=duration_days)
+            await cursor.execute('UPDATE premium_subscriptions SET end_date = ? WHERE id = ?', 
+                                 (new_end.strftime('%Y-%m-%d %H:%M:%S'), existing['id']))
+        else:
+            # Yangi obuna
+            await cursor.execute('''
+                INSERT INTO premium_subscriptions (user_id, plan_id, end_date)
+                VALUES (?, (SELECT plan_id FROM premium_requests WHERE id = ?), ?)
+            ''', (user_id, request_id, end_date))
+
+        # So'rovni yangilash
+        await cursor.execute('''
+            UPDATE premium_requests 
+            SET status = 'approved', admin_id = ?, processed_date = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (admin_id, request_id))
+
+        await conn.commit()
+    premium_cache.invalidate(user_id)
     return True
 
 
-def reject_premium_request(request_id: int, admin_id: int):
+async def reject_premium_request(request_id: int, admin_id: int):
     """Premium so'rovni rad etish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE premium_requests 
-        SET status = 'rejected', admin_id = ?, processed_date = CURRENT_TIMESTAMP
-        WHERE id = ?
-    ''', (admin_id, request_id))
-    updated = cursor.rowcount > 0
-    conn.commit()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+            UPDATE premium_requests 
+            SET status = 'rejected', admin_id = ?, processed_date = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (admin_id, request_id))
+        updated = cursor.rowcount > 0
+        await conn.commit()
     return updated
 
 
-def is_premium_user(user_id: int) -> bool:
+class PremiumCache:
+    """Premium holati keshi - user_id -> obuna tugash vaqti (LRU, cheklangan hajm)"""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._version = 0
+
+    async def is_premium(self, user_id: int) -> bool:
+        """Premium tekshirish - tugash vaqti o'tguncha bazaga murojaat yo'q"""
+        if user_id in self._entries:
+            self._entries.move_to_end(user_id)
+            end_date = self._entries[user_id]
+        else:
+            version = self._version
+            async with connection() as conn:
+                cursor = await conn.cursor()
+                await cursor.execute('''
+                    SELECT MAX(end_date) FROM premium_subscriptions
+                    WHERE user_id = ? AND is_active = 1
+                ''', (user_id,))
+                end_date = (await cursor.fetchone())[0]
+            # O'qish paytida obuna o'zgargan bo'lsa - eski qiymat saqlanmaydi
+            if version == self._version:
+                self._entries[user_id] = end_date
+                if len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        # end_date > CURRENT_TIMESTAMP bilan bir xil solishtirish (UTC)
+        return end_date is not None and end_date > datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+
+    def invalidate(self, user_id: int = None):
+        """Bitta foydalanuvchi (yoki hammasi) uchun keshni tashlash"""
+        self._version += 1
+        if user_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(user_id, None)
+
+
+premium_cache = PremiumCache(PREMIUM_CACHE_SIZE)
+
+
+async def is_premium_user(user_id: int) -> bool:
     """Foydalanuvchi premium ekanligini tekshirish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM premium_subscriptions 
-        WHERE user_id = ? AND is_active = 1 AND end_date > CURRENT_TIMESTAMP
-    ''', (user_id,))
-    result = cursor.fetchone()
-    conn.close()
-    return result is not None
+    return await premium_cache.is_premium(user_id)
 
 
-def get_user_premium_info(user_id: int):
+async def get_user_premium_info(user_id: int):
     """Foydalanuvchi premium ma'lumotlarini olish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT ps.*, pp.name as plan_name
-        FROM premium_subscriptions ps
-        LEFT JOIN premium_plans pp ON ps.plan_id = pp.id
-        WHERE ps.user_id = ? AND ps.is_active = 1 AND ps.end_date > CURRENT_TIMESTAMP
-    ''', (user_id,))
-    result = cursor.fetchone()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+            SELECT ps.*, pp.name as plan_name
+            FROM premium_subscriptions ps
+            LEFT JOIN premium_plans pp ON ps.plan_id = pp.id
+            WHERE ps.user_id = ? AND ps.is_active = 1 AND ps.end_date > CURRENT_TIMESTAMP
+        ''', (user_id,))
+        result = await cursor.fetchone()
     return dict(result) if result else None
 
 
-def get_premium_users_count():
+async def get_premium_users():
+    """Faol premium foydalanuvchilar ro'yxati"""
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+            SELECT ps.*, u.full_name, u.username, pp.name as plan_name
+            FROM premium_subscriptions ps
+            JOIN users u ON ps.user_id = u.user_id
+            LEFT JOIN premium_plans pp ON ps.plan_id = pp.id
+            WHERE ps.is_active = 1 AND ps.end_date > CURRENT_TIMESTAMP
+            ORDER BY ps.end_date DESC
+        ''')
+        users = await cursor.fetchall()
+    return users
+
+
+async def get_premium_users_count():
     """Premium foydalanuvchilar soni"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT COUNT(DISTINCT user_id) FROM premium_subscriptions 
-        WHERE is_active = 1 AND end_date > CURRENT_TIMESTAMP
-    ''')
-    count = cursor.fetchone()[0]
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+            SELECT COUNT(DISTINCT user_id) FROM premium_subscriptions 
+            WHERE is_active = 1 AND end_date > CURRENT_TIMESTAMP
+        ''')
+        count = (await cursor.fetchone())[0]
     return count
 
 
-def is_premium_enabled() -> bool:
+async def is_premium_enabled() -> bool:
     """Premium tizimi yoniqligini tekshirish"""
-    return get_setting('premium_enabled') == '1'
+    return await get_setting('premium_enabled') == '1'
 
 
-def set_premium_enabled(enabled: bool):
+async def set_premium_enabled(enabled: bool):
     """Premium tizimini yoqish/o'chirish"""
-    set_setting('premium_enabled', '1' if enabled else '0')
+    await set_setting('premium_enabled', '1' if enabled else '0')
 
 
-def get_payment_card():
+async def get_payment_card():
     """To'lov kartasini olish"""
-    return get_setting('payment_card')
+    return await get_setting('payment_card')
 
 
-def set_payment_card(card: str):
+async def set_payment_card(card: str):
     """To'lov kartasini saqlash"""
-    set_setting('payment_card', card)
+    await set_setting('payment_card', card)
 
 
 # ============ Kengaytirilgan Statistika ============
 
-def get_daily_stats(days: int = 7):
+async def get_daily_stats(days: int = 7):
     """Kunlik statistika"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    stats = []
-    for i in range(days):
-        date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-        
-        # Yangi foydalanuvchilar
-        cursor.execute('SELECT COUNT(*) FROM users WHERE DATE(joined_date) = ?', (date,))
-        new_users = cursor.fetchone()[0]
-        
-        # Ko'rishlar
-        cursor.execute('SELECT COUNT(*) FROM statistics WHERE DATE(watched_date) = ?', (date,))
-        views = cursor.fetchone()[0]
-        
-        stats.append({
-            'date': date,
-            'new_users': new_users,
-            'views': views
-        })
-    
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+
+        stats = []
+        for i in range(days):
+            date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
+
+            # Yangi foydalanuvchilar
+            await cursor.execute('SELECT COUNT(*) FROM users WHERE joined_date >= ? AND joined_date < ?', day_range(date))
+            new_users = (await cursor.fetchone())[0]
+
+            # Ko'rishlar
+            await cursor.execute('SELECT COUNT(*) FROM statistics WHERE watched_date >= ? AND watched_date < ?', day_range(date))
+            views = (await cursor.fetchone())[0]
+
+            stats.append({
+                'date': date,
+                'new_users': new_users,
+                'views': views
+            })
+
     return stats
 
 
-def get_top_movies(limit: int = 10):
+async def get_top_movies(limit: int = 10):
     """Eng ko'p ko'rilgan kinolar"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT m.code, m.title, COUNT(s.id) as views
-        FROM movies m
-        LEFT JOIN statistics s ON m.id = s.movie_id
-        GROUP BY m.id
-        ORDER BY views DESC
-        LIMIT ?
-    ''', (limit,))
-    movies = cursor.fetchall()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+            SELECT m.code, m.title, COUNT(s.id) as views
+            FROM movies m
+            LEFT JOIN statistics s ON m.id = s.movie_id
+            GROUP BY m.id
+            ORDER BY views DESC
+            LIMIT ?
+        ''', (limit,))
+        movies = await cursor.fetchall()
     return [dict(m) for m in movies]
 
 
-def get_active_users(days: int = 7):
+async def get_active_users(days: int = 7):
     """Faol foydalanuvchilar (oxirgi X kunda kino ko'rganlar)"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-    cursor.execute('''
-        SELECT COUNT(DISTINCT user_id) FROM statistics 
-        WHERE DATE(watched_date) >= ?
-    ''', (date,))
-    count = cursor.fetchone()[0]
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        await cursor.execute('''
+            SELECT COUNT(DISTINCT user_id) FROM statistics 
+            WHERE watched_date >= ?
+        ''', (date,))
+        count = (await cursor.fetchone())[0]
     return count
 
 
-def get_monthly_stats():
+async def get_monthly_stats():
     """Oylik statistika"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    stats = []
-    for i in range(12):
-        date = datetime.now() - timedelta(days=i*30)
-        month_start = date.replace(day=1).strftime('%Y-%m-%d')
-        if i == 0:
-            month_end = datetime.now().strftime('%Y-%m-%d')
-        else:
-            month_end = (date.replace(day=1) + timedelta(days=32)).replace(day=1).strftime('%Y-%m-%d')
-        
-        cursor.execute('''
-            SELECT COUNT(*) FROM users 
-            WHERE DATE(joined_date) >= ? AND DATE(joined_date) < ?
-        ''', (month_start, month_end))
-        new_users = cursor.fetchone()[0]
-        
-        stats.append({
-            'month': date.strftime('%Y-%m'),
-            'new_users': new_users
-        })
-    
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+
+        stats = []
+        for i in range(12):
+            date = datetime.now() - timedelta(days=i*30)
+            month_start = date.replace(day=1).strftime('%Y-%m-%d')
+            if i == 0:
+                month_end = datetime.now().strftime('%Y-%m-%d')
+            else:
+                month_end = (date.replace(day=1) + timedelta(days=32)).replace(day=1).strftime('%Y-%m-%d')
+
+            await cursor.execute('''
+                SELECT COUNT(*) FROM users 
+                WHERE joined_date >= ? AND joined_date < ?
+            ''', (month_start, month_end))
+            new_users = (await cursor.fetchone())[0]
+
+            stats.append({
+                'month': date.strftime('%Y-%m'),
+                'new_users': new_users
+            })
+
     return stats[::-1]
 
 
 # ===== REFERAL TIZIMI FUNKSIYALARI =====
 
-def is_referral_enabled():
+async def is_referral_enabled():
     """Referal tizimi yoniqmi"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT value FROM settings WHERE key = 'referral_enabled'")
-    result = cursor.fetchone()
-    conn.close()
-    return result[0] == '1' if result else False
+    return await get_setting('referral_enabled', '0') == '1'
 
 
-def set_referral_enabled(enabled: bool):
+async def set_referral_enabled(enabled: bool):
     """Referal tizimini yoniq/o'chiq qilish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT OR REPLACE INTO settings (key, value) VALUES ('referral_enabled', ?)
-    ''', ('1' if enabled else '0',))
-    conn.commit()
-    conn.close()
+    await set_setting('referral_enabled', '1' if enabled else '0')
 
 
-def get_referral_bonus():
+async def get_referral_bonus():
     """Har bir referal uchun bonus summasi"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT value FROM settings WHERE key = 'referral_bonus'")
-    result = cursor.fetchone()
-    conn.close()
-    return int(result[0]) if result else 500
+    return int(await get_setting('referral_bonus', '500'))
 
 
-def set_referral_bonus(amount: int):
+async def set_referral_bonus(amount: int):
     """Referal bonus summasini belgilash"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT OR REPLACE INTO settings (key, value) VALUES ('referral_bonus', ?)
-    ''', (str(amount),))
-    conn.commit()
-    conn.close()
+    await set_setting('referral_bonus', str(amount))
 
 
-def get_min_withdrawal():
+async def get_min_withdrawal():
     """Minimal pul chiqarish summasi"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT value FROM settings WHERE key = 'min_withdrawal'")
-    result = cursor.fetchone()
-    conn.close()
-    return int(result[0]) if result else 10000
+    return int(await get_setting('min_withdrawal', '10000'))
 
 
-def set_min_withdrawal(amount: int):
+async def set_min_withdrawal(amount: int):
     """Minimal pul chiqarish summasini belgilash"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT OR REPLACE INTO settings (key, value) VALUES ('min_withdrawal', ?)
-    ''', (str(amount),))
-    conn.commit()
-    conn.close()
+    await set_setting('min_withdrawal', str(amount))
 
 
-def add_user_with_referral(user_id: int, full_name: str, username: str = None, referred_by: int = None):
+async def add_user_with_referral(user_id: int, full_name: str, username: str = None, referred_by: int = None):
     """Yangi foydalanuvchi qo'shish (referal bilan)"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        # Foydalanuvchi mavjudligini tekshirish
-        cursor.execute('SELECT user_id FROM users WHERE user_id = ?', (user_id,))
-        existing = cursor.fetchone()
-        
-        if existing:
-            # Foydalanuvchi mavjud, ma'lumotlarni yangilash
-            cursor.execute('''
-                UPDATE users SET full_name = ?, username = ? WHERE user_id = ?
-            ''', (full_name, username, user_id))
-            conn.commit()
-            conn.close()
-            return False  # Yangi emas
-        
-        # Yangi foydalanuvchi qo'shish
-        cursor.execute('''
-            INSERT INTO users (user_id, full_name, username, referred_by)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, full_name, username, referred_by))
-        
-        # Agar referal bo'lsa, taklif qilgan foydalanuvchiga bonus berish
-        if referred_by:
-            bonus = get_referral_bonus()
-            cursor.execute('''
-                UPDATE users SET referral_balance = COALESCE(referral_balance, 0) + ? 
-                WHERE user_id = ?
-            ''', (bonus, referred_by))
-            
-            # Referal tarixiga qo'shish
-            cursor.execute('''
-                INSERT INTO referral_history (referrer_id, referred_id, bonus_amount)
-                VALUES (?, ?, ?)
-            ''', (referred_by, user_id, bonus))
-        
-        conn.commit()
-        conn.close()
-        return True  # Yangi foydalanuvchi
-    except Exception as e:
-        print(f"Foydalanuvchi qo'shishda xatolik: {e}")
-        conn.close()
-        return False
-
-
-def get_user_referral_balance(user_id: int):
+    # Bonus summasini oldindan olish - ulanish ichida ikkinchi ulanish olmaslik uchun
+    bonus = await get_referral_bonus() if referred_by else 0
+
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        try:
+            # Foydalanuvchi mavjudligini tekshirish
+            await cursor.execute('SELECT user_id FROM users WHERE user_id = ?', (user_id,))
+            existing = await cursor.fetchone()
+
+            if existing:
+                # Foydalanuvchi mavjud, ma'lumotlarni yangilash
+                await cursor.execute('''
+                    UPDATE users SET full_name = ?, username = ?, is_reachable = 1 WHERE user_id = ?
+                ''', (full_name, username, user_id))
+                await conn.commit()
+                return False  # Yangi emas
+
+            # Yangi foydalanuvchi qo'shish
+            await cursor.execute('''
+                INSERT INTO users (user_id, full_name, username, referred_by)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, full_name, username, referred_by))
+
+            # Agar referal bo'lsa, taklif qilgan foydalanuvchiga bonus berish
+            if referred_by:
+                await cursor.execute('''
+                    UPDATE users SET referral_balance = COALESCE(referral_balance, 0) + ? 
+                    WHERE user_id = ?
+                ''', (bonus, referred_by))
+
+                # Referal tarixiga qo'shish
+                await cursor.execute('''
+                    INSERT INTO referral_history (referrer_id, referred_id, bonus_amount)
+                    VALUES (?, ?, ?)
+                ''', (referred_by, user_id, bonus))
+
+            await conn.commit()
+            return True  # Yangi foydalanuvchi
+        except Exception as e:
+            print(f"Foydalanuvchi qo'shishda xatolik: {e}")
+            return False
+
+
+async def get_user_referral_balance(user_id: int):
     """Foydalanuvchining referal balansini olish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT referral_balance FROM users WHERE user_id = ?', (user_id,))
-    result = cursor.fetchone()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('SELECT referral_balance FROM users WHERE user_id = ?', (user_id,))
+        result = await cursor.fetchone()
     return result[0] if result and result[0] else 0
 
 
-def get_user_referral_count(user_id: int):
+async def get_user_referral_count(user_id: int):
     """Foydalanuvchi taklif qilgan odamlar soni"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT COUNT(*) FROM users WHERE referred_by = ?', (user_id,))
-    count = cursor.fetchone()[0]
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('SELECT COUNT(*) FROM users WHERE referred_by = ?', (user_id,))
+        count = (await cursor.fetchone())[0]
     return count
 
 
-def get_user_referrals(user_id: int):
+async def get_user_referrals(user_id: int):
     """Foydalanuvchi taklif qilgan odamlar ro'yxati"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT user_id, full_name, username, joined_date 
-        FROM users WHERE referred_by = ?
-        ORDER BY joined_date DESC
-    ''', (user_id,))
-    referrals = cursor.fetchall()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+            SELECT user_id, full_name, username, joined_date 
+            FROM users WHERE referred_by = ?
+            ORDER BY joined_date DESC
+        ''', (user_id,))
+        referrals = await cursor.fetchall()
     return referrals
 
 
-def get_referral_history(user_id: int):
+async def get_referral_history(user_id: int):
     """Foydalanuvchi referal tarixi"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT rh.*, u.full_name, u.username 
-        FROM referral_history rh
-        LEFT JOIN users u ON rh.referred_id = u.user_id
-        WHERE rh.referrer_id = ?
-        ORDER BY rh.created_date DESC
-    ''', (user_id,))
-    history = cursor.fetchall()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+            SELECT rh.*, u.full_name, u.username 
+            FROM referral_history rh
+            LEFT JOIN users u ON rh.referred_id = u.user_id
+            WHERE rh.referrer_id = ?
+            ORDER BY rh.created_date DESC
+        ''', (user_id,))
+        history = await cursor.fetchall()
     return history
 
 
-def create_withdrawal_request(user_id: int, amount: int, card_number: str):
+async def create_withdrawal_request(user_id: int, amount: int, card_number: str):
     """Pul chiqarish so'rovi yaratish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        # Balansni tekshirish
-        cursor.execute('SELECT referral_balance FROM users WHERE user_id = ?', (user_id,))
-        balance = cursor.fetchone()
-        if not balance or balance[0] < amount:
-            conn.close()
-            return False, "Balans yetarli emas"
-        
-        # So'rov yaratish
-        cursor.execute('''
-            INSERT INTO withdrawal_requests (user_id, amount, card_number, status)
-            VALUES (?, ?, ?, 'pending')
-        ''', (user_id, amount, card_number))
-        
-        # Balansdan ayirish
-        cursor.execute('''
-            UPDATE users SET referral_balance = referral_balance - ? WHERE user_id = ?
-        ''', (amount, user_id))
-        
-        conn.commit()
-        conn.close()
-        return True, "So'rov yuborildi"
-    except Exception as e:
-        conn.close()
-        return False, str(e)
-
-
-def get_pending_withdrawals():
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        try:
+            # Balansni tekshirish
+            await cursor.execute('SELECT referral_balance FROM users WHERE user_id = ?', (user_id,))
+            balance = await cursor.fetchone()
+            if not balance or balance[0] < amount:
+                return False, "Balans yetarli emas"
+
+            # So'rov yaratish
+            await cursor.execute('''
+                INSERT INTO withdrawal_requests (user_id, amount, card_number, status)
+                VALUES (?, ?, ?, 'pending')
+            ''', (user_id, amount, card_number))
+
+            # Balansdan ayirish
+            await cursor.execute('''
+                UPDATE users SET referral_balance = referral_balance - ? WHERE user_id = ?
+            ''', (amount, user_id))
+
+            await conn.commit()
+            return True, "So'rov yuborildi"
+        except Exception as e:
+            return False, str(e)
+
+
+async def get_pending_withdrawals():
     """Kutilayotgan pul chiqarish so'rovlari"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT w.*, u.full_name, u.username 
-        FROM withdrawal_requests w
-        LEFT JOIN users u ON w.user_id = u.user_id
-        WHERE w.status = 'pending'
-        ORDER BY w.created_date ASC
-    ''')
-    requests = cursor.fetchall()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+            SELECT w.*, u.full_name, u.username 
+            FROM withdrawal_requests w
+            LEFT JOIN users u ON w.user_id = u.user_id
+            WHERE w.status = 'pending'
+            ORDER BY w.created_date ASC
+        ''')
+        requests = await cursor.fetchall()
     return requests
 
 
-def get_withdrawal_request(request_id: int):
+async def get_withdrawal_request(request_id: int):
     """Bitta pul chiqarish so'rovini olish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT w.*, u.full_name, u.username 
-        FROM withdrawal_requests w
-        LEFT JOIN users u ON w.user_id = u.user_id
-        WHERE w.id = ?
-    ''', (request_id,))
-    request = cursor.fetchone()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+            SELECT w.*, u.full_name, u.username 
+            FROM withdrawal_requests w
+            LEFT JOIN users u ON w.user_id = u.user_id
+            WHERE w.id = ?
+        ''', (request_id,))
+        request = await cursor.fetchone()
     return request
 
 
-def approve_withdrawal(request_id: int, admin_id: int):
+async def approve_withdrawal(request_id: int, admin_id: int):
     """Pul chiqarish so'rovini tasdiqlash"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''
-            UPDATE withdrawal_requests 
-            SET status = 'approved', admin_id = ?, processed_date = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (admin_id, request_id))
-        conn.commit()
-        conn.close()
-        return True
-    except:
-        conn.close()
-        return False
-
-
-def reject_withdrawal(request_id: int, admin_id: int):
-    """Pul chiqarish so'rovini rad etish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        # So'rov ma'lumotlarini olish
-        cursor.execute('SELECT user_id, amount FROM withdrawal_requests WHERE id = ?', (request_id,))
-        req = cursor.fetchone()
-        if req:
-            # Pulni qaytarish
-            cursor.execute('''
-                UPDATE users SET referral_balance = referral_balance + ? WHERE user_id = ?
-            ''', (req[1], req[0]))
-            
-            # Statusni yangilash
-            cursor.execute('''
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        try:
+            await cursor.execute('''
                 UPDATE withdrawal_requests 
-                SET status = 'rejected', admin_id = ?, processed_date = CURRENT_TIMESTAMP
+                SET status = 'approved', admin_id = ?, processed_date = CURRENT_TIMESTAMP
                 WHERE id = ?
             ''', (admin_id, request_id))
-            
-            conn.commit()
-            conn.close()
+            await conn.commit()
             return True
-        conn.close()
-        return False
-    except:
-        conn.close()
-        return False
+        except:
+            return False
 
 
-def get_total_referral_stats():
+async def reject_withdrawal(request_id: int, admin_id: int):
+    """Pul chiqarish so'rovini rad etish"""
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        try:
+            # So'rov ma'lumotlarini olish
+            await cursor.execute('SELECT user_id, amount FROM withdrawal_requests WHERE id = ?', (request_id,))
+            req = await cursor.fetchone()
+            if req:
+                # Pulni qaytarish
+                await cursor.execute('''
+                    UPDATE users SET referral_balance = referral_balance + ? WHERE user_id = ?
+                ''', (req[1], req[0]))
+
+                # Statusni yangilash
+                await cursor.execute('''
+                    UPDATE withdrawal_requests 
+                    SET status = 'rejected', admin_id = ?, processed_date = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (admin_id, request_id))
+
+                await conn.commit()
+                return True
+            return False
+        except:
+            return False
+
+
+async def get_total_referral_stats():
     """Umumiy referal statistikasi"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Jami referallar
-    cursor.execute('SELECT COUNT(*) FROM users WHERE referred_by IS NOT NULL')
-    total_referrals = cursor.fetchone()[0]
-    
-    # Jami to'langan bonus
-    cursor.execute('SELECT COALESCE(SUM(bonus_amount), 0) FROM referral_history')
-    total_bonuses = cursor.fetchone()[0]
-    
-    # Jami chiqarilgan pul
-    cursor.execute("SELECT COALESCE(SUM(amount), 0) FROM withdrawal_requests WHERE status = 'approved'")
-    total_withdrawn = cursor.fetchone()[0]
-    
-    # Kutilayotgan so'rovlar
-    cursor.execute("SELECT COUNT(*) FROM withdrawal_requests WHERE status = 'pending'")
-    pending_requests = cursor.fetchone()[0]
-    
-    # Top referralchilar
-    cursor.execute('''
-        SELECT u.user_id, u.full_name, u.username, COUNT(r.user_id) as ref_count
-        FROM users u
-        LEFT JOIN users r ON r.referred_by = u.user_id
-        WHERE r.referred_by IS NOT NULL
-        GROUP BY u.user_id
-        ORDER BY ref_count DESC
-        LIMIT 10
-    ''')
-    top_referrers = cursor.fetchall()
-    
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+
+        # Jami referallar
+        await cursor.execute('SELECT COUNT(*) FROM users WHERE referred_by IS NOT NULL')
+        total_referrals = (await cursor.fetchone())[0]
+
+        # Jami to'langan bonus
+        await cursor.execute('SELECT COALESCE(SUM(bonus_amount), 0) FROM referral_history')
+        total_bonuses = (await cursor.fetchone())[0]
+
+        # Jami chiqarilgan pul
+        await cursor.execute("SELECT COALESCE(SUM(amount), 0) FROM withdrawal_requests WHERE status = 'approved'")
+        total_withdrawn = (await cursor.fetchone())[0]
+
+        # Kutilayotgan so'rovlar
+        await cursor.execute("SELECT COUNT(*) FROM withdrawal_requests WHERE status = 'pending'")
+        pending_requests = (await cursor.fetchone())[0]
+
+        # Top referralchilar
+        await cursor.execute('''
+            SELECT u.user_id, u.full_name, u.username, COUNT(r.user_id) as ref_count
+            FROM users u
+            LEFT JOIN users r ON r.referred_by = u.user_id
+            WHERE r.referred_by IS NOT NULL
+            GROUP BY u.user_id
+            ORDER BY ref_count DESC
+            LIMIT 10
+        ''')
+        top_referrers = await cursor.fetchall()
+
     return {
         'total_referrals': total_referrals,
         'total_bonuses': total_bonuses,
@@ -1443,247 +2006,168 @@ def get_total_referral_stats():
     }
 
 
-def get_user_withdrawal_history(user_id: int):
+async def get_user_withdrawal_history(user_id: int):
     """Foydalanuvchining pul chiqarish tarixi"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM withdrawal_requests 
-        WHERE user_id = ?
-        ORDER BY created_date DESC
-    ''', (user_id,))
-    history = cursor.fetchall()
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute('''
+            SELECT * FROM withdrawal_requests 
+            WHERE user_id = ?
+            ORDER BY created_date DESC
+        ''', (user_id,))
+        history = await cursor.fetchall()
     return history
 
 
-def get_referral_message():
+async def get_referral_message():
     """Referal xabarini olish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT value FROM settings WHERE key = 'referral_message'")
-    result = cursor.fetchone()
-    conn.close()
     default_message = """🎬 Siz ham kino ko'ring va pul ishlang!
 
 ✅ Do'stlaringizni taklif qiling
 💰 Har bir do'stingiz uchun bonus oling
 💳 Pulni kartangizga chiqaring"""
-    return result[0] if result else default_message
+    return await get_setting('referral_message', default_message)
 
 
-def set_referral_message(message: str):
+async def set_referral_message(message: str):
     """Referal xabarini saqlash"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT OR REPLACE INTO settings (key, value) VALUES ('referral_message', ?)
-    ''', (message,))
-    conn.commit()
-    conn.close()
+    await set_setting('referral_message', message)
 
 
 # ===== START XABARI SOZLAMALARI =====
 
-def get_start_message():
+async def get_start_message():
     """Start xabarini olish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT value FROM settings WHERE key = 'start_message'")
-    result = cursor.fetchone()
-    conn.close()
     default_message = """🎬 <b>Kino Bot</b>ga xush kelibsiz!
 
 📌 Kino kodini yuboring va kinoni oling!"""
-    return result[0] if result else default_message
+    return await get_setting('start_message', default_message)
 
 
-def set_start_message(message: str):
+async def set_start_message(message: str):
     """Start xabarini saqlash"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT OR REPLACE INTO settings (key, value) VALUES ('start_message', ?)
-    ''', (message,))
-    conn.commit()
-    conn.close()
+    await set_setting('start_message', message)
 
 
-def get_start_media():
+async def get_start_media():
     """Start media (rasm/gif) olish - {'type': 'photo'/'animation', 'file_id': '...'}"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT value FROM settings WHERE key = 'start_media_type'")
-    media_type = cursor.fetchone()
-    cursor.execute("SELECT value FROM settings WHERE key = 'start_media_file_id'")
-    file_id = cursor.fetchone()
-    conn.close()
-    
+    media_type = await get_setting('start_media_type')
+    file_id = await get_setting('start_media_file_id')
+
     if media_type and file_id:
-        return {'type': media_type[0], 'file_id': file_id[0]}
+        return {'type': media_type, 'file_id': file_id}
     return None
 
 
-def set_start_media(media_type: str, file_id: str):
+async def set_start_media(media_type: str, file_id: str):
     """Start media saqlash"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT OR REPLACE INTO settings (key, value) VALUES ('start_media_type', ?)
-    ''', (media_type,))
-    cursor.execute('''
-        INSERT OR REPLACE INTO settings (key, value) VALUES ('start_media_file_id', ?)
-    ''', (file_id,))
-    conn.commit()
-    conn.close()
-
-
-def delete_start_media():
+    await set_settings({'start_media_type': media_type, 'start_media_file_id': file_id})
+
+
+async def delete_start_media():
     """Start media o'chirish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM settings WHERE key = 'start_media_type'")
-    cursor.execute("DELETE FROM settings WHERE key = 'start_media_file_id'")
-    conn.commit()
-    conn.close()
+    await delete_settings('start_media_type', 'start_media_file_id')
 
 
 # ===== BOT UMUMIY SOZLAMALARI =====
 
-def get_bot_name():
+async def get_bot_name():
     """Bot nomini olish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT value FROM settings WHERE key = 'bot_name'")
-    result = cursor.fetchone()
-    conn.close()
-    return result[0] if result else "Kino Bot"
+    return await get_setting('bot_name', "Kino Bot")
 
 
-def set_bot_name(name: str):
+async def set_bot_name(name: str):
     """Bot nomini saqlash"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT OR REPLACE INTO settings (key, value) VALUES ('bot_name', ?)
-    ''', (name,))
-    conn.commit()
-    conn.close()
+    await set_setting('bot_name', name)
 
 
-def is_bot_active():
+async def is_bot_active():
     """Bot faolmi?"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT value FROM settings WHERE key = 'bot_active'")
-    result = cursor.fetchone()
-    conn.close()
-    return result[0] == '1' if result else True
+    return await get_setting('bot_active', '1') == '1'
 
 
-def set_bot_active(active: bool):
+async def set_bot_active(active: bool):
     """Botni yoqish/o'chirish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT OR REPLACE INTO settings (key, value) VALUES ('bot_active', ?)
-    ''', ('1' if active else '0',))
-    conn.commit()
-    conn.close()
+    await set_setting('bot_active', '1' if active else '0')
 
 
-def get_maintenance_message():
+async def get_maintenance_message():
     """Texnik ishlar xabarini olish"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT value FROM settings WHERE key = 'maintenance_message'")
-    result = cursor.fetchone()
-    conn.close()
-    return result[0] if result else "🔧 Bot texnik ishlar sababli vaqtincha to'xtatilgan. Tez orada qaytamiz!"
+    return await get_setting('maintenance_message', "🔧 Bot texnik ishlar sababli vaqtincha to'xtatilgan. Tez orada qaytamiz!")
 
 
-def set_maintenance_message(message: str):
+async def set_maintenance_message(message: str):
     """Texnik ishlar xabarini saqlash"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT OR REPLACE INTO settings (key, value) VALUES ('maintenance_message', ?)
-    ''', (message,))
-    conn.commit()
-    conn.close()
+    await set_setting('maintenance_message', message)
 
 
 # ===== PROFESSIONAL DATA ANALYTICS =====
 
-def get_hourly_stats(date: str = None):
+async def get_hourly_stats(date: str = None):
     """Soatlik statistika - qaysi soatlarda foydalanuvchilar faol"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    if date is None:
-        date = datetime.now().strftime('%Y-%m-%d')
-    
-    hourly_data = {}
-    for hour in range(24):
-        hour_str = f"{hour:02d}"
-        cursor.execute('''
-            SELECT COUNT(*) FROM statistics 
-            WHERE DATE(watched_date) = ? AND strftime('%H', watched_date) = ?
-        ''', (date, hour_str))
-        hourly_data[hour] = cursor.fetchone()[0]
-    
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+
+        if date is None:
+            date = datetime.now().strftime('%Y-%m-%d')
+
+        hourly_data = {hour: 0 for hour in range(24)}
+        await cursor.execute('''
+            SELECT strftime('%H', watched_date) as hour, COUNT(*) FROM statistics 
+            WHERE watched_date >= ? AND watched_date < ?
+            GROUP BY hour
+        ''', day_range(date))
+        for row in await cursor.fetchall():
+            hourly_data[int(row[0])] = row[1]
+
     return hourly_data
 
 
-def get_peak_hours(days: int = 7):
+async def get_peak_hours(days: int = 7):
     """Eng faol soatlarni aniqlash"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    date_from = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-    
-    cursor.execute('''
-        SELECT strftime('%H', watched_date) as hour, COUNT(*) as count
-        FROM statistics
-        WHERE DATE(watched_date) >= ?
-        GROUP BY hour
-        ORDER BY count DESC
-        LIMIT 5
-    ''', (date_from,))
-    
-    results = cursor.fetchall()
-    conn.close()
-    
+    async with connection() as conn:
+        cursor = await conn.cursor()
+
+        date_from = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+
+        await cursor.execute('''
+            SELECT strftime('%H', watched_date) as hour, COUNT(*) as count
+            FROM statistics
+            WHERE watched_date >= ?
+            GROUP BY hour
+            ORDER BY count DESC
+            LIMIT 5
+        ''', (date_from,))
+
+        results = await cursor.fetchall()
+
     return [{'hour': int(r[0]), 'count': r[1]} for r in results]
 
 
-def get_growth_rate(period_days: int = 30):
+async def get_growth_rate(period_days: int = 30):
     """O'sish tezligini hisoblash (foizda)"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Joriy davr
-    current_start = (datetime.now() - timedelta(days=period_days)).strftime('%Y-%m-%d')
-    cursor.execute('''
-        SELECT COUNT(*) FROM users WHERE DATE(joined_date) >= ?
-    ''', (current_start,))
-    current_users = cursor.fetchone()[0]
-    
-    # Oldingi davr
-    prev_start = (datetime.now() - timedelta(days=period_days*2)).strftime('%Y-%m-%d')
-    prev_end = (datetime.now() - timedelta(days=period_days)).strftime('%Y-%m-%d')
-    cursor.execute('''
-        SELECT COUNT(*) FROM users 
-        WHERE DATE(joined_date) >= ? AND DATE(joined_date) < ?
-    ''', (prev_start, prev_end))
-    prev_users = cursor.fetchone()[0]
-    
-    conn.close()
-    
+    async with connection() as conn:
+        cursor = await conn.cursor()
+
+        # Joriy davr
+        current_start = (datetime.now() - timedelta(days=period_days)).strftime('%Y-%m-%d')
+        await cursor.execute('''
+            SELECT COUNT(*) FROM users WHERE joined_date >= ?
+        ''', (current_start,))
+        current_users = (await cursor.fetchone())[0]
+
+        # Oldingi davr
+        prev_start = (datetime.now() - timedelta(days=period_days*2)).strftime('%Y-%m-%d')
+        prev_end = (datetime.now() - timedelta(days=period_days)).strftime('%Y-%m-%d')
+        await cursor.execute('''
+            SELECT COUNT(*) FROM users 
+            WHERE joined_date >= ? AND joined_date < ?
+        ''', (prev_start, prev_end))
+        prev_users = (await cursor.fetchone())[0]
+
     if prev_users == 0:
         return {'current': current_users, 'previous': prev_users, 'growth_rate': 100.0}
-    
+
     growth_rate = ((current_users - prev_users) / prev_users) * 100
     return {
         'current': current_users,
@@ -1692,29 +2176,27 @@ def get_growth_rate(period_days: int = 30):
     }
 
 
-def get_retention_rate(days: int = 7):
+async def get_retention_rate(days: int = 7):
     """Qaytib kelish koeffitsienti - foydalanuvchilar necha marotaba qaytib keladi"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    date_from = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-    
-    # Jami foydalanuvchilar
-    cursor.execute('SELECT COUNT(*) FROM users')
-    total_users = cursor.fetchone()[0]
-    
-    # Oxirgi X kunda faol bo'lgan foydalanuvchilar
-    cursor.execute('''
-        SELECT COUNT(DISTINCT user_id) FROM statistics 
-        WHERE DATE(watched_date) >= ?
-    ''', (date_from,))
-    active_users = cursor.fetchone()[0]
-    
-    conn.close()
-    
+    async with connection() as conn:
+        cursor = await conn.cursor()
+
+        date_from = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+
+        # Jami foydalanuvchilar
+        await cursor.execute('SELECT COUNT(*) FROM users')
+        total_users = (await cursor.fetchone())[0]
+
+        # Oxirgi X kunda faol bo'lgan foydalanuvchilar
+        await cursor.execute('''
+            SELECT COUNT(DISTINCT user_id) FROM statistics 
+            WHERE watched_date >= ?
+        ''', (date_from,))
+        active_users = (await cursor.fetchone())[0]
+
     if total_users == 0:
         return {'total': 0, 'active': 0, 'retention_rate': 0}
-    
+
     retention = (active_users / total_users) * 100
     return {
         'total': total_users,
@@ -1723,34 +2205,33 @@ def get_retention_rate(days: int = 7):
     }
 
 
-def get_user_activity_distribution():
+async def get_user_activity_distribution():
     """Foydalanuvchilar faollik bo'yicha taqsimoti"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Har bir foydalanuvchi nechta kino ko'rgan
-    cursor.execute('''
-        SELECT 
-            CASE 
-                WHEN view_count = 0 THEN 'passive'
-                WHEN view_count BETWEEN 1 AND 5 THEN 'light'
-                WHEN view_count BETWEEN 6 AND 20 THEN 'medium'
-                WHEN view_count BETWEEN 21 AND 50 THEN 'active'
-                ELSE 'super_active'
-            END as category,
-            COUNT(*) as user_count
-        FROM (
-            SELECT u.user_id, COALESCE(COUNT(s.id), 0) as view_count
-            FROM users u
-            LEFT JOIN statistics s ON u.user_id = s.user_id
-            GROUP BY u.user_id
-        )
-        GROUP BY category
-    ''')
-    
-    results = cursor.fetchall()
-    conn.close()
-    
+    async with connection() as conn:
+        cursor = await conn.cursor()
+
+        # Har bir foydalanuvchi nechta kino ko'rgan
+        await cursor.execute('''
+            SELECT 
+                CASE 
+                    WHEN view_count = 0 THEN 'passive'
+                    WHEN view_count BETWEEN 1 AND 5 THEN 'light'
+                    WHEN view_count BETWEEN 6 AND 20 THEN 'medium'
+                    WHEN view_count BETWEEN 21 AND 50 THEN 'active'
+                    ELSE 'super_active'
+                END as category,
+                COUNT(*) as user_count
+            FROM (
+                SELECT u.user_id, COALESCE(COUNT(s.id), 0) as view_count
+                FROM users u
+                LEFT JOIN statistics s ON u.user_id = s.user_id
+                GROUP BY u.user_id
+            )
+            GROUP BY category
+        ''')
+
+        results = await cursor.fetchall()
+
     categories = {
         'passive': 0,      # 0 ko'rish
         'light': 0,        # 1-5 ko'rish
@@ -1758,63 +2239,60 @@ def get_user_activity_distribution():
         'active': 0,       # 21-50 ko'rish
         'super_active': 0  # 50+ ko'rish
     }
-    
+
     for r in results:
         categories[r[0]] = r[1]
-    
+
     return categories
 
 
-def get_movie_genres_stats():
+async def get_movie_genres_stats():
     """Kino janrlari bo'yicha statistika"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT 
-            COALESCE(m.genre, 'Noma''lum') as genre,
-            COUNT(DISTINCT m.id) as movie_count,
-            COUNT(s.id) as view_count
-        FROM movies m
-        LEFT JOIN statistics s ON m.id = s.movie_id
-        GROUP BY genre
-        ORDER BY view_count DESC
-    ''')
-    
-    results = cursor.fetchall()
-    conn.close()
-    
+    async with connection() as conn:
+        cursor = await conn.cursor()
+
+        await cursor.execute('''
+            SELECT 
+                COALESCE(m.genre, 'Noma''lum') as genre,
+                COUNT(DISTINCT m.id) as movie_count,
+                COUNT(s.id) as view_count
+            FROM movies m
+            LEFT JOIN statistics s ON m.id = s.movie_id
+            GROUP BY genre
+            ORDER BY view_count DESC
+        ''')
+
+        results = await cursor.fetchall()
+
     return [{'genre': r[0], 'movies': r[1], 'views': r[2]} for r in results]
 
 
-def get_conversion_funnel():
+async def get_conversion_funnel():
     """Konversiya voronkasi - qancha foydalanuvchi qaysi bosqichda"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Jami foydalanuvchilar
-    cursor.execute('SELECT COUNT(*) FROM users')
-    total_users = cursor.fetchone()[0]
-    
-    # Kamida 1 ta kino ko'rganlar
-    cursor.execute('SELECT COUNT(DISTINCT user_id) FROM statistics')
-    viewed_users = cursor.fetchone()[0]
-    
-    # 5+ kino ko'rganlar
-    cursor.execute('''
-        SELECT COUNT(*) FROM (
-            SELECT user_id, COUNT(*) as cnt FROM statistics 
-            GROUP BY user_id HAVING cnt >= 5
-        )
-    ''')
-    engaged_users = cursor.fetchone()[0]
-    
-    # Premium foydalanuvchilar
-    cursor.execute('SELECT COUNT(*) FROM users WHERE is_premium = 1')
-    premium_users = cursor.fetchone()[0]
-    
-    conn.close()
-    
+    async with connection() as conn:
+        cursor = await conn.cursor()
+
+        # Jami foydalanuvchilar
+        await cursor.execute('SELECT COUNT(*) FROM users')
+        total_users = (await cursor.fetchone())[0]
+
+        # Kamida 1 ta kino ko'rganlar
+        await cursor.execute('SELECT COUNT(DISTINCT user_id) FROM statistics')
+        viewed_users = (await cursor.fetchone())[0]
+
+        # 5+ kino ko'rganlar
+        await cursor.execute('''
+            SELECT COUNT(*) FROM (
+                SELECT user_id, COUNT(*) as cnt FROM statistics 
+                GROUP BY user_id HAVING cnt >= 5
+            )
+        ''')
+        engaged_users = (await cursor.fetchone())[0]
+
+        # Premium foydalanuvchilar
+        await cursor.execute('SELECT COUNT(*) FROM users WHERE is_premium = 1')
+        premium_users = (await cursor.fetchone())[0]
+
     return {
         'total_users': total_users,
         'viewed_users': viewed_users,
@@ -1826,54 +2304,52 @@ def get_conversion_funnel():
     }
 
 
-def get_daily_active_users(days: int = 30):
+async def get_daily_active_users(days: int = 30):
     """DAU - Kunlik faol foydalanuvchilar (oxirgi X kun)"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    dau_data = []
-    for i in range(days):
-        date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-        
-        cursor.execute('''
-            SELECT COUNT(DISTINCT user_id) FROM statistics 
-            WHERE DATE(watched_date) = ?
-        ''', (date,))
-        dau = cursor.fetchone()[0]
-        
-        dau_data.append({
-            'date': date,
-            'dau': dau
-        })
-    
-    conn.close()
+    async with connection() as conn:
+        cursor = await conn.cursor()
+
+        dau_data = []
+        for i in range(days):
+            date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
+
+            await cursor.execute('''
+                SELECT COUNT(DISTINCT user_id) FROM statistics 
+                WHERE watched_date >= ? AND watched_date < ?
+            ''', day_range(date))
+            dau = (await cursor.fetchone())[0]
+
+            dau_data.append({
+                'date': date,
+                'dau': dau
+            })
+
     return dau_data
 
 
-def get_user_lifetime_value():
+async def get_user_lifetime_value():
     """Foydalanuvchilar qiymati - eng faol foydalanuvchilar"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT 
-            u.user_id,
-            u.full_name,
-            u.username,
-            u.is_premium,
-            COUNT(s.id) as total_views,
-            MIN(s.watched_date) as first_view,
-            MAX(s.watched_date) as last_view
-        FROM users u
-        LEFT JOIN statistics s ON u.user_id = s.user_id
-        GROUP BY u.user_id
-        ORDER BY total_views DESC
-        LIMIT 15
-    ''')
-    
-    results = cursor.fetchall()
-    conn.close()
-    
+    async with connection() as conn:
+        cursor = await conn.cursor()
+
+        await cursor.execute('''
+            SELECT 
+                u.user_id,
+                u.full_name,
+                u.username,
+                u.is_premium,
+                COUNT(s.id) as total_views,
+                MIN(s.watched_date) as first_view,
+                MAX(s.watched_date) as last_view
+            FROM users u
+            LEFT JOIN statistics s ON u.user_id = s.user_id
+            GROUP BY u.user_id
+            ORDER BY total_views DESC
+            LIMIT 15
+        ''')
+
+        results = await cursor.fetchall()
+
     return [{
         'user_id': r[0],
         'full_name': r[1] or 'Noma\'lum',
@@ -1885,65 +2361,61 @@ def get_user_lifetime_value():
     } for r in results]
 
 
-def get_weekly_comparison():
+async def get_weekly_comparison():
     """Hafta kunlari bo'yicha taqqoslash"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    week_days = {
-        '0': 'Yakshanba',
-        '1': 'Dushanba',
-        '2': 'Seshanba',
-        '3': 'Chorshanba',
-        '4': 'Payshanba',
-        '5': 'Juma',
-        '6': 'Shanba'
-    }
-    
-    cursor.execute('''
-        SELECT 
-            strftime('%w', watched_date) as weekday,
-            COUNT(*) as view_count
-        FROM statistics
-        WHERE DATE(watched_date) >= DATE('now', '-30 days')
-        GROUP BY weekday
-        ORDER BY view_count DESC
-    ''')
-    
-    results = cursor.fetchall()
-    conn.close()
-    
+    async with connection() as conn:
+        cursor = await conn.cursor()
+
+        week_days = {
+            '0': 'Yakshanba',
+            '1': 'Dushanba',
+            '2': 'Seshanba',
+            '3': 'Chorshanba',
+            '4': 'Payshanba',
+            '5': 'Juma',
+            '6': 'Shanba'
+        }
+
+        await cursor.execute('''
+            SELECT 
+                strftime('%w', watched_date) as weekday,
+                COUNT(*) as view_count
+            FROM statistics
+            WHERE watched_date >= DATE('now', '-30 days')
+            GROUP BY weekday
+            ORDER BY view_count DESC
+        ''')
+
+        results = await cursor.fetchall()
+
     return [{'day': week_days.get(r[0], 'Noma\'lum'), 'views': r[1]} for r in results]
 
 
-def get_new_vs_returning():
+async def get_new_vs_returning():
     """Yangi va qaytib kelgan foydalanuvchilar"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    today = datetime.now().strftime('%Y-%m-%d')
-    week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-    
-    # Yangi foydalanuvchilar (hafta ichida qo'shilgan va kino ko'rgan)
-    cursor.execute('''
-        SELECT COUNT(DISTINCT s.user_id)
-        FROM statistics s
-        INNER JOIN users u ON s.user_id = u.user_id
-        WHERE DATE(s.watched_date) >= ? AND DATE(u.joined_date) >= ?
-    ''', (week_ago, week_ago))
-    new_active = cursor.fetchone()[0]
-    
-    # Qaytib kelgan (eski foydalanuvchilar, lekin hafta ichida faol)
-    cursor.execute('''
-        SELECT COUNT(DISTINCT s.user_id)
-        FROM statistics s
-        INNER JOIN users u ON s.user_id = u.user_id
-        WHERE DATE(s.watched_date) >= ? AND DATE(u.joined_date) < ?
-    ''', (week_ago, week_ago))
-    returning_active = cursor.fetchone()[0]
-    
-    conn.close()
-    
+    async with connection() as conn:
+        cursor = await conn.cursor()
+
+        week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+
+        # Yangi foydalanuvchilar (hafta ichida qo'shilgan va kino ko'rgan)
+        await cursor.execute('''
+            SELECT COUNT(DISTINCT s.user_id)
+            FROM statistics s
+            INNER JOIN users u ON s.user_id = u.user_id
+            WHERE s.watched_date >= ? AND u.joined_date >= ?
+        ''', (week_ago, week_ago))
+        new_active = (await cursor.fetchone())[0]
+
+        # Qaytib kelgan (eski foydalanuvchilar, lekin hafta ichida faol)
+        await cursor.execute('''
+            SELECT COUNT(DISTINCT s.user_id)
+            FROM statistics s
+            INNER JOIN users u ON s.user_id = u.user_id
+            WHERE s.watched_date >= ? AND u.joined_date < ?
+        ''', (week_ago, week_ago))
+        returning_active = (await cursor.fetchone())[0]
+
     return {
         'new_active': new_active,
         'returning_active': returning_active,
@@ -1951,52 +2423,50 @@ def get_new_vs_returning():
     }
 
 
-def get_avg_session_depth():
+async def get_avg_session_depth():
     """O'rtacha sessiya chuqurligi - har bir tashrif nechta kino ko'radi"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT AVG(daily_views) 
-        FROM (
-            SELECT user_id, DATE(watched_date) as day, COUNT(*) as daily_views
-            FROM statistics
-            WHERE DATE(watched_date) >= DATE('now', '-30 days')
-            GROUP BY user_id, day
-        )
-    ''')
-    
-    result = cursor.fetchone()[0]
-    conn.close()
-    
+    async with connection() as conn:
+        cursor = await conn.cursor()
+
+        await cursor.execute('''
+            SELECT AVG(daily_views) 
+            FROM (
+                SELECT user_id, DATE(watched_date) as day, COUNT(*) as daily_views
+                FROM statistics
+                WHERE watched_date >= DATE('now', '-30 days')
+                GROUP BY user_id, day
+            )
+        ''')
+
+        result = (await cursor.fetchone())[0]
+
     return round(result, 2) if result else 0
 
 
-def get_trending_movies(days: int = 7, limit: int = 10):
+async def get_trending_movies(days: int = 7, limit: int = 10):
     """Trend kinolar - so'nggi kunlarda eng ko'p ko'rilganlar"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    date_from = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-    
-    cursor.execute('''
-        SELECT 
-            m.code,
-            m.title,
-            m.genre,
-            COUNT(s.id) as recent_views,
-            (SELECT COUNT(*) FROM statistics WHERE movie_id = m.id) as total_views
-        FROM movies m
-        INNER JOIN statistics s ON m.id = s.movie_id
-        WHERE DATE(s.watched_date) >= ?
-        GROUP BY m.id
-        ORDER BY recent_views DESC
-        LIMIT ?
-    ''', (date_from, limit))
-    
-    results = cursor.fetchall()
-    conn.close()
-    
+    async with connection() as conn:
+        cursor = await conn.cursor()
+
+        date_from = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+
+        await cursor.execute('''
+            SELECT 
+                m.code,
+                m.title,
+                m.genre,
+                COUNT(s.id) as recent_views,
+                (SELECT COUNT(*) FROM statistics WHERE movie_id = m.id) as total_views
+            FROM movies m
+            INNER JOIN statistics s ON m.id = s.movie_id
+            WHERE s.watched_date >= ?
+            GROUP BY m.id
+            ORDER BY recent_views DESC
+            LIMIT ?
+        ''', (date_from, limit))
+
+        results = await cursor.fetchall()
+
     return [{
         'code': r[0],
         'title': r[1],
@@ -2006,55 +2476,58 @@ def get_trending_movies(days: int = 7, limit: int = 10):
     } for r in results]
 
 
-def get_overview_stats():
+async def get_overview_stats():
     """Umumiy statistika xulosasi"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Asosiy ko'rsatkichlar
-    cursor.execute('SELECT COUNT(*) FROM users')
-    total_users = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(*) FROM movies')
-    total_movies = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(*) FROM statistics')
-    total_views = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(*) FROM users WHERE is_premium = 1')
-    premium_users = cursor.fetchone()[0]
-    
-    # Bugungi
-    today = datetime.now().strftime('%Y-%m-%d')
-    cursor.execute('SELECT COUNT(*) FROM users WHERE DATE(joined_date) = ?', (today,))
-    today_users = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(*) FROM statistics WHERE DATE(watched_date) = ?', (today,))
-    today_views = cursor.fetchone()[0]
-    
-    # Haftalik
-    week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-    cursor.execute('SELECT COUNT(*) FROM users WHERE DATE(joined_date) >= ?', (week_ago,))
-    weekly_users = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(*) FROM statistics WHERE DATE(watched_date) >= ?', (week_ago,))
-    weekly_views = cursor.fetchone()[0]
-    
-    # O'rtacha ko'rishlar
-    cursor.execute('''
-        SELECT AVG(view_count) FROM (
-            SELECT COUNT(*) as view_count FROM statistics GROUP BY user_id
-        )
-    ''')
-    avg_views_per_user = cursor.fetchone()[0] or 0
-    
-    conn.close()
-    
+    async with connection() as conn:
+        cursor = await conn.cursor()
+
+        # Asosiy ko'rsatkichlar
+        await cursor.execute('SELECT COUNT(*) FROM users')
+        total_users = (await cursor.fetchone())[0]
+
+        await cursor.execute('SELECT COUNT(*) FROM movies')
+        total_movies = (await cursor.fetchone())[0]
+
+        await cursor.execute('SELECT COUNT(*) FROM statistics')
+        total_views = (await cursor.fetchone())[0]
+
+        await cursor.execute('SELECT COUNT(*) FROM users WHERE is_premium = 1')
+        premium_users = (await cursor.fetchone())[0]
+
+        await cursor.execute('SELECT COUNT(*) FROM users WHERE is_reachable = 1')
+        reachable_users = (await cursor.fetchone())[0]
+
+        # Bugungi
+        today = datetime.now().strftime('%Y-%m-%d')
+        await cursor.execute('SELECT COUNT(*) FROM users WHERE joined_date >= ? AND joined_date < ?', day_range(today))
+        today_users = (await cursor.fetchone())[0]
+
+        await cursor.execute('SELECT COUNT(*) FROM statistics WHERE watched_date >= ? AND watched_date < ?', day_range(today))
+        today_views = (await cursor.fetchone())[0]
+
+        # Haftalik
+        week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+        await cursor.execute('SELECT COUNT(*) FROM users WHERE joined_date >= ?', (week_ago,))
+        weekly_users = (await cursor.fetchone())[0]
+
+        await cursor.execute('SELECT COUNT(*) FROM statistics WHERE watched_date >= ?', (week_ago,))
+        weekly_views = (await cursor.fetchone())[0]
+
+        # O'rtacha ko'rishlar
+        await cursor.execute('''
+            SELECT AVG(view_count) FROM (
+                SELECT COUNT(*) as view_count FROM statistics GROUP BY user_id
+            )
+        ''')
+        avg_views_per_user = (await cursor.fetchone())[0] or 0
+
     return {
         'total_users': total_users,
         'total_movies': total_movies,
         'total_views': total_views,
         'premium_users': premium_users,
+        'reachable_users': reachable_users,
+        'reachable_rate': round(reachable_users / total_users * 100, 1) if total_users else 0,
         'today_users': today_users,
         'today_views': today_views,
         'weekly_users': weekly_users,
@@ -2063,6 +2536,3 @@ def get_overview_stats():
         'views_per_movie': round(total_views / max(total_movies, 1), 2)
     }
 
-
-# Jadvallarni yaratish
-create_tables()
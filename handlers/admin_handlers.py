@@ -4,7 +4,7 @@ from aiogram.fsm.context import FSMContext
 
 from database import (
     add_movie, delete_movie, get_movie_by_code, 
-    get_movies_count, get_users_count, get_all_users, get_all_movies,
+    get_movies_count, get_users_count, get_reachable_users_count, get_all_movies,
     get_all_channels, add_channel, delete_channel, get_channels_count,
     is_subscription_enabled, toggle_subscription, get_base_channel, set_base_channel,
     get_subscription_message, set_subscription_message,
@@ -27,14 +27,20 @@ from database import (
     get_daily_active_users, get_user_lifetime_value, get_weekly_comparison,
     get_new_vs_returning, get_avg_session_depth, get_trending_movies, get_overview_stats,
     # Admin huquqlari
-    get_admin_permissions, update_admin_permission, has_permission
+    get_admin_permissions, update_admin_permission, has_permission,
+    get_broadcast, get_active_broadcasts, set_broadcast_status_message, BROADCAST_ACTIVE_STATUSES,
+    get_segments, get_segment
 )
 from keyboards import (
     admin_menu_keyboard, admin_panel_keyboard, cancel_reply_keyboard,
     movie_management_keyboard, channel_management_keyboard, statistics_keyboard,
     movies_list_keyboard, back_keyboard, confirm_keyboard, select_base_channel_keyboard,
     bot_settings_keyboard, channel_button_settings_keyboard, backup_keyboard,
-    backup_list_keyboard, backup_action_keyboard
+    backup_list_keyboard, backup_action_keyboard, broadcast_job_keyboard
+)
+from broadcaster import (
+    start_broadcast, pause_broadcast, resume_broadcast, cancel_broadcast,
+    broadcast_progress_text
 )
 from states import (
     AddMovie, DeleteMovie, Broadcast, AddChannel, AddChannelLink, 
@@ -72,10 +78,10 @@ async def admin_stats_reply_handler(message: Message, state: FSMContext):
     await state.clear()
     
     # Umumiy statistika
-    overview = get_overview_stats()
-    growth = get_growth_rate(7)
-    retention = get_retention_rate(7)
-    funnel = get_conversion_funnel()
+    overview = await get_overview_stats()
+    growth = await get_growth_rate(7)
+    retention = await get_retention_rate(7)
+    funnel = await get_conversion_funnel()
     
     # O'sish ko'rsatkichi
     growth_emoji = "📈" if growth['growth_rate'] >= 0 else "📉"
@@ -87,6 +93,7 @@ async def admin_stats_reply_handler(message: Message, state: FSMContext):
 
 👥 <b>Foydalanuvchilar:</b>
 ┣ Jami: <code>{overview['total_users']:,}</code>
+┣ 📬 Faol (bloklamagan): <code>{overview['reachable_users']:,}</code> ({overview['reachable_rate']}%)
 ┣ Bugun: <code>+{overview['today_users']}</code>
 ┣ Haftalik: <code>+{overview['weekly_users']}</code>
 ┗ 💎 Premium: <code>{funnel['premium_users']}</code> ({funnel['premium_rate']}%)
@@ -128,9 +135,9 @@ async def admin_channels_reply_handler(message: Message, state: FSMContext):
     
     await state.clear()
     
-    sub_enabled = is_subscription_enabled()
-    channels_count = get_channels_count()
-    channels = get_all_channels()
+    sub_enabled = await is_subscription_enabled()
+    channels_count = await get_channels_count()
+    channels = await get_all_channels()
     
     status = "Yoqilgan ✅" if sub_enabled else "O'chirilgan ❌"
     
@@ -168,8 +175,8 @@ async def admin_movies_reply_handler(message: Message, state: FSMContext):
     
     await state.clear()
     
-    movies_count = get_movies_count()
-    base_channel = get_base_channel()
+    movies_count = await get_movies_count()
+    base_channel = await get_base_channel()
     
     text = f"""
 🎬 <b>Kino boshqaruvi</b>
@@ -196,13 +203,10 @@ async def admin_broadcast_reply_handler(message: Message, state: FSMContext):
         return
     
     await state.clear()
-    users_count = get_users_count()
     
     from keyboards import broadcast_type_keyboard
     await message.answer(
-        f"📢 <b>Xabar yuborish</b>\n\n"
-        f"👥 Jami foydalanuvchilar: <b>{users_count}</b>\n\n"
-        "📝 Xabar turini tanlang:",
+        await broadcast_menu_text(),
         reply_markup=broadcast_type_keyboard(),
         parse_mode="HTML"
     )
@@ -220,11 +224,11 @@ async def admin_premium_reply_handler(message: Message, state: FSMContext):
     await state.clear()
     
     from keyboards import premium_management_keyboard
-    enabled = is_premium_enabled()
-    premium_count = get_premium_users_count()
-    pending = len(get_pending_premium_requests())
-    plans = get_all_premium_plans()
-    card = get_payment_card()
+    enabled = await is_premium_enabled()
+    premium_count = await get_premium_users_count()
+    pending = len(await get_pending_premium_requests())
+    plans = await get_all_premium_plans()
+    card = await get_payment_card()
     
     text = f"""
 💎 <b>Premium Obuna Boshqaruvi</b>
@@ -250,7 +254,7 @@ async def admin_admins_reply_handler(message: Message):
     
     from config import ADMINS
     from keyboards import admin_management_keyboard
-    db_admins = get_all_admins()
+    db_admins = await get_all_admins()
     all_admins = list(set(ADMINS + db_admins))
     
     text = f"""
@@ -277,11 +281,11 @@ async def admin_referral_reply_handler(message: Message):
     )
     from keyboards import referral_admin_keyboard
     
-    is_enabled = is_referral_enabled()
-    bonus = get_referral_bonus()
-    min_withdrawal = get_min_withdrawal()
-    stats = get_total_referral_stats()
-    pending = get_pending_withdrawals()
+    is_enabled = await is_referral_enabled()
+    bonus = await get_referral_bonus()
+    min_withdrawal = await get_min_withdrawal()
+    stats = await get_total_referral_stats()
+    pending = await get_pending_withdrawals()
     
     status = "🟢 Yoniq" if is_enabled else "🔴 O'chiq"
     
@@ -312,8 +316,8 @@ async def admin_settings_reply_handler(message: Message):
     
     from database import get_base_channel, get_start_media
     
-    base_channel = get_base_channel()
-    start_media = get_start_media()
+    base_channel = await get_base_channel()
+    start_media = await get_start_media()
     
     text = "⚙️ <b>Bot sozlamalari</b>\n\n"
     
@@ -348,8 +352,8 @@ async def edit_start_message_reply_handler(message: Message):
     from database import get_start_message, get_start_media
     from keyboards import start_message_keyboard
     
-    current_message = get_start_message()
-    start_media = get_start_media()
+    current_message = await get_start_message()
+    start_media = await get_start_media()
     has_media = start_media is not None
     
     text = "📝 <b>Start xabarini tahrirlash</b>\n\n"
@@ -404,8 +408,8 @@ async def edit_start_message_callback(callback: CallbackQuery):
     from database import get_start_message, get_start_media
     from keyboards import start_message_keyboard
     
-    current_message = get_start_message()
-    start_media = get_start_media()
+    current_message = await get_start_message()
+    start_media = await get_start_media()
     has_media = start_media is not None
     
     text = "📝 <b>Start xabarini tahrirlash</b>\n\n"
@@ -429,8 +433,8 @@ async def admin_bot_settings_callback(callback: CallbackQuery):
     
     from database import get_base_channel, get_start_media
     
-    base_channel = get_base_channel()
-    start_media = get_start_media()
+    base_channel = await get_base_channel()
+    start_media = await get_start_media()
     
     text = "⚙️ <b>Bot sozlamalari</b>\n\n"
     
@@ -460,7 +464,7 @@ async def edit_start_text_callback(callback: CallbackQuery, state: FSMContext):
     from states import EditStartMessage
     from database import get_start_message
     
-    current = get_start_message()
+    current = await get_start_message()
     
     await state.set_state(EditStartMessage.waiting_for_content)
     await state.update_data(content_type='text')
@@ -526,9 +530,9 @@ async def delete_start_media_callback(callback: CallbackQuery):
     from database import delete_start_media, get_start_message
     from keyboards import start_message_keyboard
     
-    delete_start_media()
+    await delete_start_media()
     
-    current_message = get_start_message()
+    current_message = await get_start_message()
     
     text = "✅ <b>Media o'chirildi!</b>\n\n"
     text += f"<b>Hozirgi xabar:</b>\n<i>{current_message}</i>\n\n"
@@ -547,8 +551,8 @@ async def preview_start_message_callback(callback: CallbackQuery):
     from database import get_start_message, get_start_media
     from keyboards import start_message_keyboard
     
-    message_text = get_start_message()
-    start_media = get_start_media()
+    message_text = await get_start_message()
+    start_media = await get_start_media()
     
     try:
         if start_media:
@@ -599,7 +603,7 @@ async def handle_base_channel_selection(message: Message):
     except Exception as e:
         title = f"Kanal"
         
-    set_base_channel(str(channel_id))
+    await set_base_channel(str(channel_id))
     
     await message.answer(
         f"✅ Baza kanal muvaffaqiyatli yangilandi!\n\n"
@@ -619,8 +623,8 @@ async def back_to_admin_handler(callback: CallbackQuery, state: FSMContext):
     
     await state.clear()
     
-    users_count = get_users_count()
-    movies_count = get_movies_count()
+    users_count = await get_users_count()
+    movies_count = await get_movies_count()
     
     text = f"""
 👑 <b>Admin Panel</b>
@@ -653,10 +657,10 @@ async def admin_stats_handler(callback: CallbackQuery):
         return
     
     # Umumiy statistika
-    overview = get_overview_stats()
-    growth = get_growth_rate(7)
-    retention = get_retention_rate(7)
-    funnel = get_conversion_funnel()
+    overview = await get_overview_stats()
+    growth = await get_growth_rate(7)
+    retention = await get_retention_rate(7)
+    funnel = await get_conversion_funnel()
     
     # O'sish ko'rsatkichi
     growth_emoji = "📈" if growth['growth_rate'] >= 0 else "📉"
@@ -668,6 +672,7 @@ async def admin_stats_handler(callback: CallbackQuery):
 
 👥 <b>Foydalanuvchilar:</b>
 ┣ Jami: <code>{overview['total_users']:,}</code>
+┣ 📬 Faol (bloklamagan): <code>{overview['reachable_users']:,}</code> ({overview['reachable_rate']}%)
 ┣ Bugun: <code>+{overview['today_users']}</code>
 ┣ Haftalik: <code>+{overview['weekly_users']}</code>
 ┗ 💎 Premium: <code>{funnel['premium_users']}</code> ({funnel['premium_rate']}%)
@@ -700,9 +705,9 @@ async def stats_overview_handler(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
         return
     
-    overview = get_overview_stats()
-    funnel = get_conversion_funnel()
-    daily = get_daily_stats(7)
+    overview = await get_overview_stats()
+    funnel = await get_conversion_funnel()
+    daily = await get_daily_stats(7)
     
     # Haftalik grafik
     graph = ""
@@ -718,6 +723,7 @@ async def stats_overview_handler(callback: CallbackQuery):
 
 <b>📈 Asosiy raqamlar:</b>
 ┣ 👥 Foydalanuvchilar: <code>{overview['total_users']:,}</code>
+┣ 📬 Faol (bloklamagan): <code>{overview['reachable_users']:,}</code> ({overview['reachable_rate']}%)
 ┣ 🎬 Kinolar: <code>{overview['total_movies']:,}</code>
 ┣ 👁 Ko'rishlar: <code>{overview['total_views']:,}</code>
 ┗ 💎 Premium: <code>{funnel['premium_users']}</code>
@@ -748,10 +754,10 @@ async def stats_users_handler(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
         return
     
-    distribution = get_user_activity_distribution()
-    new_vs_ret = get_new_vs_returning()
-    retention = get_retention_rate(7)
-    growth = get_growth_rate(7)
+    distribution = await get_user_activity_distribution()
+    new_vs_ret = await get_new_vs_returning()
+    retention = await get_retention_rate(7)
+    growth = await get_growth_rate(7)
     
     total = sum(distribution.values())
     
@@ -787,9 +793,9 @@ async def stats_movies_handler(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
         return
     
-    top_movies = get_top_movies(10)
-    genres = get_movie_genres_stats()
-    trending = get_trending_movies(7, 5)
+    top_movies = await get_top_movies(10)
+    genres = await get_movie_genres_stats()
+    trending = await get_trending_movies(7, 5)
     
     # Top kinolar ro'yxati
     top_list = ""
@@ -831,9 +837,9 @@ async def stats_growth_handler(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
         return
     
-    growth_7 = get_growth_rate(7)
-    growth_30 = get_growth_rate(30)
-    daily = get_daily_stats(14)
+    growth_7 = await get_growth_rate(7)
+    growth_30 = await get_growth_rate(30)
+    daily = await get_daily_stats(14)
     
     # Haftalik grafik
     graph = ""
@@ -874,10 +880,10 @@ async def stats_retention_handler(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
         return
     
-    ret_7 = get_retention_rate(7)
-    ret_30 = get_retention_rate(30)
-    new_vs_ret = get_new_vs_returning()
-    avg_depth = get_avg_session_depth()
+    ret_7 = await get_retention_rate(7)
+    ret_30 = await get_retention_rate(30)
+    new_vs_ret = await get_new_vs_returning()
+    avg_depth = await get_avg_session_depth()
     
     text = f"""
 🔄 <b>RETENTION ANALITIKASI</b>
@@ -909,8 +915,8 @@ async def stats_time_handler(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
         return
     
-    peak_hours = get_peak_hours(7)
-    weekly_comp = get_weekly_comparison()
+    peak_hours = await get_peak_hours(7)
+    weekly_comp = await get_weekly_comparison()
     
     # Peak soatlar
     peak_list = ""
@@ -947,7 +953,7 @@ async def stats_trends_handler(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
         return
     
-    trending = get_trending_movies(7, 10)
+    trending = await get_trending_movies(7, 10)
     
     trend_list = ""
     for i, t in enumerate(trending, 1):
@@ -972,7 +978,7 @@ async def stats_funnel_handler(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
         return
     
-    funnel = get_conversion_funnel()
+    funnel = await get_conversion_funnel()
     
     # Voronka grafigi
     def bar(pct):
@@ -1013,7 +1019,7 @@ async def stats_top_users_handler(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
         return
     
-    top_users = get_user_lifetime_value()
+    top_users = await get_user_lifetime_value()
     
     user_list = ""
     for i, u in enumerate(top_users[:15], 1):
@@ -1042,8 +1048,8 @@ async def admin_movies_handler(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
         return
     
-    movies_count = get_movies_count()
-    base_channel = get_base_channel()
+    movies_count = await get_movies_count()
+    base_channel = await get_base_channel()
     
     text = f"""
 🎬 <b>Kino boshqaruvi</b>
@@ -1067,8 +1073,8 @@ async def movie_management_back_handler(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
         return
     
-    movies_count = get_movies_count()
-    base_channel = get_base_channel()
+    movies_count = await get_movies_count()
+    base_channel = await get_base_channel()
     
     text = f"""🎬 <b>Kino boshqaruvi</b>
 
@@ -1091,7 +1097,7 @@ async def movies_list_handler(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
         return
     
-    movies = get_all_movies()
+    movies = await get_all_movies()
     
     if not movies:
         await callback.answer("📋 Kinolar ro'yxati bo'sh!", show_alert=True)
@@ -1116,7 +1122,7 @@ async def movies_page_handler(callback: CallbackQuery):
         return
     
     page = int(callback.data.split("_")[-1])
-    movies = get_all_movies()
+    movies = await get_all_movies()
     movies_data = [{'code': m['code'], 'title': m['title']} for m in movies]
     
     text = f"📋 <b>Kinolar ro'yxati</b>\n\nJami: {len(movies)} ta kino"
@@ -1136,7 +1142,7 @@ async def movie_add_handler(callback: CallbackQuery, state: FSMContext):
         return
     
     # Baza kanalni tekshirish
-    base_channel = get_base_channel()
+    base_channel = await get_base_channel()
     if not base_channel:
         await callback.message.answer(
             "⚠️ Baza kanal sozlanmagan!\n\n"
@@ -1245,7 +1251,7 @@ async def add_movie_code(message: Message, state: FSMContext):
     code = message.text.strip()
     
     # Kod mavjudligini tekshirish
-    existing = get_movie_by_code(code)
+    existing = await get_movie_by_code(code)
     if existing:
         await message.answer(
             f"⚠️ Bu kod (<code>{code}</code>) allaqachon mavjud!\n"
@@ -1258,7 +1264,7 @@ async def add_movie_code(message: Message, state: FSMContext):
     data = await state.get_data()
     
     # Baza kanalni olish
-    base_channel = get_base_channel()
+    base_channel = await get_base_channel()
     
     try:
         base_channel_id = int(base_channel)
@@ -1294,7 +1300,7 @@ async def add_movie_code(message: Message, state: FSMContext):
         # Database ga saqlash
         from database import add_movie_with_message_id
         
-        success = add_movie_with_message_id(
+        success = await add_movie_with_message_id(
             code=code,
             title=data['title'],
             file_id=data['file_id'],
@@ -1358,13 +1364,13 @@ async def delete_movie_code(message: Message, state: FSMContext):
         return
     
     code = message.text.strip()
-    movie = get_movie_by_code(code)
+    movie = await get_movie_by_code(code)
     
     if not movie:
         await message.answer(f"❌ <code>{code}</code> kodli kino topilmadi!", parse_mode="HTML")
         return
     
-    success = delete_movie(code)
+    success = await delete_movie(code)
     
     if success:
         await message.answer(
@@ -1403,9 +1409,9 @@ async def admin_channels_handler(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
         return
     
-    sub_enabled = is_subscription_enabled()
-    channels_count = get_channels_count()
-    channels = get_all_channels()
+    sub_enabled = await is_subscription_enabled()
+    channels_count = await get_channels_count()
+    channels = await get_all_channels()
     
     status = "Yoqilgan ✅" if sub_enabled else "O'chirilgan ❌"
     
@@ -1439,7 +1445,7 @@ async def toggle_subscription_handler(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
         return
     
-    new_status = toggle_subscription()
+    new_status = await toggle_subscription()
     status_text = "yoqildi ?" if new_status else "o'chirildi ?"
     
     await callback.answer(f"Majburiy obuna {status_text}", show_alert=True)
@@ -1475,7 +1481,7 @@ async def add_channel_forward(message: Message, state: FSMContext):
         await message.answer("⚠️ Faqat kanaldan forward qiling!")
         return
     
-    success = add_channel(
+    success = await add_channel(
         channel_id=chat.id,
         channel_username=chat.username,
         title=chat.title
@@ -1518,7 +1524,7 @@ async def add_channel_id(message: Message, state: FSMContext):
             title = f"Kanal {channel_id}"
             username = None
         
-        success = add_channel(
+        success = await add_channel(
             channel_id=channel_id,
             channel_username=username,
             title=title
@@ -1555,7 +1561,7 @@ async def channel_delete_handler(callback: CallbackQuery, state: FSMContext):
     if not is_admin(callback.from_user.id):
         return
     
-    channels = get_all_channels()
+    channels = await get_all_channels()
     
     if not channels:
         await callback.answer("�� Kanallar ro'yxati bo'sh!", show_alert=True)
@@ -1595,7 +1601,7 @@ async def delete_channel_confirm(callback: CallbackQuery):
         return
     
     channel_id = int(callback.data.split("_")[-1])
-    success = delete_channel(channel_id)
+    success = await delete_channel(channel_id)
     
     if success:
         await callback.answer("✅ Kanal o'chirildi!", show_alert=True)
@@ -1611,7 +1617,7 @@ async def channels_list_handler(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
         return
     
-    channels = get_all_channels()
+    channels = await get_all_channels()
     
     if not channels:
         await callback.answer("�� Kanallar ro'yxati bo'sh!", show_alert=True)
@@ -1672,7 +1678,7 @@ async def set_base_channel_from_request(message: Message, state: FSMContext):
     except Exception as e:
         title = f"Kanal"
         
-    set_base_channel(str(channel_id))
+    await set_base_channel(str(channel_id))
     
     await message.answer(
         f"? Baza kanal muvaffaqiyatli sozlandi!\n\n"
@@ -1709,7 +1715,7 @@ async def set_base_channel_handler(message: Message, state: FSMContext):
             )
             return
         
-        set_base_channel(str(channel_id))
+        await set_base_channel(str(channel_id))
         
         await message.answer(
             f"? Baza kanal sozlandi!\n\n"
@@ -1737,13 +1743,69 @@ async def admin_broadcast_handler(callback: CallbackQuery, state: FSMContext):
         return
     
     await state.clear()
-    users_count = get_users_count()
     
     from keyboards import broadcast_type_keyboard
     await callback.message.edit_text(
+        await broadcast_menu_text(),
+        reply_markup=broadcast_type_keyboard(),
+        parse_mode="HTML"
+    )
+    await callback.answer()
+
+
+async def broadcast_menu_text(segment_key: str = None) -> str:
+    """Reklama menyusi matni - tanlangan auditoriya hajmi segments jadvalidan (darhol)"""
+    users_count = await get_users_count()
+    reachable_count = await get_reachable_users_count()
+    text = (
         f"📢 <b>Xabar yuborish</b>\n\n"
-        f"👥 Jami foydalanuvchilar: <b>{users_count}</b>\n\n"
-        "📝 Xabar turini tanlang:",
+        f"👥 Jami foydalanuvchilar: <b>{users_count}</b>\n"
+        f"📬 Xabar yetib boradi: <b>{reachable_count}</b>\n"
+    )
+    segment = await get_segment(segment_key) if segment_key else None
+    if segment:
+        text += (
+            f"🎯 Auditoriya: <b>{segment['title']}</b> - <b>{segment['size']}</b> ta\n"
+            f"<i>(yangilangan: {segment['refreshed_date'] or 'hali yangilanmagan'})</i>\n"
+        )
+    else:
+        text += "🎯 Auditoriya: <b>Barcha foydalanuvchilar</b>\n"
+    return text + "\n📝 Xabar turini tanlang:"
+
+
+@router.callback_query(F.data == "broadcast_segments")
+async def broadcast_segments_handler(callback: CallbackQuery, state: FSMContext):
+    """Reklama auditoriyasini (segmentni) tanlash"""
+    if not check_permission(callback.from_user.id, 'can_broadcast'):
+        await callback.answer("❌ Sizda bu bo'limga ruxsat yo'q!", show_alert=True)
+        return
+    
+    from keyboards import broadcast_segments_keyboard
+    data = await state.get_data()
+    await callback.message.edit_text(
+        "🎯 <b>Auditoriyani tanlang</b>\n\n"
+        "Segment hajmi - xabar yetib boradigan a'zolar (oxirgi yangilanish bo'yicha):",
+        reply_markup=broadcast_segments_keyboard(await get_segments(), data.get("segment")),
+        parse_mode="HTML"
+    )
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("bseg_"))
+async def broadcast_segment_select(callback: CallbackQuery, state: FSMContext):
+    """Segment tanlandi - reklama menyusiga qaytish (tanlov FSM da saqlanadi)"""
+    if not check_permission(callback.from_user.id, 'can_broadcast'):
+        await callback.answer("❌ Sizda bu bo'limga ruxsat yo'q!", show_alert=True)
+        return
+    
+    segment_key = callback.data.split("_", 1)[1]
+    if segment_key == "all" or await get_segment(segment_key) is None:
+        segment_key = None
+    await state.update_data(segment=segment_key)
+    
+    from keyboards import broadcast_type_keyboard
+    await callback.message.edit_text(
+        await broadcast_menu_text(segment_key),
         reply_markup=broadcast_type_keyboard(),
         parse_mode="HTML"
     )
@@ -1901,7 +1963,11 @@ async def broadcast_receive_message(message: Message, state: FSMContext):
         await state.set_state(Broadcast.confirm)
         return
     
-    await state.update_data(message_text=message.text, message_entities=message.entities)
+    # Xabarning o'zi reklama shabloni bo'ladi (copy_message)
+    await state.update_data(
+        message_text=message.text, message_entities=message.entities,
+        source_chat_id=message.chat.id, source_message_id=message.message_id
+    )
     
     if broadcast_type == "text":
         # Oddiy matn - tasdiqlash
@@ -1936,6 +2002,8 @@ async def broadcast_receive_media(message: Message, state: FSMContext):
         await state.update_data(media_type="photo", media_file_id=message.photo[-1].file_id)
     elif message.video:
         await state.update_data(media_type="video", media_file_id=message.video.file_id)
+    # Media xabar reklama shabloni bo'ladi (copy_message, matni alohida beriladi)
+    await state.update_data(source_chat_id=message.chat.id, source_message_id=message.message_id)
     
     from keyboards import broadcast_skip_caption_keyboard
     await message.answer(
@@ -2109,73 +2177,75 @@ async def broadcast_send(callback: CallbackQuery, state: FSMContext):
         return
     
     data = await state.get_data()
-    broadcast_type = data.get("broadcast_type", "text")
-    buttons = data.get("buttons", [])
-    
-    # Inline tugmalarni yaratish
-    inline_keyboard = None
-    if buttons:
-        from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-        keyboard_buttons = []
-        for btn in buttons:
-            keyboard_buttons.append([InlineKeyboardButton(text=btn["text"], url=btn["url"])])
-        inline_keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
-    
-    users = get_all_users()
-    success = 0
-    failed = 0
+    await state.clear()
     
-    await callback.message.edit_text(f"📤 Xabar {len(users)} foydalanuvchiga yuborilmoqda...")
+    # Yuborish fon ishchisida - handler darhol qaytadi, qayta ishga tushsa davom etadi
+    broadcast_id = await start_broadcast(callback.from_user.id, data)
+    job = await get_broadcast(broadcast_id)
     
-    for user_id in users:
-        try:
-            if broadcast_type == "forward":
-                # Forward qilish
-                await callback.bot.forward_message(
-                    chat_id=user_id,
-                    from_chat_id=data.get("forward_chat_id"),
-                    message_id=data.get("forward_message_id")
-                )
-            elif "photo" in broadcast_type:
-                # Rasm
-                await callback.bot.send_photo(
-                    chat_id=user_id,
-                    photo=data.get("media_file_id"),
-                    caption=data.get("message_text"),
-                    caption_entities=data.get("message_entities"),
-                    reply_markup=inline_keyboard
-                )
-            elif "video" in broadcast_type:
-                # Video
-                await callback.bot.send_video(
-                    chat_id=user_id,
-                    video=data.get("media_file_id"),
-                    caption=data.get("message_text"),
-                    caption_entities=data.get("message_entities"),
-                    reply_markup=inline_keyboard
-                )
-            else:
-                # Matn
-                await callback.bot.send_message(
-                    chat_id=user_id,
-                    text=data.get("message_text"),
-                    entities=data.get("message_entities"),
-                    reply_markup=inline_keyboard
-                )
-            success += 1
-        except Exception as e:
-            failed += 1
-    
-    await state.clear()
     await callback.message.edit_text(
-        f"? <b>Xabar yuborildi!</b>\n\n"
-        f"✅ Muvaffaqiyatli: <b>{success}</b>\n"
-        f"? Xatolik: <b>{failed}</b>",
+        broadcast_progress_text(job),
+        reply_markup=broadcast_job_keyboard(broadcast_id, job['status']),
         parse_mode="HTML"
     )
+    # Shu xabar fon ishchisi tomonidan yangilanib turadi
+    await set_broadcast_status_message(broadcast_id, callback.message.chat.id, callback.message.message_id)
     await callback.message.answer("📋 Asosiy menyu:", reply_markup=admin_menu_keyboard())
 
 
+@router.callback_query(F.data == "broadcast_jobs")
+async def broadcast_jobs_handler(callback: CallbackQuery):
+    """Tugamagan reklama vazifalari"""
+    if not check_permission(callback.from_user.id, 'can_broadcast'):
+        await callback.answer("❌ Sizda bu bo'limga ruxsat yo'q!", show_alert=True)
+        return
+    
+    from keyboards import broadcast_jobs_keyboard
+    jobs = await get_active_broadcasts()
+    text = "📤 <b>Yuborilayotgan reklamalar</b>" if jobs else "📭 Yuborilayotgan reklama yo'q"
+    await callback.message.edit_text(text, reply_markup=broadcast_jobs_keyboard(jobs), parse_mode="HTML")
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("bc_"))
+async def broadcast_job_action(callback: CallbackQuery):
+    """Reklama vazifasini boshqarish: bc_<amal>_<id>"""
+    if not check_permission(callback.from_user.id, 'can_broadcast'):
+        await callback.answer("❌ Sizda bu bo'limga ruxsat yo'q!", show_alert=True)
+        return
+    
+    _, action, broadcast_id = callback.data.split("_")
+    broadcast_id = int(broadcast_id)
+    actions = {
+        'pause': (pause_broadcast, "⏸ To'xtatildi"),
+        'resume': (resume_broadcast, "▶️ Davom ettirildi"),
+        'cancel': (cancel_broadcast, "⛔ Bekor qilindi"),
+    }
+    notice = None
+    if action in actions:
+        func, notice = actions[action]
+        if not await func(broadcast_id):
+            notice = "Vazifa allaqachon tugagan"
+    
+    job = await get_broadcast(broadcast_id)
+    if job is None:
+        await callback.answer("Vazifa topilmadi", show_alert=True)
+        return
+    try:
+        await callback.message.edit_text(
+            broadcast_progress_text(job),
+            reply_markup=broadcast_job_keyboard(broadcast_id, job['status']),
+            parse_mode="HTML"
+        )
+    except Exception:
+        # Matn o'zgarmagan bo'lsa Telegram xatolik qaytaradi
+        pass
+    if job['status'] in BROADCAST_ACTIVE_STATUSES:
+        # Oxirgi ochilgan holat xabari yangilanib turadi
+        await set_broadcast_status_message(broadcast_id, callback.message.chat.id, callback.message.message_id)
+    await callback.answer(notice)
+
+
 # Bekor qilish
 @router.callback_query(F.data == "broadcast_cancel")
 async def broadcast_cancel(callback: CallbackQuery, state: FSMContext):
@@ -2212,7 +2282,7 @@ async def admin_admins_handler(callback: CallbackQuery):
     
     from config import ADMINS
     from keyboards import admin_management_keyboard
-    db_admins = get_all_admins()
+    db_admins = await get_all_admins()
     all_admins = list(set(ADMINS + db_admins))
     
     text = f"""
@@ -2240,7 +2310,7 @@ async def admins_list_handler(callback: CallbackQuery):
     
     from config import ADMINS
     from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-    db_admins = get_all_admins()
+    db_admins = await get_all_admins()
     all_admins = list(set(ADMINS + db_admins))
     
     text = f"👑 <b>Adminlar ro'yxati</b>\n\n"
@@ -2385,7 +2455,7 @@ async def admin_add_receive_id(message: Message, state: FSMContext):
     from database import add_admin
     
     # Allaqachon admin ekanligini tekshirish
-    if new_admin_id in ADMINS or new_admin_id in get_all_admins():
+    if new_admin_id in ADMINS or new_admin_id in await get_all_admins():
         await message.answer("? Bu foydalanuvchi allaqachon admin!")
         await state.clear()
         return
@@ -2398,7 +2468,7 @@ async def admin_add_receive_id(message: Message, state: FSMContext):
         except:
             full_name = "Noma'lum"
     
-    success = add_admin(new_admin_id, full_name)
+    success = await add_admin(new_admin_id, full_name)
     
     if success:
         await message.answer(
@@ -2437,7 +2507,7 @@ async def admin_remove_handler(callback: CallbackQuery, state: FSMContext):
         return
     
     from config import ADMINS
-    db_admins = get_all_admins()
+    db_admins = await get_all_admins()
     
     # Faqat o'chiriladigan adminlar (config adminlarni olib tashlash)
     removable_admins = [admin_id for admin_id in db_admins if admin_id not in ADMINS]
@@ -2502,13 +2572,13 @@ async def admin_remove_receive_id(message: Message, state: FSMContext):
         await state.clear()
         return
     
-    if admin_id not in get_all_admins():
+    if admin_id not in await get_all_admins():
         await message.answer("? Bu foydalanuvchi admin emas!")
         await state.clear()
         return
     
     from database import remove_admin
-    success = remove_admin(admin_id)
+    success = await remove_admin(admin_id)
     
     if success:
         await message.answer(
@@ -2587,7 +2657,7 @@ async def remove_admin_handler(callback: CallbackQuery):
     admin_info = f"{full_name} {username}".strip() if username else full_name
     
     from database import remove_admin
-    success = remove_admin(admin_id)
+    success = await remove_admin(admin_id)
     
     if success:
         await callback.answer("? Admin o'chirildi!", show_alert=True)
@@ -2603,7 +2673,7 @@ async def remove_admin_handler(callback: CallbackQuery):
         
         # Ro'yxatga qaytish
         from keyboards import admin_management_keyboard
-        db_admins = get_all_admins()
+        db_admins = await get_all_admins()
         all_admins = list(set(ADMINS + db_admins))
         
         text = f"""
@@ -2736,7 +2806,7 @@ async def toggle_permission_handler(callback: CallbackQuery):
     current_value = perms.get(permission, False)
     new_value = not current_value
     
-    success = update_admin_permission(admin_id, permission, new_value)
+    success = await update_admin_permission(admin_id, permission, new_value)
     
     if success:
         status = "yoqildi ?" if new_value else "o'chirildi ?"
@@ -2826,10 +2896,10 @@ async def admin_referral_handler(callback: CallbackQuery):
     )
     from keyboards import referral_admin_keyboard
     
-    is_enabled = is_referral_enabled()
-    bonus = get_referral_bonus()
-    min_withdrawal = get_min_withdrawal()
-    stats = get_total_referral_stats()
+    is_enabled = await is_referral_enabled()
+    bonus = await get_referral_bonus()
+    min_withdrawal = await get_min_withdrawal()
+    stats = await get_total_referral_stats()
     
     status = "🟢 Yoniq" if is_enabled else "🔴 O'chiq"
     
@@ -2860,7 +2930,7 @@ async def referral_stats_handler(callback: CallbackQuery):
         return
     
     from database import get_total_referral_stats
-    stats = get_total_referral_stats()
+    stats = await get_total_referral_stats()
     
     text = f"""
 📊 <b>Referal statistikasi</b>
@@ -2897,9 +2967,9 @@ async def referral_settings_handler(callback: CallbackQuery):
     from database import is_referral_enabled, get_referral_bonus, get_min_withdrawal
     from keyboards import referral_settings_keyboard
     
-    is_enabled = is_referral_enabled()
-    bonus = get_referral_bonus()
-    min_withdrawal = get_min_withdrawal()
+    is_enabled = await is_referral_enabled()
+    bonus = await get_referral_bonus()
+    min_withdrawal = await get_min_withdrawal()
     
     status = "🟢 Yoniq" if is_enabled else "🔴 O'chiq"
     
@@ -2925,8 +2995,8 @@ async def referral_toggle_handler(callback: CallbackQuery):
     
     from database import is_referral_enabled, set_referral_enabled
     
-    current = is_referral_enabled()
-    set_referral_enabled(not current)
+    current = await is_referral_enabled()
+    await set_referral_enabled(not current)
     
     new_status = "✅ yoqildi" if not current else "❌ o'chirildi"
     await callback.answer(f"Referal tizimi {new_status}!", show_alert=True)
@@ -2944,7 +3014,7 @@ async def referral_set_bonus_handler(callback: CallbackQuery, state: FSMContext)
     from states import SetReferralBonus
     from database import get_referral_bonus
     
-    current = get_referral_bonus()
+    current = await get_referral_bonus()
     
     await state.set_state(SetReferralBonus.waiting_for_amount)
     await callback.message.edit_text(
@@ -2965,7 +3035,7 @@ async def set_referral_bonus_amount(message: Message, state: FSMContext):
     amount = int(message.text)
     
     from database import set_referral_bonus
-    set_referral_bonus(amount)
+    await set_referral_bonus(amount)
     
     await state.clear()
     await message.answer(
@@ -2985,7 +3055,7 @@ async def set_min_withdrawal_amount(message: Message, state: FSMContext):
     amount = int(message.text)
     
     from database import set_min_withdrawal
-    set_min_withdrawal(amount)
+    await set_min_withdrawal(amount)
     
     await state.clear()
     await message.answer(
@@ -3005,7 +3075,7 @@ async def referral_set_min_handler(callback: CallbackQuery, state: FSMContext):
     from states import SetMinWithdrawal
     from database import get_min_withdrawal
     
-    current = get_min_withdrawal()
+    current = await get_min_withdrawal()
     
     await state.set_state(SetMinWithdrawal.waiting_for_amount)
     await callback.message.edit_text(
@@ -3026,7 +3096,7 @@ async def referral_requests_handler(callback: CallbackQuery):
     from database import get_pending_withdrawals
     from keyboards import withdrawal_requests_keyboard
     
-    requests = get_pending_withdrawals()
+    requests = await get_pending_withdrawals()
     
     if not requests:
         from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
@@ -3065,7 +3135,7 @@ async def view_withdrawal_handler(callback: CallbackQuery):
     from database import get_withdrawal_request
     from keyboards import withdrawal_action_keyboard
     
-    req = get_withdrawal_request(request_id)
+    req = await get_withdrawal_request(request_id)
     
     if not req:
         await callback.answer("? So'rov topilmadi!", show_alert=True)
@@ -3104,12 +3174,12 @@ async def approve_withdrawal_handler(callback: CallbackQuery):
     
     from database import get_withdrawal_request, approve_withdrawal
     
-    req = get_withdrawal_request(request_id)
+    req = await get_withdrawal_request(request_id)
     if not req:
         await callback.answer("? So'rov topilmadi!", show_alert=True)
         return
     
-    success = approve_withdrawal(request_id, callback.from_user.id)
+    success = await approve_withdrawal(request_id, callback.from_user.id)
     
     if success:
         await callback.answer("? Tasdiqlandi!", show_alert=True)
@@ -3143,12 +3213,12 @@ async def reject_withdrawal_handler(callback: CallbackQuery):
     
     from database import get_withdrawal_request, reject_withdrawal
     
-    req = get_withdrawal_request(request_id)
+    req = await get_withdrawal_request(request_id)
     if not req:
         await callback.answer("? So'rov topilmadi!", show_alert=True)
         return
     
-    success = reject_withdrawal(request_id, callback.from_user.id)
+    success = await reject_withdrawal(request_id, callback.from_user.id)
     
     if success:
         await callback.answer("? Rad etildi!", show_alert=True)
@@ -3178,7 +3248,7 @@ async def referral_top_handler(callback: CallbackQuery):
         return
     
     from database import get_total_referral_stats
-    stats = get_total_referral_stats()
+    stats = await get_total_referral_stats()
     
     text = "🏆 <b>Top referralchilar</b>\n\n"
     
@@ -3221,7 +3291,7 @@ async def referral_edit_message_handler(callback: CallbackQuery, state: FSMConte
     from database import get_referral_message
     from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
     
-    current_message = get_referral_message()
+    current_message = await get_referral_message()
     
     cancel_keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
@@ -3256,7 +3326,7 @@ async def referral_message_receiver(message: Message, state: FSMContext):
         await message.answer("? Xabar bo'sh bo'lishi mumkin emas!")
         return
     
-    set_referral_message(new_message)
+    await set_referral_message(new_message)
     
     await state.clear()
     await message.answer(
@@ -3283,15 +3353,15 @@ async def start_message_photo_receiver(message: Message, state: FSMContext):
     
     # Rasmni saqlash
     photo = message.photo[-1]  # Eng katta rasm
-    set_start_media('photo', photo.file_id)
+    await set_start_media('photo', photo.file_id)
     
     # Caption bo'lsa, matnni ham yangilash
     if message.caption:
-        set_start_message(message.caption)
+        await set_start_message(message.caption)
     
     await state.clear()
     
-    current_message = get_start_message()
+    current_message = await get_start_message()
     
     await message.answer(
         f"? <b>Rasm saqlandi!</b>\n\n"
@@ -3311,15 +3381,15 @@ async def start_message_gif_receiver(message: Message, state: FSMContext):
     from keyboards import start_message_keyboard
     
     # GIFni saqlash
-    set_start_media('animation', message.animation.file_id)
+    await set_start_media('animation', message.animation.file_id)
     
     # Caption bo'lsa, matnni ham yangilash
     if message.caption:
-        set_start_message(message.caption)
+        await set_start_message(message.caption)
     
     await state.clear()
     
-    current_message = get_start_message()
+    current_message = await get_start_message()
     
     await message.answer(
         f"? <b>GIF saqlandi!</b>\n\n"
@@ -3351,11 +3421,11 @@ async def start_message_text_receiver(message: Message, state: FSMContext):
         return
     
     # Matnni saqlash
-    set_start_message(message.text)
+    await set_start_message(message.text)
     
     await state.clear()
     
-    has_media = get_start_media() is not None
+    has_media = await get_start_media() is not None
     
     await message.answer(
         f"? <b>Start xabari matni saqlandi!</b>\n\n"
@@ -3433,7 +3503,7 @@ async def add_channel_link(message: Message, state: FSMContext):
         try:
             chat = await message.bot.get_chat(f"@{username}")
             url = f"https://t.me/{username}"
-            success = add_channel(
+            success = await add_channel(
                 channel_id=chat.id,
                 channel_username=username,
                 title=chat.title,
@@ -3486,7 +3556,7 @@ async def add_channel_link(message: Message, state: FSMContext):
     import hashlib
     unique_id = int(hashlib.md5(text.encode()).hexdigest()[:8], 16) * -1
     
-    success = add_channel(
+    success = await add_channel(
         channel_id=unique_id,
         channel_username=None,
         title=f"{platform}: {title}",
@@ -3598,7 +3668,7 @@ async def add_request_group_link(message: Message, state: FSMContext):
     title = data.get('title')
     
     # Database ga saqlash
-    success = add_channel(
+    success = await add_channel(
         channel_id=chat_id,
         channel_username=None,
         title=f"📺 {title}",
@@ -3632,9 +3702,9 @@ async def movie_channel_button_handler(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
         return
     
-    is_enabled = is_channel_button_enabled()
-    btn_text = get_channel_button_text()
-    btn_url = get_channel_button_url()
+    is_enabled = await is_channel_button_enabled()
+    btn_text = await get_channel_button_text()
+    btn_url = await get_channel_button_url()
     
     status = "? Yoniq" if is_enabled else "? O'chiq"
     
@@ -3666,10 +3736,10 @@ async def channel_btn_toggle_handler(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
         return
     
-    new_status = toggle_channel_button()
+    new_status = await toggle_channel_button()
     is_enabled = new_status
-    btn_text = get_channel_button_text()
-    btn_url = get_channel_button_url()
+    btn_text = await get_channel_button_text()
+    btn_url = await get_channel_button_url()
     
     status = "? Yoniq" if is_enabled else "? O'chiq"
     
@@ -3713,7 +3783,7 @@ async def channel_btn_edit_text_handler(callback: CallbackQuery, state: FSMConte
     await state.set_state(EditChannelButtonState.waiting_for_text)
     await callback.message.answer(
         "📝 Yangi tugma matnini kiriting:\n\n"
-        f"Hozirgi: {get_channel_button_text()}",
+        f"Hozirgi: {await get_channel_button_text()}",
         reply_markup=cancel_reply_keyboard()
     )
     await callback.answer()
@@ -3727,7 +3797,7 @@ async def set_channel_btn_text(message: Message, state: FSMContext):
         await message.answer("❌ Bekor qilindi", reply_markup=admin_menu_keyboard())
         return
     
-    set_channel_button_text(message.text.strip())
+    await set_channel_button_text(message.text.strip())
     await state.clear()
     await message.answer(
         f"? Tugma matni yangilandi: {message.text.strip()}",
@@ -3741,7 +3811,7 @@ async def channel_btn_edit_url_handler(callback: CallbackQuery, state: FSMContex
     if not is_admin(callback.from_user.id):
         return
     
-    current_url = get_channel_button_url()
+    current_url = await get_channel_button_url()
     await state.set_state(EditChannelButtonState.waiting_for_url)
     await callback.message.answer(
         "🔗 Yangi havola kiriting:\n\n"
@@ -3764,7 +3834,7 @@ async def set_channel_btn_url(message: Message, state: FSMContext):
     if not url.startswith("https://") and not url.startswith("http://"):
         url = "https://" + url
     
-    set_channel_button_url(url)
+    await set_channel_button_url(url)
     await state.clear()
     await message.answer(
         f"? Tugma havolasi yangilandi: {url}",
@@ -3780,8 +3850,8 @@ async def toggle_premium_handler(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
         return
     
-    current = is_premium_enabled()
-    set_premium_enabled(not current)
+    current = await is_premium_enabled()
+    await set_premium_enabled(not current)
     new_status = "yoqildi ?" if not current else "o'chirildi ?"
     
     await callback.answer(f"Premium tizimi {new_status}", show_alert=True)
@@ -3798,11 +3868,11 @@ async def admin_premium_callback(callback: CallbackQuery):
         return
     
     from keyboards import premium_management_keyboard
-    enabled = is_premium_enabled()
-    premium_count = get_premium_users_count()
-    pending = len(get_pending_premium_requests())
-    plans = get_all_premium_plans()
-    card = get_payment_card()
+    enabled = await is_premium_enabled()
+    premium_count = await get_premium_users_count()
+    pending = len(await get_pending_premium_requests())
+    plans = await get_all_premium_plans()
+    card = await get_payment_card()
     
     text = f"""
 💎 <b>Premium Obuna Boshqaruvi</b>
@@ -3825,7 +3895,7 @@ async def premium_plans_handler(callback: CallbackQuery):
         return
     
     from keyboards import premium_plans_keyboard
-    plans = get_all_premium_plans()
+    plans = await get_all_premium_plans()
     
     if not plans:
         await callback.answer("Tariflar mavjud emas. Yangi tarif qo'shing.", show_alert=True)
@@ -3917,7 +3987,7 @@ async def premium_plan_price_handler(message: Message, state: FSMContext):
     name = data['name']
     duration = data['duration']
     
-    success = add_premium_plan(name, duration, price)
+    success = await add_premium_plan(name, duration, price)
     
     if success:
         await message.answer(
@@ -3940,7 +4010,7 @@ async def view_plan_handler(callback: CallbackQuery):
         return
     
     plan_id = int(callback.data.replace("view_plan_", ""))
-    plan = get_premium_plan(plan_id)
+    plan = await get_premium_plan(plan_id)
     
     if not plan:
         await callback.answer("Tarif topilmadi", show_alert=True)
@@ -3969,7 +4039,7 @@ async def delete_plan_handler(callback: CallbackQuery):
         return
     
     plan_id = int(callback.data.replace("delete_plan_", ""))
-    success = delete_premium_plan(plan_id)
+    success = await delete_premium_plan(plan_id)
     
     if success:
         await callback.answer("? Tarif o'chirildi", show_alert=True)
@@ -3978,7 +4048,7 @@ async def delete_plan_handler(callback: CallbackQuery):
     
     # Tariflar ro'yxatiga qaytish
     from keyboards import premium_plans_keyboard
-    plans = get_all_premium_plans()
+    plans = await get_all_premium_plans()
     
     if plans:
         text = "💎 <b>Premium Tariflar:</b>\n\n"
@@ -3991,7 +4061,7 @@ async def delete_plan_handler(callback: CallbackQuery):
         from keyboards import premium_management_keyboard
         await callback.message.edit_text(
             "❌ Tariflar mavjud emas.",
-            reply_markup=premium_management_keyboard(is_premium_enabled())
+            reply_markup=premium_management_keyboard(await is_premium_enabled())
         )
 
 
@@ -4001,7 +4071,7 @@ async def set_payment_card_handler(callback: CallbackQuery, state: FSMContext):
     if not is_admin(callback.from_user.id):
         return
     
-    current_card = get_payment_card()
+    current_card = await get_payment_card()
     await state.set_state(SetPaymentCard.waiting_for_card)
     await callback.message.answer(
         f"💳 <b>To'lov kartasini kiriting:</b>\n\n"
@@ -4022,7 +4092,7 @@ async def payment_card_handler(message: Message, state: FSMContext):
         return
     
     card = message.text.strip()
-    set_payment_card(card)
+    await set_payment_card(card)
     await state.clear()
     await message.answer(
         f"? To'lov kartasi saqlandi:\n<code>{card}</code>",
@@ -4037,7 +4107,7 @@ async def pending_premium_requests_handler(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
         return
     
-    requests = get_pending_premium_requests()
+    requests = await get_pending_premium_requests()
     
     if not requests:
         await callback.answer("Kutilayotgan so'rovlar yo'q", show_alert=True)
@@ -4090,13 +4160,13 @@ async def approve_premium_handler(callback: CallbackQuery):
         return
     
     request_id = int(callback.data.replace("approve_premium_", ""))
-    req = get_premium_request(request_id)
+    req = await get_premium_request(request_id)
     
     if not req:
         await callback.answer("So'rov topilmadi", show_alert=True)
         return
     
-    success = approve_premium_request(request_id, callback.from_user.id)
+    success = await approve_premium_request(request_id, callback.from_user.id)
     
     if success:
         await callback.answer("? Tasdiqlandi!", show_alert=True)
@@ -4131,13 +4201,13 @@ async def reject_premium_handler(callback: CallbackQuery):
         return
     
     request_id = int(callback.data.replace("reject_premium_", ""))
-    req = get_premium_request(request_id)
+    req = await get_premium_request(request_id)
     
     if not req:
         await callback.answer("So'rov topilmadi", show_alert=True)
         return
     
-    success = reject_premium_request(request_id, callback.from_user.id)
+    success = await reject_premium_request(request_id, callback.from_user.id)
     
     if success:
         await callback.answer("? Rad etildi", show_alert=True)
@@ -4170,19 +4240,8 @@ async def premium_users_list_handler(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
         return
     
-    from database import get_connection
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT ps.*, u.full_name, u.username, pp.name as plan_name
-        FROM premium_subscriptions ps
-        JOIN users u ON ps.user_id = u.user_id
-        LEFT JOIN premium_plans pp ON ps.plan_id = pp.id
-        WHERE ps.is_active = 1 AND ps.end_date > CURRENT_TIMESTAMP
-        ORDER BY ps.end_date DESC
-    ''')
-    users = cursor.fetchall()
-    conn.close()
+    from database import get_premium_users
+    users = await get_premium_users()
     
     if not users:
         await callback.answer("Premium foydalanuvchilar yo'q", show_alert=True)
@@ -4274,8 +4333,8 @@ async def backup_create_handler(callback: CallbackQuery):
             from datetime import datetime
             
             stats = backup.get_backup_stats()
-            users_count = get_users_count()
-            movies_count = get_movies_count()
+            users_count = await get_users_count()
+            movies_count = await get_movies_count()
             
             caption = f"""🗄 Zaxira nusxa yaratildi!
 
@@ -4486,7 +4545,7 @@ async def backup_confirm_restore_handler(callback: CallbackQuery):
         return
     
     selected = backups[index]
-    success, message = backup.restore_from_backup(selected['path'])
+    success, message = await backup.restore_backup(selected['path'])
     
     if success:
         await callback.message.edit_text(
@@ -4643,7 +4702,7 @@ async def restore_uploaded_handler(callback: CallbackQuery):
     filename = callback.data.replace("restore_uploaded_", "")
     file_path = f"backups/uploaded_{filename}"
     
-    success, message = backup.restore_from_backup(file_path)
+    success, message = await backup.restore_backup(file_path)
     
     if success:
         await callback.message.edit_text(
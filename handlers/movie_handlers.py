@@ -3,104 +3,33 @@ from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, C
 from aiogram.fsm.context import FSMContext
 
 from database import (
-    get_movie_by_code, search_movies, add_view, is_admin, get_base_channel,
-    is_channel_button_enabled, get_channel_button_text, get_channel_button_url,
-    is_subscription_enabled, get_all_channels, has_join_request, is_premium_user,
-    is_premium_enabled
+    get_movie_by_code, search_movies, add_view, get_base_channel,
+    is_channel_button_enabled, get_channel_button_text, get_channel_button_url
 )
-from keyboards import main_menu_keyboard, admin_menu_keyboard, movie_keyboard, subscription_keyboard
+from membership import check_subscription, forget_user, subscription_markup
+from middlewares import UserContext
+from keyboards import movie_keyboard
 from states import SearchMovie
 
 router = Router()
 
 
-def get_user_keyboard(user_id: int):
-    """Foydalanuvchi uchun klaviatura"""
-    if is_admin(user_id):
-        return admin_menu_keyboard()
-    is_premium = is_premium_user(user_id)
-    premium_enabled = is_premium_enabled()
-    return main_menu_keyboard(is_premium, premium_enabled)
-
-
-async def check_subscription(user_id: int, bot) -> bool:
-    """Foydalanuvchi kanallarga obuna bo'lganligini tekshirish"""
-    # Premium foydalanuvchilar uchun tekshirish shart emas
-    if is_premium_user(user_id):
-        return True
-    
-    if not is_subscription_enabled():
-        return True
-    
-    channels = get_all_channels()
-    if not channels:
-        return True
-    
-    for channel in channels:
-        channel_id = channel['channel_id']
-        
-        # Tashqi havolalar (Instagram, YouTube, etc.) - tekshirmaslik
-        if channel.get('is_external_link'):
-            continue  # Tashqi havola - o'tkazib yuborish
-        
-        # So'rovli guruh uchun - database dan tekshirish
-        if channel.get('is_request_group'):
-            if has_join_request(user_id, channel_id):
-                continue  # So'rov yuborilgan - OK
-            else:
-                return False  # So'rov yuborilmagan
-        
-        # Oddiy Telegram kanal uchun tekshirish
-        try:
-            member = await bot.get_chat_member(channel_id, user_id)
-            if member.status in ['left', 'kicked']:
-                return False
-        except Exception as e:
-            print(f"Subscription check error: {e}")
-            return False
-    
-    return True
-
 async def show_subscription_message(message: Message, pending_movie_code: str = None):
     """Obuna bo'lish xabarini ko'rsatish"""
-    channels = get_all_channels()
-    channels_data = [{
-        'title': ch['title'], 
-        'url': ch['url'],
-        'invite_link': ch.get('invite_link'),
-        'is_request_group': ch.get('is_request_group'),
-        'is_external_link': ch.get('is_external_link'),
-        'channel_id': ch.get('channel_id'),
-        'channel_username': ch.get('channel_username')
-    } for ch in channels]
-    
-    # Callback data ga kino kodini qo'shish
-    callback_data = f"check_sub_{pending_movie_code}" if pending_movie_code else "check_subscription"
-    
-    from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-    buttons = []
-    for channel in channels_data:
-        url = channel.get('invite_link') or channel.get('url') or f"https://t.me/{channel.get('channel_username', '')}"
-        if channel.get('is_external_link'):
-            btn_text = f"🔗 {channel.get('title', 'Obuna')}"
-        else:
-            btn_text = "➕ Kanalga obuna bo'lish"
-        buttons.append([InlineKeyboardButton(text=btn_text, url=url)])
-    buttons.append([InlineKeyboardButton(text="✅ Obunani tekshirish", callback_data=callback_data)])
-    
+    # Klaviatura kanallar snapshoti bo'yicha oldindan quriladi (kino kodi callback_data da)
     await message.answer(
         "❗️ Botdan foydalanish uchun quyidagi kanallarga obuna bo'ling:",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons)
+        reply_markup=await subscription_markup(pending_movie_code)
     )
 
 
-def get_movie_channel_button():
+async def get_movie_channel_button():
     """Kino uchun kanal tugmasini olish"""
-    if not is_channel_button_enabled():
+    if not await is_channel_button_enabled():
         return None
     
-    btn_text = get_channel_button_text()
-    btn_url = get_channel_button_url()
+    btn_text = await get_channel_button_text()
+    btn_url = await get_channel_button_url()
     
     if not btn_url:
         return None
@@ -116,7 +45,7 @@ async def send_movie_to_user(message: Message, movie, keyboard):
     """Foydalanuvchiga kinoni yuborish - baza kanaldan copy yoki file_id orqali"""
     
     # Kanal tugmasini olish
-    channel_button = get_movie_channel_button()
+    channel_button = await get_movie_channel_button()
     
     # Agar baza kanal va message_id mavjud bo'lsa - copy qilish
     if movie['base_channel_id'] and movie['message_id']:
@@ -145,15 +74,14 @@ async def send_movie_to_user(message: Message, movie, keyboard):
 
 
 @router.message(SearchMovie.waiting_for_query)
-async def search_movie_handler(message: Message, state: FSMContext):
+async def search_movie_handler(message: Message, state: FSMContext, user_ctx: UserContext):
     """Qidiruv natijalari"""
     query = message.text.strip()
     
     # Bekor qilish tugmasi
     if query == "❌ Bekor qilish":
         await state.clear()
-        keyboard = get_user_keyboard(message.from_user.id)
-        await message.answer("❌ Qidiruv bekor qilindi.", reply_markup=keyboard)
+        await message.answer("❌ Qidiruv bekor qilindi.", reply_markup=await user_ctx.menu_keyboard())
         return
     
     # Boshqa tugmalarni tekshirish
@@ -164,29 +92,28 @@ async def search_movie_handler(message: Message, state: FSMContext):
         await state.clear()
         return
     
-    # Obuna tekshirish (admin emas bo'lsa)
-    if not is_admin(message.from_user.id):
-        is_subscribed = await check_subscription(message.from_user.id, message.bot)
-        if not is_subscribed:
-            # Kino kodini tekshirish va pending qilish
-            movie = get_movie_by_code(query)
-            if movie:
-                await show_subscription_message(message, query)  # Kino kodi bilan
-            else:
-                await show_subscription_message(message)
-            return
+    # Kod bo'yicha kino - bir marta qidiriladi
+    movie = await get_movie_by_code(query)
     
-    keyboard = get_user_keyboard(message.from_user.id)
+    # Obuna tekshirish (adminlar uchun natija bo'sh - tekshirilmaydi)
+    if not await user_ctx.is_subscribed(message.bot):
+        # Kino kodi bo'lsa pending qilish
+        if movie:
+            await show_subscription_message(message, query)  # Kino kodi bilan
+        else:
+            await show_subscription_message(message)
+        return
+    
+    keyboard = await user_ctx.menu_keyboard()
     
     # Avval kod bo'yicha qidirish
-    movie = get_movie_by_code(query)
     if movie:
         await send_movie_to_user(message, movie, keyboard)
         await state.clear()
         return
     
     # Nom bo'yicha qidirish
-    movies = search_movies(query)
+    movies = await search_movies(query)
     if movies:
         text = f"🔍 <b>'{query}' bo'yicha natijalar:</b>\n\n"
         for m in movies:
@@ -204,7 +131,7 @@ async def search_movie_handler(message: Message, state: FSMContext):
 
 
 @router.message(F.text)
-async def any_text_handler(message: Message, state: FSMContext):
+async def any_text_handler(message: Message, state: FSMContext, user_ctx: UserContext):
     """Har qanday matn - kino qidirish"""
     query = message.text.strip()
     
@@ -226,29 +153,28 @@ async def any_text_handler(message: Message, state: FSMContext):
     if current_state:
         return
     
-    # Obuna tekshirish (admin emas bo'lsa)
-    if not is_admin(message.from_user.id):
-        is_subscribed = await check_subscription(message.from_user.id, message.bot)
-        if not is_subscribed:
-            # Kino kodini tekshirish va pending qilish
-            movie = get_movie_by_code(query)
-            if movie:
-                await show_subscription_message(message, query)  # Kino kodi bilan
-            else:
-                await show_subscription_message(message)
-            return
+    # Kod bo'yicha kino - bir marta qidiriladi
+    movie = await get_movie_by_code(query)
+    
+    # Obuna tekshirish (adminlar uchun natija bo'sh - tekshirilmaydi)
+    if not await user_ctx.is_subscribed(message.bot):
+        # Kino kodi bo'lsa pending qilish
+        if movie:
+            await show_subscription_message(message, query)  # Kino kodi bilan
+        else:
+            await show_subscription_message(message)
+        return
     
     
-    keyboard = get_user_keyboard(message.from_user.id)
+    keyboard = await user_ctx.menu_keyboard()
     
     # Avval kod bo'yicha qidirish
-    movie = get_movie_by_code(query)
     if movie:
         await send_movie_to_user(message, movie, keyboard)
         return
     
     # Nom bo'yicha qidirish
-    movies = search_movies(query)
+    movies = await search_movies(query)
     if movies:
         text = f"🔍 <b>'{query}' bo'yicha natijalar:</b>\n\n"
         for m in movies:
@@ -264,13 +190,16 @@ async def any_text_handler(message: Message, state: FSMContext):
 
 
 @router.callback_query(F.data.startswith("check_sub_"))
-async def check_subscription_with_movie_callback(callback: CallbackQuery):
+async def check_subscription_with_movie_callback(callback: CallbackQuery, user_ctx: UserContext):
     """Obunani tekshirish va kinoni yuborish"""
     # Kino kodini olish
     movie_code = callback.data.replace("check_sub_", "")
     
+    # Foydalanuvchi hozirgina obuna bo'lgan bo'lishi mumkin - keshdan emas, qaytadan tekshirish
+    forget_user(callback.from_user.id)
+    
     # Obuna tekshirish
-    is_subscribed = await check_subscription(callback.from_user.id, callback.bot)
+    is_subscribed = await check_subscription(callback.from_user.id, callback.bot, refresh=True)
     
     if is_subscribed:
         # Obuna tasdiqlandi - kinoni yuborish
@@ -279,13 +208,12 @@ async def check_subscription_with_movie_callback(callback: CallbackQuery):
         except:
             pass
         
-        movie = get_movie_by_code(movie_code)
+        movie = await get_movie_by_code(movie_code)
+        keyboard = await user_ctx.menu_keyboard()
         if movie:
-            keyboard = get_user_keyboard(callback.from_user.id)
             await send_movie_to_user(callback.message, movie, keyboard)
             await callback.answer("✅ Obuna tasdiqlandi!", show_alert=False)
         else:
-            keyboard = get_user_keyboard(callback.from_user.id)
             await callback.message.answer(
                 "✅ Obuna tasdiqlandi! Endi botdan foydalanishingiz mumkin.\n\n"
                 "🔍 Kino kodini yoki nomini yuboring:",
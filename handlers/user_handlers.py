@@ -1,109 +1,38 @@
 from aiogram import Router, F
-from aiogram.types import Message, ChatJoinRequest, CallbackQuery
+from aiogram.types import Message, ChatJoinRequest, CallbackQuery, ChatMemberUpdated
 from aiogram.filters import CommandStart, Command
 from aiogram.fsm.context import FSMContext
 
 from database import (
     add_user, get_movie_by_code, get_movies_count, 
-    get_users_count, get_total_views, is_admin,
-    is_subscription_enabled, get_all_channels,
-    add_join_request, has_join_request,
-    is_premium_user, is_premium_enabled, get_all_premium_plans,
+    get_users_count, get_total_views,
+    get_all_channels,
+    add_join_request, set_channel_member, forget_channel_members, set_users_reachable,
+    get_all_premium_plans,
     get_premium_plan, add_premium_request, get_payment_card,
     # Referal funksiyalar
-    is_referral_enabled, add_user_with_referral, get_user_referral_balance,
+    add_user_with_referral, get_user_referral_balance,
     get_user_referral_count, get_user_referrals, get_referral_bonus,
     get_min_withdrawal, create_withdrawal_request, get_user_withdrawal_history,
     get_referral_history
 )
+from membership import (
+    check_channels, is_subscribed, not_subscribed, forget_user,
+    is_member_status, membership_cache, subscription_markup
+)
 from keyboards import (
     main_menu_keyboard, admin_menu_keyboard, subscription_keyboard,
     user_premium_plans_keyboard, referral_user_keyboard, 
-    main_menu_with_referral_keyboard, withdrawal_confirm_keyboard
+    withdrawal_confirm_keyboard
 )
+from middlewares import UserContext
 from states import SearchMovie, PremiumPayment, Withdrawal
 
 router = Router()
 
 
-async def check_subscription(user_id: int, bot) -> bool:
-    """Foydalanuvchi kanallarga obuna bo'lganligini tekshirish"""
-    # Premium foydalanuvchilar uchun tekshirish shart emas
-    if is_premium_user(user_id):
-        return True
-    
-    if not is_subscription_enabled():
-        return True
-    
-    channels = get_all_channels()
-    if not channels:
-        return True
-    
-    for channel in channels:
-        channel_id = channel['channel_id']
-        
-        # Tashqi havolalar (Instagram, YouTube, etc.) - tekshirmaslik, faqat ko'rsatish
-        if channel.get('is_external_link'):
-            continue  # Tashqi havola - o'tkazib yuborish
-        
-        # So'rovli guruh uchun - database dan so'rov yuborgan yoki yo'qligini tekshirish
-        if channel.get('is_request_group'):
-            if has_join_request(user_id, channel_id):
-                continue  # So'rov yuborilgan - OK
-            else:
-                return False  # So'rov yuborilmagan
-        
-        # Oddiy Telegram kanal uchun tekshirish
-        try:
-            member = await bot.get_chat_member(channel_id, user_id)
-            if member.status in ['left', 'kicked']:
-                return False
-        except Exception as e:
-            print(f"Subscription check error for channel {channel.get('title')}: {e}")
-            return False
-    
-    return True
-
-
-async def get_not_subscribed_channels(user_id: int, bot) -> list:
-    """Foydalanuvchi obuna bo'lmagan kanallar ro'yxatini olish"""
-    if not is_subscription_enabled():
-        return []
-    
-    channels = get_all_channels()
-    if not channels:
-        return []
-    
-    not_subscribed = []
-    
-    for channel in channels:
-        channel_id = channel['channel_id']
-        
-        # Tashqi havolalar (Instagram, YouTube, etc.) - har doim ko'rsatish
-        if channel.get('is_external_link'):
-            not_subscribed.append(channel)  # Har doim ko'rsatish
-            continue
-        
-        # So'rovli guruh uchun - database dan tekshirish
-        if channel.get('is_request_group'):
-            if not has_join_request(user_id, channel_id):
-                not_subscribed.append(channel)
-            continue
-        
-        # Oddiy Telegram kanal uchun tekshirish
-        try:
-            member = await bot.get_chat_member(channel_id, user_id)
-            if member.status in ['left', 'kicked']:
-                not_subscribed.append(channel)
-        except Exception as e:
-            # Xatolik bo'lsa - obuna emas deb hisoblaymiz
-            not_subscribed.append(channel)
-    
-    return not_subscribed
-
-
 @router.message(CommandStart())
-async def start_handler(message: Message, state: FSMContext):
+async def start_handler(message: Message, state: FSMContext, user_ctx: UserContext):
     """Start komandasi"""
     await state.clear()
     
@@ -124,8 +53,8 @@ async def start_handler(message: Message, state: FSMContext):
                 pass
     
     # Foydalanuvchini database ga qo'shish (referal bilan)
-    if is_referral_enabled() and referred_by:
-        is_new = add_user_with_referral(
+    if await user_ctx.referral_enabled() and referred_by:
+        is_new = await add_user_with_referral(
             user_id=message.from_user.id,
             full_name=message.from_user.full_name,
             username=message.from_user.username,
@@ -133,7 +62,7 @@ async def start_handler(message: Message, state: FSMContext):
         )
         if is_new and referred_by:
             # Taklif qilgan odamga xabar yuborish
-            bonus = get_referral_bonus()
+            bonus = await get_referral_bonus()
             try:
                 await message.bot.send_message(
                     referred_by,
@@ -145,38 +74,25 @@ async def start_handler(message: Message, state: FSMContext):
             except:
                 pass
     else:
-        add_user(
+        await add_user(
             user_id=message.from_user.id,
             full_name=message.from_user.full_name,
             username=message.from_user.username
         )
     
-    # Obuna tekshirish
-    if not is_admin(message.from_user.id):
-        is_subscribed = await check_subscription(message.from_user.id, message.bot)
-        if not is_subscribed:
-            channels = get_all_channels()
-            # To'liq channel ma'lumotlarini yuborish
-            channels_data = [{
-                'title': ch['title'], 
-                'url': ch['url'],
-                'invite_link': ch.get('invite_link'),
-                'is_request_group': ch.get('is_request_group'),
-                'is_external_link': ch.get('is_external_link'),
-                'channel_id': ch.get('channel_id'),
-                'channel_username': ch.get('channel_username')
-            } for ch in channels]
-            await message.answer(
-                "❗️ Botdan foydalanish uchun quyidagi kanallarga obuna bo'ling:",
-                reply_markup=subscription_keyboard(channels_data)
-            )
-            return
+    # Obuna tekshirish (adminlar uchun natija bo'sh - tekshirilmaydi)
+    if not await user_ctx.is_subscribed(message.bot):
+        await message.answer(
+            "❗️ Botdan foydalanish uchun quyidagi kanallarga obuna bo'ling:",
+            reply_markup=await subscription_markup()
+        )
+        return
     
     # Kino kodi bilan deep link
     if len(args) > 1:
         code = args[1]
         if not code.startswith('ref_'):  # Referal emas
-            movie = get_movie_by_code(code)
+            movie = await get_movie_by_code(code)
             if movie:
                 caption = movie['caption'] if movie['caption'] else f"🎬 {movie['title']}\n\n📥 Kod: {movie['code']}"
                 await message.answer_video(
@@ -186,10 +102,9 @@ async def start_handler(message: Message, state: FSMContext):
                 return
     
     # Admin uchun
-    if is_admin(message.from_user.id):
-        from database import get_admin_permissions
+    if user_ctx.is_admin:
         from keyboards import admin_menu_keyboard_dynamic
-        perms = get_admin_permissions(message.from_user.id)
+        perms = user_ctx.permissions
         if perms and perms.get('is_super'):
             # Super admin - to'liq menyu
             text = "👑 <b>Super Admin Panel</b>\n\n⬇️ Quyidagi tugmalardan foydalaning:"
@@ -201,16 +116,12 @@ async def start_handler(message: Message, state: FSMContext):
         return
     
     # Oddiy foydalanuvchi uchun
-    is_premium = is_premium_user(message.from_user.id)
-    premium_enabled = is_premium_enabled()
-    referral_enabled = is_referral_enabled()
-    
     # Start xabarini database'dan olish
     from database import get_start_message, get_start_media
     
-    start_text = get_start_message()
-    start_media = get_start_media()
-    keyboard = main_menu_with_referral_keyboard(is_premium, premium_enabled, referral_enabled)
+    start_text = await get_start_message()
+    start_media = await get_start_media()
+    keyboard = await user_ctx.main_menu_keyboard()
     
     try:
         if start_media:
@@ -244,18 +155,18 @@ async def start_handler(message: Message, state: FSMContext):
 
 
 @router.message(F.text == "💎 Premium obuna olish")
-async def premium_button_handler(message: Message, state: FSMContext):
+async def premium_button_handler(message: Message, state: FSMContext, user_ctx: UserContext):
     """Premium obuna tugmasi"""
-    if is_admin(message.from_user.id):
+    if user_ctx.is_admin:
         return
     
     # Premium yoniq emasligini tekshirish
-    if not is_premium_enabled():
+    if not await user_ctx.premium_enabled():
         await message.answer("❌ Premium obuna hozircha mavjud emas.")
         return
     
     # Foydalanuvchi allaqachon premium ekanligini tekshirish
-    if is_premium_user(message.from_user.id):
+    if await user_ctx.is_premium():
         await message.answer(
             "💎 Siz allaqachon Premium foydalanuvchisiz!\n\n"
             "Sizda majburiy obuna talab qilinmaydi."
@@ -263,12 +174,12 @@ async def premium_button_handler(message: Message, state: FSMContext):
         return
     
     # Tariflarni ko'rsatish
-    plans = get_all_premium_plans()
+    plans = await get_all_premium_plans()
     if not plans:
         await message.answer("❌ Hozircha tariflar mavjud emas.")
         return
     
-    card = get_payment_card()
+    card = await get_payment_card()
     
     text = """
 💎 <b>Premium Obuna</b>
@@ -291,13 +202,13 @@ async def premium_button_handler(message: Message, state: FSMContext):
 async def buy_plan_callback(callback: CallbackQuery, state: FSMContext):
     """Tarif tanlash"""
     plan_id = int(callback.data.replace("buy_plan_", ""))
-    plan = get_premium_plan(plan_id)
+    plan = await get_premium_plan(plan_id)
     
     if not plan:
         await callback.answer("❌ Tarif topilmadi", show_alert=True)
         return
     
-    card = get_payment_card()
+    card = await get_payment_card()
     
     text = f"""
 💎 <b>{plan['name']}</b>
@@ -319,7 +230,7 @@ async def buy_plan_callback(callback: CallbackQuery, state: FSMContext):
 
 
 @router.message(PremiumPayment.waiting_for_receipt, F.photo | F.document)
-async def premium_receipt_handler(message: Message, state: FSMContext):
+async def premium_receipt_handler(message: Message, state: FSMContext, user_ctx: UserContext):
     """Chek qabul qilish"""
     data = await state.get_data()
     plan_id = data.get('plan_id')
@@ -340,10 +251,10 @@ async def premium_receipt_handler(message: Message, state: FSMContext):
         return
     
     # So'rovni saqlash
-    request_id = add_premium_request(message.from_user.id, plan_id, file_id, file_type)
+    request_id = await add_premium_request(message.from_user.id, plan_id, file_id, file_type)
     
     if request_id:
-        premium_enabled = is_premium_enabled()
+        premium_enabled = await user_ctx.premium_enabled()
         await message.answer(
             "✅ Chekingiz qabul qilindi!\n\n"
             "⏳ Admin tekshirib, tasdiqlashini kuting.\n"
@@ -353,9 +264,9 @@ async def premium_receipt_handler(message: Message, state: FSMContext):
         
         # Adminlarga xabar yuborish
         from database import get_all_admins
-        plan = get_premium_plan(plan_id)
+        plan = await get_premium_plan(plan_id)
         
-        for admin in get_all_admins():
+        for admin in await get_all_admins():
             try:
                 from keyboards import premium_request_keyboard
                 admin_text = f"""
@@ -394,55 +305,45 @@ async def premium_receipt_handler(message: Message, state: FSMContext):
 
 
 @router.callback_query(F.data == "cancel_premium")
-async def cancel_premium_callback(callback: CallbackQuery, state: FSMContext):
+async def cancel_premium_callback(callback: CallbackQuery, state: FSMContext, user_ctx: UserContext):
     """Premium bekor qilish"""
     await state.clear()
-    is_premium = is_premium_user(callback.from_user.id)
-    premium_enabled = is_premium_enabled()
     await callback.message.edit_text("❌ Bekor qilindi.")
-    await callback.message.answer("📌 Kino kodini yuboring:", reply_markup=main_menu_keyboard(is_premium, premium_enabled))
+    keyboard = main_menu_keyboard(await user_ctx.is_premium(), await user_ctx.premium_enabled())
+    await callback.message.answer("📌 Kino kodini yuboring:", reply_markup=keyboard)
 
 
 @router.callback_query(F.data == "check_subscription")
-async def check_subscription_callback(callback, state: FSMContext):
+async def check_subscription_callback(callback, state: FSMContext, user_ctx: UserContext):
     """Obunani tekshirish"""
-    # Haqiqiy obuna tekshirish (Instagram hisobga olinmaydi)
-    is_subscribed = await check_subscription(callback.from_user.id, callback.bot)
+    # Foydalanuvchi hozirgina obuna bo'lgan bo'lishi mumkin - keshdan emas, qaytadan tekshirish
+    forget_user(callback.from_user.id)
     
-    if is_subscribed:
+    # Barcha kanallar bir marta tekshiriladi - natija ham tekshiruv, ham ro'yxat uchun
+    verdicts = await check_channels(callback.from_user.id, callback.bot, refresh=True)
+    
+    if is_subscribed(verdicts):
         # Hammaga obuna bo'lgan
         try:
             await callback.message.delete()
         except:
             pass
-        is_premium = is_premium_user(callback.from_user.id)
-        premium_enabled = is_premium_enabled()
         await callback.message.answer(
             "✅ Obuna tasdiqlandi! Endi botdan foydalanishingiz mumkin.\n\n"
             "🔍 Kino kodini yoki nomini yuboring:",
-            reply_markup=main_menu_keyboard(is_premium, premium_enabled)
+            reply_markup=main_menu_keyboard(await user_ctx.is_premium(), await user_ctx.premium_enabled())
         )
     else:
         # Hali obuna bo'lmagan kanallar bor - yangilangan ro'yxatni ko'rsatish
-        not_subscribed_channels = await get_not_subscribed_channels(callback.from_user.id, callback.bot)
+        not_subscribed_channels = not_subscribed(verdicts)
         
         # Faqat majburiy kanallar sonini hisoblash (Instagram emas)
         required_count = len([ch for ch in not_subscribed_channels if not ch.get('is_external_link')])
-        
-        channels_data = [{
-            'title': ch['title'], 
-            'url': ch['url'],
-            'invite_link': ch.get('invite_link'),
-            'is_request_group': ch.get('is_request_group'),
-            'is_external_link': ch.get('is_external_link'),
-            'channel_id': ch.get('channel_id'),
-            'channel_username': ch.get('channel_username')
-        } for ch in not_subscribed_channels]
-        
+
         try:
             await callback.message.edit_text(
                 f"❗️ Siz hali {required_count} ta kanalga obuna bo'lmadingiz:",
-                reply_markup=subscription_keyboard(channels_data)
+                reply_markup=subscription_keyboard(not_subscribed_channels)
             )
         except:
             pass
@@ -486,21 +387,21 @@ async def help_command(message: Message):
 # ===== REFERAL TIZIMI HANDLERLARI =====
 
 @router.message(F.text == "💵 Referal - Pul ishlash")
-async def referral_menu_handler(message: Message, state: FSMContext):
+async def referral_menu_handler(message: Message, state: FSMContext, user_ctx: UserContext):
     """Referal menyusi"""
-    if is_admin(message.from_user.id):
+    if user_ctx.is_admin:
         return
     
-    if not is_referral_enabled():
+    if not await user_ctx.referral_enabled():
         await message.answer("❌ Referal tizimi hozircha faol emas.")
         return
     
     await state.clear()
     
-    balance = get_user_referral_balance(message.from_user.id)
-    referral_count = get_user_referral_count(message.from_user.id)
-    bonus = get_referral_bonus()
-    min_withdrawal = get_min_withdrawal()
+    balance = await get_user_referral_balance(message.from_user.id)
+    referral_count = await get_user_referral_count(message.from_user.id)
+    bonus = await get_referral_bonus()
+    min_withdrawal = await get_min_withdrawal()
     
     text = f"""
 💵 <b>Referal - Pul ishlash</b>
@@ -522,12 +423,12 @@ async def referral_menu_handler(message: Message, state: FSMContext):
 
 
 @router.message(F.text == "🔗 Referal havolam")
-async def referral_link_handler(message: Message):
+async def referral_link_handler(message: Message, user_ctx: UserContext):
     """Referal havolani ko'rsatish"""
-    if is_admin(message.from_user.id):
+    if user_ctx.is_admin:
         return
     
-    if not is_referral_enabled():
+    if not await user_ctx.referral_enabled():
         await message.answer("❌ Referal tizimi hozircha faol emas.")
         return
     
@@ -538,7 +439,7 @@ async def referral_link_handler(message: Message):
     referral_link = f"https://t.me/{bot_info.username}?start=ref_{message.from_user.id}"
     
     # Admin tomonidan yozilgan xabar
-    custom_message = get_referral_message()
+    custom_message = await get_referral_message()
     
     text = f"""🔗 <b>Sizning referal havolangiz:</b>
 
@@ -551,18 +452,18 @@ async def referral_link_handler(message: Message):
 
 
 @router.message(F.text == "💰 Hisobim")
-async def referral_balance_handler(message: Message):
+async def referral_balance_handler(message: Message, user_ctx: UserContext):
     """Referal balansni ko'rsatish"""
-    if is_admin(message.from_user.id):
+    if user_ctx.is_admin:
         return
     
-    if not is_referral_enabled():
+    if not await user_ctx.referral_enabled():
         await message.answer("❌ Referal tizimi hozircha faol emas.")
         return
     
-    balance = get_user_referral_balance(message.from_user.id)
-    referral_count = get_user_referral_count(message.from_user.id)
-    bonus = get_referral_bonus()
+    balance = await get_user_referral_balance(message.from_user.id)
+    referral_count = await get_user_referral_count(message.from_user.id)
+    bonus = await get_referral_bonus()
     
     text = f"""
 💰 <b>Sizning hisobingiz</b>
@@ -578,16 +479,16 @@ async def referral_balance_handler(message: Message):
 
 
 @router.message(F.text == "📊 Statistikam")
-async def referral_stats_handler(message: Message):
+async def referral_stats_handler(message: Message, user_ctx: UserContext):
     """Referal statistikasi"""
-    if is_admin(message.from_user.id):
+    if user_ctx.is_admin:
         return
     
-    if not is_referral_enabled():
+    if not await user_ctx.referral_enabled():
         await message.answer("❌ Referal tizimi hozircha faol emas.")
         return
     
-    referrals = get_user_referrals(message.from_user.id)
+    referrals = await get_user_referrals(message.from_user.id)
     
     if not referrals:
         text = """
@@ -614,16 +515,16 @@ async def referral_stats_handler(message: Message):
 
 
 @router.message(F.text == "📜 Tarix")
-async def referral_history_handler(message: Message):
+async def referral_history_handler(message: Message, user_ctx: UserContext):
     """Pul chiqarish tarixi"""
-    if is_admin(message.from_user.id):
+    if user_ctx.is_admin:
         return
     
-    if not is_referral_enabled():
+    if not await user_ctx.referral_enabled():
         await message.answer("❌ Referal tizimi hozircha faol emas.")
         return
     
-    history = get_user_withdrawal_history(message.from_user.id)
+    history = await get_user_withdrawal_history(message.from_user.id)
     
     if not history:
         text = """
@@ -649,17 +550,17 @@ Hali pul chiqarish so'rovi yubormadingiz.
 
 
 @router.message(F.text == "💳 Pul chiqarish")
-async def withdrawal_start_handler(message: Message, state: FSMContext):
+async def withdrawal_start_handler(message: Message, state: FSMContext, user_ctx: UserContext):
     """Pul chiqarish boshlash"""
-    if is_admin(message.from_user.id):
+    if user_ctx.is_admin:
         return
     
-    if not is_referral_enabled():
+    if not await user_ctx.referral_enabled():
         await message.answer("❌ Referal tizimi hozircha faol emas.")
         return
     
-    balance = get_user_referral_balance(message.from_user.id)
-    min_withdrawal = get_min_withdrawal()
+    balance = await get_user_referral_balance(message.from_user.id)
+    min_withdrawal = await get_min_withdrawal()
     
     if balance < min_withdrawal:
         await message.answer(
@@ -684,17 +585,11 @@ async def withdrawal_start_handler(message: Message, state: FSMContext):
 
 
 @router.message(Withdrawal.waiting_for_amount)
-async def withdrawal_amount_handler(message: Message, state: FSMContext):
+async def withdrawal_amount_handler(message: Message, state: FSMContext, user_ctx: UserContext):
     """Pul miqdorini qabul qilish"""
     if message.text == "🔙 Asosiy menyu":
         await state.clear()
-        is_premium = is_premium_user(message.from_user.id)
-        premium_enabled = is_premium_enabled()
-        referral_enabled = is_referral_enabled()
-        await message.answer(
-            "🏠 Asosiy menyu", 
-            reply_markup=main_menu_with_referral_keyboard(is_premium, premium_enabled, referral_enabled)
-        )
+        await message.answer("🏠 Asosiy menyu", reply_markup=await user_ctx.main_menu_keyboard())
         return
     
     try:
@@ -705,7 +600,7 @@ async def withdrawal_amount_handler(message: Message, state: FSMContext):
     
     data = await state.get_data()
     balance = data.get('balance', 0)
-    min_withdrawal = get_min_withdrawal()
+    min_withdrawal = await get_min_withdrawal()
     
     if amount < min_withdrawal:
         await message.answer(f"❌ Minimal chiqarish summasi: {min_withdrawal:,} so'm")
@@ -728,17 +623,11 @@ async def withdrawal_amount_handler(message: Message, state: FSMContext):
 
 
 @router.message(Withdrawal.waiting_for_card)
-async def withdrawal_card_handler(message: Message, state: FSMContext):
+async def withdrawal_card_handler(message: Message, state: FSMContext, user_ctx: UserContext):
     """Karta raqamini qabul qilish"""
     if message.text == "🔙 Asosiy menyu":
         await state.clear()
-        is_premium = is_premium_user(message.from_user.id)
-        premium_enabled = is_premium_enabled()
-        referral_enabled = is_referral_enabled()
-        await message.answer(
-            "🏠 Asosiy menyu", 
-            reply_markup=main_menu_with_referral_keyboard(is_premium, premium_enabled, referral_enabled)
-        )
+        await message.answer("🏠 Asosiy menyu", reply_markup=await user_ctx.main_menu_keyboard())
         return
     
     card = message.text.replace(" ", "").replace("-", "")
@@ -778,7 +667,7 @@ async def confirm_withdrawal_handler(callback: CallbackQuery, state: FSMContext)
         await state.clear()
         return
     
-    success, msg = create_withdrawal_request(callback.from_user.id, amount, card)
+    success, msg = await create_withdrawal_request(callback.from_user.id, amount, card)
     
     if success:
         await callback.message.edit_text(
@@ -819,14 +708,13 @@ async def cancel_withdrawal_handler(callback: CallbackQuery, state: FSMContext):
 
 
 @router.message(F.text == "🔙 Asosiy menyu")
-async def back_to_main_menu_handler(message: Message, state: FSMContext):
+async def back_to_main_menu_handler(message: Message, state: FSMContext, user_ctx: UserContext):
     """Asosiy menyuga qaytish"""
     await state.clear()
     
-    if is_admin(message.from_user.id):
-        from database import get_admin_permissions
+    if user_ctx.is_admin:
         from keyboards import admin_menu_keyboard_dynamic
-        perms = get_admin_permissions(message.from_user.id)
+        perms = user_ctx.permissions
         if perms and perms.get('is_super'):
             text = "👑 <b>Super Admin Panel</b>\n\n⬇️ Quyidagi tugmalardan foydalaning:"
             await message.answer(text, reply_markup=admin_menu_keyboard(), parse_mode="HTML")
@@ -835,10 +723,6 @@ async def back_to_main_menu_handler(message: Message, state: FSMContext):
             await message.answer(text, reply_markup=admin_menu_keyboard_dynamic(perms), parse_mode="HTML")
         return
     
-    is_premium = is_premium_user(message.from_user.id)
-    premium_enabled = is_premium_enabled()
-    referral_enabled = is_referral_enabled()
-    
     text = """
 🎬 <b>Kino Bot</b>ga xush kelibsiz!
 
@@ -847,7 +731,7 @@ async def back_to_main_menu_handler(message: Message, state: FSMContext):
     
     await message.answer(
         text, 
-        reply_markup=main_menu_with_referral_keyboard(is_premium, premium_enabled, referral_enabled), 
+        reply_markup=await user_ctx.main_menu_keyboard(), 
         parse_mode="HTML"
     )
 
@@ -861,8 +745,40 @@ async def chat_join_request_handler(request: ChatJoinRequest):
         channel_id = request.chat.id
         
         # So'rovni database ga saqlash
-        add_join_request(user_id, channel_id)
+        await add_join_request(user_id, channel_id)
         print(f"Join request saved: user={user_id}, channel={channel_id}")
         
     except Exception as e:
         print(f"Chat join request error: {e}")
+
+
+@router.chat_member()
+async def chat_member_handler(update: ChatMemberUpdated):
+    """Majburiy kanalga qo'shilish / chiqish - a'zolik jurnalini yangilash"""
+    try:
+        channel_id = update.chat.id
+        if channel_id not in [ch['channel_id'] for ch in await get_all_channels()]:
+            return
+        
+        user_id = update.new_chat_member.user.id
+        status = update.new_chat_member.status
+        await set_channel_member(user_id, channel_id, str(status))
+        membership_cache.set(user_id, channel_id, is_member_status(status))
+        
+    except Exception as e:
+        print(f"Chat member update error: {e}")
+
+
+@router.my_chat_member()
+async def my_chat_member_handler(update: ChatMemberUpdated):
+    """Bot kanal adminligidan chiqarilsa - yangilanishlar kelmaydi, jurnal endi ishonchli emas"""
+    try:
+        if update.chat.type == 'private':
+            # Foydalanuvchi botni bloklasa 'kicked', blokdan chiqarsa 'member'
+            await set_users_reachable([update.chat.id], update.new_chat_member.status != 'kicked')
+            return
+        if update.new_chat_member.status not in ('administrator', 'creator'):
+            await forget_channel_members(update.chat.id)
+            print(f"Channel member ledger cleared: channel={update.chat.id}")
+    except Exception as e:
+        print(f"My chat member update error: {e}")
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from aiogram.types import (
     ReplyKeyboardMarkup, 
     KeyboardButton,
@@ -6,7 +8,20 @@ from aiogram.types import (
     KeyboardButtonRequestChat
 )
 
+# Tez-tez yuboriladigan menyular kiruvchi bayroqlar bo'yicha bir marta quriladi va qayta ishlatiladi.
+# Qoida: @lru_cache li funksiyalar qaytargan klaviaturalar barcha javoblarda umumiy obyekt - aiogram
+# markup lari o'zgaruvchan (frozen emas), shuning uchun ularni joyida o'zgartirmang (tugma qo'shish,
+# .keyboard/.inline_keyboard ro'yxatini tahrirlash). O'zgartirilgan menyu kerak bo'lsa - model_copy(deep=True)
+MENU_CACHE_SIZE = 64
+
+# Admin menyusiga ta'sir qiladigan huquqlar (kesh kaliti shu tartibda yig'iladi)
+ADMIN_MENU_PERMISSIONS = (
+    'can_stats', 'can_channels', 'can_movies', 'can_broadcast',
+    'can_premium', 'can_admins', 'can_settings'
+)
+
 
+@lru_cache(maxsize=MENU_CACHE_SIZE)
 def main_menu_keyboard(is_premium: bool = False, premium_enabled: bool = False):
     """Asosiy menyu"""
     buttons = []
@@ -25,6 +40,7 @@ def main_menu_keyboard(is_premium: bool = False, premium_enabled: bool = False):
     return keyboard
 
 
+@lru_cache(maxsize=None)
 def admin_menu_keyboard():
     """Admin asosiy menyu - Reply keyboard"""
     keyboard = ReplyKeyboardMarkup(
@@ -210,6 +226,7 @@ def channel_button_settings_keyboard(is_enabled: bool):
     return keyboard
 
 
+@lru_cache(maxsize=None)
 def statistics_keyboard():
     """Professional statistika paneli"""
     keyboard = InlineKeyboardMarkup(
@@ -287,7 +304,7 @@ def confirm_keyboard(action: str):
     return keyboard
 
 
-def subscription_keyboard(channels: list):
+def subscription_keyboard(channels: list, callback_data: str = "check_subscription"):
     """Obuna bo'lish uchun kanallar"""
     buttons = []
     for channel in channels:
@@ -297,7 +314,7 @@ def subscription_keyboard(channels: list):
         else:
             btn_text = "➕ Kanalga obuna bo'lish"
         buttons.append([InlineKeyboardButton(text=btn_text, url=url)])
-    buttons.append([InlineKeyboardButton(text="✅ Obunani tekshirish", callback_data="check_subscription")])
+    buttons.append([InlineKeyboardButton(text="✅ Obunani tekshirish", callback_data=callback_data)])
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
@@ -396,6 +413,7 @@ def broadcast_type_keyboard():
     """Xabar turini tanlash"""
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
+            [InlineKeyboardButton(text="🎯 Auditoriyani tanlash", callback_data="broadcast_segments")],
             [InlineKeyboardButton(text="📝 Oddiy matn", callback_data="broadcast_text")],
             [InlineKeyboardButton(text="🖼 Rasm + Matn", callback_data="broadcast_photo")],
             [InlineKeyboardButton(text="🎬 Video + Matn", callback_data="broadcast_video")],
@@ -403,6 +421,7 @@ def broadcast_type_keyboard():
             [InlineKeyboardButton(text="🖼 Rasm + Matn + Tugma", callback_data="broadcast_photo_button")],
             [InlineKeyboardButton(text="🎬 Video + Matn + Tugma", callback_data="broadcast_video_button")],
             [InlineKeyboardButton(text="📋 Forward qilish", callback_data="broadcast_forward")],
+            [InlineKeyboardButton(text="📤 Yuborilayotgan reklamalar", callback_data="broadcast_jobs")],
             [InlineKeyboardButton(text="🔙 Orqaga", callback_data="back_to_admin")]
         ]
     )
@@ -435,6 +454,47 @@ def broadcast_button_keyboard():
     return keyboard
 
 
+def broadcast_job_keyboard(broadcast_id: int, status: str):
+    """Reklama vazifasini boshqarish"""
+    buttons = []
+    if status == 'running':
+        buttons.append(InlineKeyboardButton(text="⏸ To'xtatish", callback_data=f"bc_pause_{broadcast_id}"))
+    elif status == 'paused':
+        buttons.append(InlineKeyboardButton(text="▶️ Davom ettirish", callback_data=f"bc_resume_{broadcast_id}"))
+    rows = []
+    if buttons:
+        buttons.append(InlineKeyboardButton(text="⛔ Bekor qilish", callback_data=f"bc_cancel_{broadcast_id}"))
+        rows.append(buttons)
+    rows.append([InlineKeyboardButton(text="🔄 Yangilash", callback_data=f"bc_status_{broadcast_id}")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def broadcast_segments_keyboard(segments: list, selected: str = None):
+    """Reklama auditoriyasini tanlash - segment hajmi bilan"""
+    all_mark = "✅ " if selected is None else ""
+    buttons = [[InlineKeyboardButton(text=f"{all_mark}👥 Barcha foydalanuvchilar", callback_data="bseg_all")]]
+    for segment in segments:
+        mark = "✅ " if segment['key'] == selected else ""
+        buttons.append([InlineKeyboardButton(
+            text=f"{mark}{segment['title']} - {segment['size']}",
+            callback_data=f"bseg_{segment['key']}"
+        )])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def broadcast_jobs_keyboard(broadcasts: list):
+    """Tugamagan reklama vazifalari ro'yxati"""
+    buttons = []
+    for job in broadcasts:
+        icon = "▶️" if job['status'] == 'running' else "⏸"
+        buttons.append([InlineKeyboardButton(
+            text=f"{icon} #{job['id']} - {job['sent'] + job['failed']}/{job['total']}",
+            callback_data=f"bc_status_{job['id']}"
+        )])
+    buttons.append([InlineKeyboardButton(text="🔙 Orqaga", callback_data="admin_broadcast")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
 def broadcast_skip_caption_keyboard():
     """Matn kiritmasdan o'tkazish"""
     keyboard = InlineKeyboardMarkup(
@@ -528,6 +588,14 @@ def admin_permissions_keyboard(admin_id: int, permissions: dict):
 
 def admin_menu_keyboard_dynamic(permissions: dict):
     """Admin menyu - huquqlarga ko'ra dinamik"""
+    flags = tuple(bool(permissions.get(key)) for key in ADMIN_MENU_PERMISSIONS)
+    return _admin_menu_keyboard(flags)
+
+
+@lru_cache(maxsize=MENU_CACHE_SIZE)
+def _admin_menu_keyboard(flags: tuple):
+    """Huquqlar bayroqlari bo'yicha admin menyusini qurish"""
+    permissions = dict(zip(ADMIN_MENU_PERMISSIONS, flags))
     buttons = []
     if permissions.get('can_stats'):
         buttons.append(KeyboardButton(text="📊 Statistika"))
@@ -584,6 +652,7 @@ def referral_user_keyboard():
     return keyboard
 
 
+@lru_cache(maxsize=MENU_CACHE_SIZE)
 def main_menu_with_referral_keyboard(is_premium: bool = False, premium_enabled: bool = False, referral_enabled: bool = False):
     """Asosiy menyu - referal bilan"""
     buttons = []
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Kanal a'zoligi keshi
+- bot.get_chat_member natijalari (user_id, channel_id) bo'yicha saqlanadi
+- A'zo / a'zo emas natijalari uchun alohida TTL
+- "✅ Obunani tekshirish" bosilganda foydalanuvchi keshi tozalanadi
+- Barcha kanallar bir vaqtda (asyncio.gather) tekshiriladi, natija har bir kanal uchun
+- Asosiy manba - channel_members jurnali (chat_member yangilanishlari);
+  yozuv keyingi yangilanishgacha ishonchli; get_chat_member faqat jurnalda yo'q foydalanuvchilar uchun
+  (yoki yozuv MEMBERSHIP_LEDGER_MAX_AGE_HOURS dan eski bo'lsa - o'tkazib yuborilgan yangilanish) chaqiriladi
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+
+from config import (
+    MEMBERSHIP_TTL_POSITIVE, MEMBERSHIP_TTL_NEGATIVE, MEMBERSHIP_CACHE_SIZE,
+    MEMBERSHIP_LEDGER_MAX_AGE_HOURS, SUBSCRIPTION_CHECK_TIMEOUT
+)
+from database import (
+    is_premium_user, is_subscription_enabled, get_all_channels, has_join_request,
+    get_channel_statuses, set_channel_member, channel_cache
+)
+from keyboards import subscription_keyboard
+
+# Bu holatlar - kanalga a'zo emas
+NOT_MEMBER_STATUSES = ('left', 'kicked')
+
+# Jurnal yozuvining maksimal yoshi (soniya)
+LEDGER_MAX_AGE = MEMBERSHIP_LEDGER_MAX_AGE_HOURS * 3600
+
+
+class MembershipCache:
+    """user_id -> {channel_id: (a'zomi, tugash vaqti)}, foydalanuvchilar bo'yicha LRU"""
+
+    def __init__(self, positive_ttl: float, negative_ttl: float, max_users: int = 50000):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_users = max_users
+        self._users = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int, channel_id: int):
+        """Keshdagi natija (yo'q yoki eskirgan bo'lsa None)"""
+        channels = self._users.get(user_id)
+        entry = channels.get(channel_id) if channels else None
+        if entry is None or entry[1] <= time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._users.move_to_end(user_id)
+        return entry[0]
+
+    def set(self, user_id: int, channel_id: int, is_member: bool):
+        """Natijani saqlash"""
+        ttl = self.positive_ttl if is_member else self.negative_ttl
+        channels = self._users.setdefault(user_id, {})
+        channels[channel_id] = (is_member, time.monotonic() + ttl)
+        self._users.move_to_end(user_id)
+        if len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        """Foydalanuvchining barcha natijalarini tashlash"""
+        self._users.pop(user_id, None)
+
+    def clear(self):
+        """Butun keshni tozalash"""
+        self._users.clear()
+
+    def stats(self) -> dict:
+        """Kesh statistikasi"""
+        total = self.hits + self.misses
+        return {
+            'users': len(self._users),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total * 100 if total else 0
+        }
+
+
+membership_cache = MembershipCache(MEMBERSHIP_TTL_POSITIVE, MEMBERSHIP_TTL_NEGATIVE, MEMBERSHIP_CACHE_SIZE)
+
+
+def is_member_status(status) -> bool:
+    """Holat bo'yicha a'zomi"""
+    return status not in NOT_MEMBER_STATUSES
+
+
+async def is_channel_member(bot, channel_id: int, user_id: int) -> bool:
+    """Foydalanuvchi kanalga a'zomi (keshdan yoki get_chat_member orqali)"""
+    cached = membership_cache.get(user_id, channel_id)
+    if cached is not None:
+        return cached
+
+    # Xatolik keshlanmaydi - keyingi safar qayta so'raladi
+    member = await bot.get_chat_member(channel_id, user_id)
+    is_member = is_member_status(member.status)
+    membership_cache.set(user_id, channel_id, is_member)
+    # Jurnalga yozish - keyingi o'zgarishlar chat_member yangilanishlari orqali keladi
+    await set_channel_member(user_id, channel_id, str(member.status))
+    return is_member
+
+
+def forget_user(user_id: int):
+    """Foydalanuvchi "Obunani tekshirish" ni bosganda - yangidan tekshirish"""
+    membership_cache.invalidate_user(user_id)
+
+
+def get_membership_cache_stats() -> dict:
+    """A'zolik keshi hit/miss hisoblagichlari"""
+    return membership_cache.stats()
+
+
+# ===== OBUNA TEKSHIRISH =====
+
+async def channel_verdict(bot, user_id: int, channel, ledger: dict, refresh: bool = False) -> bool:
+    """Bitta kanal natijasi: True - obuna, False - obuna emas, None - tekshirilmaydi (tashqi havola)"""
+    channel_id = channel['channel_id']
+    
+    # Tashqi havolalar (Instagram, YouTube, etc.) - tekshirmaslik, faqat ko'rsatish
+    if channel.get('is_external_link'):
+        return None
+    
+    # So'rovli guruh uchun - database dan so'rov yuborgan yoki yo'qligini tekshirish
+    if channel.get('is_request_group'):
+        return await has_join_request(user_id, channel_id)
+    
+    # Jurnalda bor bo'lsa - API ga murojaat yo'q (yozuv keyingi chat_member yangilanishigacha amal qiladi).
+    # refresh - "Obunani tekshirish" bosilganda "a'zo emas" yozuvlari jonli qayta tekshiriladi
+    entry = ledger.get(channel_id)
+    if entry is not None:
+        status, age = entry
+        is_member = is_member_status(status)
+        if age <= LEDGER_MAX_AGE and (is_member or not refresh):
+            return is_member
+
+    # Oddiy Telegram kanal - xatolik yoki vaqt tugasa obuna emas deb hisoblanadi
+    try:
+        return await asyncio.wait_for(is_channel_member(bot, channel_id, user_id), SUBSCRIPTION_CHECK_TIMEOUT)
+    except Exception as e:
+        print(f"Subscription check error for channel {channel.get('title')}: {e!r}")
+        return False
+
+
+async def check_channels(user_id: int, bot, refresh: bool = False) -> list:
+    """Barcha majburiy kanallar bo'yicha natija - [(kanal, natija), ...] (premium yoki o'chiq bo'lsa bo'sh)"""
+    if await is_premium_user(user_id):
+        return []
+    
+    if not await is_subscription_enabled():
+        return []
+    
+    channels = await get_all_channels()
+    if not channels:
+        return []
+    
+    # Jurnal bitta indeksli so'rov bilan o'qiladi
+    ledger = await get_channel_statuses(user_id)
+    verdicts = await asyncio.gather(*(
+        channel_verdict(bot, user_id, channel, ledger, refresh) for channel in channels
+    ))
+    return list(zip(channels, verdicts))
+
+
+def is_subscribed(verdicts: list) -> bool:
+    """Barcha tekshiriladigan kanallarga obuna bo'lganmi"""
+    return all(verdict is not False for _, verdict in verdicts)
+
+
+def not_subscribed(verdicts: list) -> list:
+    """Ko'rsatilishi kerak bo'lgan kanallar (obuna bo'linmagan va tashqi havolalar)"""
+    return [channel for channel, verdict in verdicts if verdict is not True]
+
+
+async def check_subscription(user_id: int, bot, refresh: bool = False) -> bool:
+    """Foydalanuvchi kanallarga obuna bo'lganligini tekshirish"""
+    return is_subscribed(await check_channels(user_id, bot, refresh))
+
+
+async def get_not_subscribed_channels(user_id: int, bot) -> list:
+    """Foydalanuvchi obuna bo'lmagan kanallar ro'yxatini olish"""
+    return not_subscribed(await check_channels(user_id, bot))
+
+
+# ===== OBUNA KLAVIATURASI =====
+
+# (snapshot versiyasi, callback_data) -> tayyor klaviatura
+SUBSCRIPTION_MARKUP_CACHE_SIZE = 512
+_subscription_markups = {}
+
+
+async def subscription_markup(pending_movie_code: str = None):
+    """Barcha kanallar uchun obuna klaviaturasi - har bir snapshot versiyasi uchun bir marta quriladi"""
+    callback_data = f"check_sub_{pending_movie_code}" if pending_movie_code else "check_subscription"
+    version = channel_cache.version
+    channels = await get_all_channels()
+
+    key = (version, callback_data)
+    markup = _subscription_markups.get(key)
+    if markup is None:
+        markup = subscription_keyboard(channels, callback_data)
+        # Kanallar o'zgargan bo'lsa (yoki kino kodlari ko'payib ketsa) eskilari tashlanadi
+        if version == channel_cache.version:
+            if len(_subscription_markups) >= SUBSCRIPTION_MARKUP_CACHE_SIZE or any(
+                cached_version != version for cached_version, _ in _subscription_markups
+            ):
+                _subscription_markups.clear()
+            _subscription_markups[key] = markup
+    return markup
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Update darajasidagi middleware
+- Har bir update uchun foydalanuvchi holati (UserContext) - qiymatlar birinchi so'ralganda o'qiladi
+  va update davomida saqlanadi (ishlatilmagan qiymat umuman o'qilmaydi)
+- Handlerlarga `user_ctx` nomi bilan uzatiladi
+- Har bir update uchun database so'rovlari soni hisoblanadi
+"""
+
+import logging
+from functools import cached_property
+
+from aiogram import BaseMiddleware
+
+from database import (
+    round_trips, is_admin, get_admin_permissions, is_premium_user,
+    is_premium_enabled, is_referral_enabled
+)
+from membership import check_channels, is_subscribed as all_subscribed
+from keyboards import admin_menu_keyboard, main_menu_keyboard, main_menu_with_referral_keyboard
+
+
+class UserContext:
+    """Bitta update davomida foydalanuvchi holati (lazy, memoizatsiya qilingan)"""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self._values = {}
+
+    async def _memo(self, key: str, loader):
+        """Qiymat update davomida bir marta o'qiladi"""
+        if key not in self._values:
+            self._values[key] = await loader()
+        return self._values[key]
+
+    @cached_property
+    def is_admin(self) -> bool:
+        return is_admin(self.user_id)
+
+    @cached_property
+    def permissions(self) -> dict:
+        return get_admin_permissions(self.user_id)
+
+    async def is_premium(self) -> bool:
+        return await self._memo('is_premium', lambda: is_premium_user(self.user_id))
+
+    async def premium_enabled(self) -> bool:
+        return await self._memo('premium_enabled', is_premium_enabled)
+
+    async def referral_enabled(self) -> bool:
+        return await self._memo('referral_enabled', is_referral_enabled)
+
+    async def channel_verdicts(self, bot) -> list:
+        """Kanallar bo'yicha natija - update davomida bir marta tekshiriladi (adminlar uchun bo'sh)"""
+        if self.is_admin:
+            return []
+        return await self._memo('verdicts', lambda: check_channels(self.user_id, bot))
+
+    async def is_subscribed(self, bot) -> bool:
+        """Barcha majburiy kanallarga obuna bo'lganmi"""
+        return all_subscribed(await self.channel_verdicts(bot))
+
+    async def menu_keyboard(self):
+        """Foydalanuvchi uchun asosiy klaviatura"""
+        if self.is_admin:
+            return admin_menu_keyboard()
+        return main_menu_keyboard(await self.is_premium(), await self.premium_enabled())
+
+    async def main_menu_keyboard(self):
+        """Oddiy foydalanuvchi asosiy menyusi (premium va referal tugmalari bilan)"""
+        return main_menu_with_referral_keyboard(
+            await self.is_premium(), await self.premium_enabled(), await self.referral_enabled()
+        )
+
+
+class RequestContextMiddleware(BaseMiddleware):
+    """Outer middleware: UserContext berish va DB so'rovlarini sanash"""
+
+    def __init__(self):
+        self.updates = 0
+        self.round_trips = 0
+
+    async def __call__(self, handler, event, data):
+        counter = [0]
+        token = round_trips.set(counter)
+        try:
+            user = data.get('event_from_user')
+            if user is not None:
+                data['user_ctx'] = UserContext(user.id)
+            return await handler(event, data)
+        finally:
+            round_trips.reset(token)
+            self.updates += 1
+            self.round_trips += counter[0]
+            logging.debug(f"Update {event.update_id}: {counter[0]} ta DB so'rov")
+
+    def stats(self) -> dict:
+        """Update boshiga o'rtacha DB so'rovlari"""
+        return {
+            'updates': self.updates,
+            'round_trips': self.round_trips,
+            'per_update': self.round_trips / self.updates if self.updates else 0
+        }
+
+
+request_context = RequestContextMiddleware()
@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+"""
+Database migratsiyalari
+- schema_version jadvali qo'llanilgan versiyalarni saqlaydi
+- Har bir qadam tartib bilan va faqat bir marta bajariladi
+- Yangi o'zgarish = MIGRATIONS oxiriga yangi qadam qo'shish
+"""
+
+import logging
+import sqlite3
+
+from uzbek_text import normalize_text
+
+
+def add_column(cursor, table: str, column: str, definition: str):
+    """Ustun yo'q bo'lsa qo'shish (eski bazalar uchun)"""
+    cursor.execute(f'PRAGMA table_info({table})')
+    if column not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+def initial_schema(cursor):
+    """Asosiy jadvallar"""
+    # Foydalanuvchilar jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER UNIQUE NOT NULL,
+            full_name TEXT,
+            username TEXT,
+            is_premium INTEGER DEFAULT 0,
+            referred_by INTEGER,
+            joined_date TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Kinolar jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS movies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            code TEXT UNIQUE NOT NULL,
+            title TEXT NOT NULL,
+            genre TEXT,
+            duration TEXT,
+            file_id TEXT NOT NULL,
+            caption TEXT,
+            added_by INTEGER,
+            base_channel_id INTEGER,
+            message_id INTEGER,
+            added_date TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Kanallar jadvali (majburiy obuna)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS channels (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel_id INTEGER UNIQUE,
+            channel_username TEXT,
+            title TEXT,
+            url TEXT,
+            invite_link TEXT,
+            is_request_group INTEGER DEFAULT 0,
+            is_external_link INTEGER DEFAULT 0,
+            is_active INTEGER DEFAULT 1,
+            added_date TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Bot sozlamalari jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+
+    # Qo'shilish so'rovlari jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS join_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            request_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, channel_id)
+        )
+    ''')
+
+    # Adminlar jadvali (kengaytirilgan huquqlar bilan)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS admins (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE NOT NULL,
+            full_name TEXT,
+            added_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            can_movies INTEGER DEFAULT 1,
+            can_channels INTEGER DEFAULT 1,
+            can_broadcast INTEGER DEFAULT 1,
+            can_stats INTEGER DEFAULT 1,
+            can_premium INTEGER DEFAULT 1,
+            can_admins INTEGER DEFAULT 0,
+            can_settings INTEGER DEFAULT 0
+        )
+    ''')
+
+    # Statistika jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS statistics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            movie_id INTEGER,
+            user_id INTEGER,
+            watched_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (movie_id) REFERENCES movies(id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+
+    # Premium tariflar jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS premium_plans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            duration_days INTEGER NOT NULL,
+            price INTEGER NOT NULL,
+            description TEXT,
+            is_active INTEGER DEFAULT 1,
+            created_date TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Premium obunalar jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS premium_subscriptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            plan_id INTEGER,
+            start_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            end_date TEXT NOT NULL,
+            is_active INTEGER DEFAULT 1,
+            FOREIGN KEY (plan_id) REFERENCES premium_plans(id)
+        )
+    ''')
+
+    # Premium to'lov so'rovlari jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS premium_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            plan_id INTEGER NOT NULL,
+            file_id TEXT,
+            file_type TEXT,
+            status TEXT DEFAULT 'pending',
+            admin_id INTEGER,
+            created_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            processed_date TEXT,
+            FOREIGN KEY (plan_id) REFERENCES premium_plans(id)
+        )
+    ''')
+
+
+def legacy_columns(cursor):
+    """Eski bazalarda yo'q bo'lgan ustunlar"""
+    add_column(cursor, 'channels', 'is_external_link', 'INTEGER DEFAULT 0')
+    add_column(cursor, 'admins', 'can_movies', 'INTEGER DEFAULT 1')
+    add_column(cursor, 'admins', 'can_channels', 'INTEGER DEFAULT 1')
+    add_column(cursor, 'admins', 'can_broadcast', 'INTEGER DEFAULT 1')
+    add_column(cursor, 'admins', 'can_stats', 'INTEGER DEFAULT 1')
+    add_column(cursor, 'admins', 'can_premium', 'INTEGER DEFAULT 1')
+    add_column(cursor, 'admins', 'can_admins', 'INTEGER DEFAULT 0')
+    add_column(cursor, 'admins', 'can_settings', 'INTEGER DEFAULT 0')
+
+
+def referral_schema(cursor):
+    """Referal tizimi jadvallari"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS referral_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            referrer_id INTEGER NOT NULL,
+            referred_id INTEGER NOT NULL,
+            bonus_amount INTEGER NOT NULL,
+            created_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (referrer_id) REFERENCES users(user_id),
+            FOREIGN KEY (referred_id) REFERENCES users(user_id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS withdrawal_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            amount INTEGER NOT NULL,
+            card_number TEXT NOT NULL,
+            status TEXT DEFAULT 'pending',
+            admin_id INTEGER,
+            created_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            processed_date TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    ''')
+
+    add_column(cursor, 'users', 'referral_balance', 'INTEGER DEFAULT 0')
+
+
+def default_settings(cursor):
+    """Default sozlamalar"""
+    settings = [
+        ('subscription_enabled', '1'),
+        ('base_channel_id', ''),
+        ('subscription_message', '❗️ Botdan foydalanish uchun quyidagi kanallarga obuna bo\'ling:'),
+        ('channel_button_enabled', '1'),  # Kanal tugmasi yoniq/o'chiq
+        ('channel_button_text', '📢 Kanal'),  # Tugma matni
+        ('channel_button_url', ''),  # Tugma havolasi
+        # Referal sozlamalari
+        ('referral_enabled', '0'),
+        ('referral_bonus', '500'),
+        ('min_withdrawal', '10000'),
+    ]
+
+    for key, value in settings:
+        cursor.execute('''
+            INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)
+        ''', (key, value))
+
+
+def statistics_indexes(cursor):
+    """Indekslar - statistika, premium va referal so'rovlari uchun"""
+    indexes = [
+        'CREATE INDEX IF NOT EXISTS idx_statistics_watched_date ON statistics(watched_date)',
+        'CREATE INDEX IF NOT EXISTS idx_statistics_movie_id ON statistics(movie_id)',
+        'CREATE INDEX IF NOT EXISTS idx_statistics_user_date ON statistics(user_id, watched_date)',
+        'CREATE INDEX IF NOT EXISTS idx_users_joined_date ON users(joined_date)',
+        'CREATE INDEX IF NOT EXISTS idx_users_referred_by ON users(referred_by)',
+        'CREATE INDEX IF NOT EXISTS idx_premium_subscriptions_user ON premium_subscriptions(user_id, is_active, end_date)',
+        'CREATE INDEX IF NOT EXISTS idx_withdrawal_requests_status ON withdrawal_requests(status)',
+    ]
+    for statement in indexes:
+        cursor.execute(statement)
+
+
+def movie_search_index(cursor):
+    """Kinolar uchun FTS5 qidiruv indeksi (normallashtirilgan kod va nom)"""
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5(
+            code,
+            title,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    ''')
+    # Indeksni movies jadvalidan qaytadan to'ldirish (rowid = movies.id)
+    cursor.execute('DELETE FROM movies_fts')
+    cursor.execute('SELECT id, code, title FROM movies')
+    rows = [(row[0], normalize_text(row[1]), normalize_text(row[2])) for row in cursor.fetchall()]
+    cursor.executemany('INSERT INTO movies_fts (rowid, code, title) VALUES (?, ?, ?)', rows)
+
+
+def channel_members_ledger(cursor):
+    """Kanal a'zoligi jurnali - chat_member yangilanishlaridan yig'iladi"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS channel_members (
+            user_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            updated_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, channel_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_channel_members_channel ON channel_members(channel_id)')
+
+
+def broadcasts_schema(cursor):
+    """Reklama yuborish vazifalari - kursor (users.id) bo'yicha davom ettiriladi"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_id INTEGER NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running',
+            cursor INTEGER NOT NULL DEFAULT 0,
+            max_user_id INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            sent INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            created_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            finished_date TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_broadcasts_status ON broadcasts(status)')
+
+
+def user_reachability(cursor):
+    """Foydalanuvchiga xabar yetib boradimi (botni bloklagan, o'chirilgan akkaunt - 0)"""
+    add_column(cursor, 'users', 'is_reachable', 'INTEGER NOT NULL DEFAULT 1')
+    # Qisman indeks - reklama faqat yetib boradigan foydalanuvchilar bo'yicha yuradi
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_reachable ON users(id) WHERE is_reachable = 1')
+
+
+def broadcast_progress(cursor):
+    """Reklama holati xabari (admin chatida yangilanadi) va bloklaganlar soni"""
+    add_column(cursor, 'broadcasts', 'blocked', 'INTEGER NOT NULL DEFAULT 0')
+    add_column(cursor, 'broadcasts', 'status_chat_id', 'INTEGER')
+    add_column(cursor, 'broadcasts', 'status_message_id', 'INTEGER')
+
+
+# Boshlang'ich segmentlar: (kalit, nomi, mezonlar JSON) - mezonlar database.segment_condition da
+DEFAULT_SEGMENTS = [
+    ('active_7d', "🔥 Faol (7 kun)", '{"active_days": 7}'),
+    ('active_30d', "📈 Faol (30 kun)", '{"active_days": 30}'),
+    ('inactive_30d', "😴 30 kundan beri kino ko'rmagan", '{"inactive_days": 30}'),
+    ('premium', "💎 Premium", '{"premium": true}'),
+    ('non_premium', "👤 Premium emas", '{"premium": false}'),
+    ('new_7d', "🆕 Yangi (7 kun ichida qo'shilgan)", '{"joined_within_days": 7}'),
+    ('referred', "🤝 Referal orqali kelgan", '{"referred": true}'),
+    ('referrers', "📣 Do'st taklif qilganlar", '{"referrer": true}'),
+]
+
+
+def audience_segments(cursor):
+    """Auditoriya segmentlari - mezonlar va ularga mos foydalanuvchilar (users.id) to'plami"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS segments (
+            key TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            definition TEXT NOT NULL,
+            size INTEGER NOT NULL DEFAULT 0,
+            refreshed_date TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS segment_members (
+            segment TEXT NOT NULL,
+            user_row INTEGER NOT NULL,
+            PRIMARY KEY (segment, user_row)
+        ) WITHOUT ROWID
+    ''')
+    add_column(cursor, 'broadcasts', 'segment', 'TEXT')
+    for key, title, definition in DEFAULT_SEGMENTS:
+        cursor.execute('''
+            INSERT OR IGNORE INTO segments (key, title, definition) VALUES (?, ?, ?)
+        ''', (key, title, definition))
+
+
+def broadcast_errors(cursor):
+    """Reklama vazifasining ketma-ket xatoliklari (ko'p bo'lsa vazifa failed holatiga o'tadi)"""
+    add_column(cursor, 'broadcasts', 'errors', 'INTEGER NOT NULL DEFAULT 0')
+    add_column(cursor, 'broadcasts', 'last_error', 'TEXT')
+
+
+# (versiya, tavsif, funksiya) - faqat oxiriga qo'shiladi, tartib o'zgarmaydi
+MIGRATIONS = [
+    (1, "Asosiy jadvallar", initial_schema),
+    (2, "Eski bazalar uchun ustunlar", legacy_columns),
+    (3, "Referal tizimi", referral_schema),
+    (4, "Default sozlamalar", default_settings),
+    (5, "Statistika indekslari", statistics_indexes),
+    (6, "Kinolar qidiruv indeksi (FTS5)", movie_search_index),
+    (7, "Kanal a'zoligi jurnali", channel_members_ledger),
+    (8, "Reklama yuborish vazifalari", broadcasts_schema),
+    (9, "Foydalanuvchiga yetib borish belgisi", user_reachability),
+    (10, "Reklama holati xabari", broadcast_progress),
+    (11, "Auditoriya segmentlari", audience_segments),
+    (12, "Reklama xatoliklari", broadcast_errors),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn) -> int:
+    """Bazaning joriy sxema versiyasi (0 - migratsiyasiz eski baza)"""
+    try:
+        row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+
+def run_migrations(conn) -> int:
+    """Qo'llanilmagan migratsiyalarni tartib bilan bajarish"""
+    current = get_schema_version(conn)
+    if current >= LATEST_VERSION:
+        return current
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_date TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        # Har bir qadam alohida tranzaksiyada - xato bo'lsa to'liq bekor qilinadi
+        conn.execute('BEGIN')
+        try:
+            migrate(conn.cursor())
+            conn.execute(
+                'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                (version, description)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logging.info(f"🗃 Migratsiya {version} bajarildi: {description}")
+
+    return LATEST_VERSION
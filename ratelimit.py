@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Telegram Bot API ga chiquvchi xabarlar cheklagichi (token bucket)
+- Umumiy chegara: RATE_LIMIT_GLOBAL xabar/soniya (barcha chatlar uchun)
+- Har bir chat uchun: shaxsiy chat - RATE_LIMIT_PER_CHAT/soniya, guruh/kanal - RATE_LIMIT_GROUP_PER_MINUTE/daqiqa
+- TelegramRetryAfter (429) kelsa shu chat bucketi to'xtatiladi va so'rov qayta yuboriladi;
+  umumiy bucket faqat bir necha turli chatdan qisqa vaqtda 429 kelsa to'xtatiladi (bot bo'yicha cheklov)
+- Ikki yo'lak (send_lane): interactive - foydalanuvchiga javoblar, bulk - reklama.
+  Interaktiv xabarlar umumiy chegaradan birinchi bo'lib oladi, bulk esa faqat ortib qolgan tokenlarni
+  (bucketda INTERACTIVE_HEADROOM zaxira qoldirib). Har yo'lak uchun kechikish (p50/p95) hisoblanadi
+- Faqat xabar yuboruvchi metodlar cheklanadi (getChatMember va boshqalar - yo'q)
+- aiogram session middleware sifatida o'rnatiladi: bot.session.middleware(rate_limiter)
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from collections import OrderedDict, deque
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+from config import (
+    RATE_LIMIT_GLOBAL, RATE_LIMIT_PER_CHAT, RATE_LIMIT_GROUP_PER_MINUTE, RATE_LIMIT_MAX_WAIT
+)
+
+# Bitta chatga ketma-ket yuborish mumkin bo'lgan xabarlar (kino + menyu va h.k.)
+CHAT_BURST = 3
+
+# Xotirada saqlanadigan chat bucketlari (LRU - uzoq ishlatilmaganlari to'la bo'ladi, tashlash xavfsiz)
+CHAT_BUCKETS_SIZE = 10000
+
+# RetryAfter dan keyin qayta urinishlar soni
+MAX_RETRIES = 3
+
+# Bot bo'yicha cheklov belgisi: GLOBAL_FLOOD_WINDOW soniya ichida GLOBAL_FLOOD_CHATS ta turli chatdan RetryAfter.
+# Bitta chatdagi 429 - shu chatning o'z chegarasi, butun botni to'xtatmaydi
+GLOBAL_FLOOD_CHATS = 3
+GLOBAL_FLOOD_WINDOW = 5.0
+
+# Xabar yuboruvchi metodlar (send* dan tashqari)
+LIMITED_METHODS = {'copyMessage', 'copyMessages', 'forwardMessage', 'forwardMessages'}
+
+# Yo'laklar: interaktiv javoblar ustun, bulk (reklama) - faqat ortib qolgan chegara
+LANE_INTERACTIVE = 'interactive'
+LANE_BULK = 'bulk'
+
+# Joriy vazifa yo'lagi - reklama ishchisi o'z vazifasida send_lane.set(LANE_BULK) qiladi
+send_lane = contextvars.ContextVar('send_lane', default=LANE_INTERACTIVE)
+
+# Umumiy bucketning interaktiv xabarlar uchun zaxirasi (ulushi) - bulk bu chegaradan pastga tushirmaydi
+INTERACTIVE_HEADROOM = 0.2
+
+# Kechikish foizlari uchun oxirgi so'rovlar soni (har yo'lak uchun)
+LATENCY_SAMPLES = 1000
+
+
+class TokenBucket:
+    """Token bucket - navbat tartibida (FIFO) token band qilinadi"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Bitta token band qilish - qancha kutish kerakligi (soniya)"""
+        now = time.monotonic()
+        self._refill(now)
+        # Token qarzga olinadi - keyingi so'rovlar o'z navbatini kutadi
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.paused_until - now)
+
+    def reserve_leftover(self, headroom: float) -> float:
+        """Ortib qolgan tokenni olish - bucketda headroom dan ortiq bo'lsa 0, aks holda kutish (token olinmaydi)"""
+        now = time.monotonic()
+        self._refill(now)
+        if self.paused_until > now:
+            return self.paused_until - now
+        missing = headroom + 1 - self.tokens
+        if missing > 0:
+            return missing / self.rate
+        self.tokens -= 1
+        return 0.0
+
+    def pause(self, seconds: float):
+        """RetryAfter - bucketni to'xtatish"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def remaining_pause(self) -> float:
+        """To'xtatilish tugashigacha qolgan vaqt"""
+        return self.paused_until - time.monotonic()
+
+
+class LaneStats:
+    """Yo'lak ko'rsatkichlari - so'rovlar soni va oxirgi LATENCY_SAMPLES ta kechikish"""
+
+    def __init__(self):
+        self.requests = 0
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def record(self, seconds: float):
+        self.requests += 1
+        self._latencies.append(seconds)
+
+    def percentile(self, share: float) -> float:
+        """Kechikish foizi (soniya)"""
+        if not self._latencies:
+            return 0.0
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+    def stats(self) -> dict:
+        return {
+            'requests': self.requests,
+            'p50_ms': round(self.percentile(0.5) * 1000, 1),
+            'p95_ms': round(self.percentile(0.95) * 1000, 1),
+            'max_ms': round(max(self._latencies, default=0.0) * 1000, 1)
+        }
+
+
+def is_group_chat(chat_id) -> bool:
+    """Guruh/kanal (manfiy ID yoki @username)"""
+    return isinstance(chat_id, str) or chat_id < 0
+
+
+class RateLimiter(BaseRequestMiddleware):
+    """Umumiy va chat bo'yicha cheklovlar, RetryAfter ni hisobga oladi"""
+
+    def __init__(self, global_rate: float, chat_rate: float, group_rate_per_minute: float, max_wait: float):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        # Bulk yo'lak kamida 1 token uchun joy qoldiradi (aks holda hech qachon yubora olmaydi)
+        self.headroom = min(global_rate * INTERACTIVE_HEADROOM, max(global_rate - 1, 0))
+        self._bulk_lock = asyncio.Lock()
+        self.lanes = {LANE_INTERACTIVE: LaneStats(), LANE_BULK: LaneStats()}
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate_per_minute / 60
+        self.max_wait = max_wait
+        self._chats = OrderedDict()
+        self._recent_retry_after = deque(maxlen=100)
+        self.waiting = 0
+        self.requests = 0
+        self.throttled = 0
+        self.retry_after = 0
+        self.wait_time = 0.0
+
+    def chat_bucket(self, chat_id) -> TokenBucket:
+        """Chat bucketi (LRU)"""
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            rate = self.group_rate if is_group_chat(chat_id) else self.chat_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, CHAT_BURST)
+            if len(self._chats) > CHAT_BUCKETS_SIZE:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
+
+    async def _wait(self, buckets: tuple):
+        """Barcha bucketlardan token olish (kerak bo'lsa kutish)"""
+        delay = max(bucket.reserve() for bucket in buckets)
+        if delay <= 0:
+            return
+        self.throttled += 1
+        self.waiting += 1
+        started = time.monotonic()
+        try:
+            # Kutish davomida bucket to'xtatilgan bo'lishi mumkin (RetryAfter)
+            while delay > 0:
+                await asyncio.sleep(delay)
+                delay = max(bucket.remaining_pause() for bucket in buckets)
+        finally:
+            self.waiting -= 1
+            self.wait_time += time.monotonic() - started
+
+    def _pause(self, chat_id, chat_bucket: TokenBucket, seconds: float):
+        """RetryAfter - shu chatni to'xtatish; bir necha chatda ketma-ket bo'lsa umumiy bucketni ham"""
+        chat_bucket.pause(seconds)
+        now = time.monotonic()
+        recent = self._recent_retry_after
+        recent.append((now, chat_id))
+        while recent and now - recent[0][0] > GLOBAL_FLOOD_WINDOW:
+            recent.popleft()
+        if len({chat for _, chat in recent}) >= GLOBAL_FLOOD_CHATS:
+            self.global_bucket.pause(seconds)
+
+    async def _wait_bulk(self):
+        """Umumiy chegaradan faqat ortib qolgan token (interaktiv zaxira saqlanadi), navbat tartibida"""
+        if not self._bulk_lock.locked() and self.global_bucket.reserve_leftover(self.headroom) <= 0:
+            return
+        self.throttled += 1
+        self.waiting += 1
+        started = time.monotonic()
+        try:
+            async with self._bulk_lock:
+                while (delay := self.global_bucket.reserve_leftover(self.headroom)) > 0:
+                    await asyncio.sleep(delay)
+        finally:
+            self.waiting -= 1
+            self.wait_time += time.monotonic() - started
+
+    async def __call__(self, make_request, bot, method):
+        api_method = method.__api_method__
+        chat_id = getattr(method, 'chat_id', None)
+        if chat_id is None or not (api_method.startswith('send') or api_method in LIMITED_METHODS):
+            return await make_request(bot, method)
+
+        lane = send_lane.get()
+        chat_bucket = self.chat_bucket(chat_id)
+        started = time.monotonic()
+        try:
+            for attempt in range(MAX_RETRIES + 1):
+                if lane == LANE_BULK:
+                    await self._wait((chat_bucket,))
+                    await self._wait_bulk()
+                else:
+                    await self._wait((self.global_bucket, chat_bucket))
+                self.requests += 1
+                try:
+                    return await make_request(bot, method)
+                except TelegramRetryAfter as e:
+                    self.retry_after += 1
+                    self._pause(chat_id, chat_bucket, e.retry_after)
+                    logging.warning(f"RetryAfter {e.retry_after}s ({api_method}, chat {chat_id})")
+                    if attempt == MAX_RETRIES or e.retry_after > self.max_wait:
+                        raise
+        finally:
+            # Kechikish - navbat kutish va Telegram javobi birga
+            self.lanes.get(lane, self.lanes[LANE_INTERACTIVE]).record(time.monotonic() - started)
+
+    def stats(self) -> dict:
+        """Cheklagich ko'rsatkichlari"""
+        return {
+            'waiting': self.waiting,
+            'requests': self.requests,
+            'throttled': self.throttled,
+            'retry_after': self.retry_after,
+            'wait_seconds': round(self.wait_time, 1),
+            'paused_seconds': round(max(0.0, self.global_bucket.remaining_pause()), 1),
+            'chats': len(self._chats),
+            'lanes': {lane: stats.stats() for lane, stats in self.lanes.items()}
+        }
+
+
+rate_limiter = RateLimiter(RATE_LIMIT_GLOBAL, RATE_LIMIT_PER_CHAT, RATE_LIMIT_GROUP_PER_MINUTE, RATE_LIMIT_MAX_WAIT)
+
+
+def get_rate_limit_stats() -> dict:
+    """Navbat chuqurligi va cheklash hisoblagichlari"""
+    return rate_limiter.stats()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Auditoriya segmentlari (reklama uchun)
+- Segment - mezonlar bo'yicha foydalanuvchilar to'plami: faollik oynasi, premium, qo'shilgan sana, referal
+  (mezonlar segments jadvalida JSON, SQL ga database.segment_condition o'giradi)
+- To'plam segment_members jadvalida (users.id), hajmi segments.size da - reklama sozlashda darhol ko'rinadi
+- Fon vazifasi segmentlarni SEGMENT_REFRESH_INTERVAL da bir marta yangilaydi:
+  users.id bo'laklari bo'yicha faqat farq (chiqqan va qo'shilgan a'zolar) yoziladi
+- Reklama segment bo'yicha yuborilganda statistics/premium_subscriptions qayta ko'rilmaydi
+"""
+
+import asyncio
+import logging
+import time
+
+from config import SEGMENT_REFRESH_INTERVAL
+from database import get_segments, refresh_segment
+
+# To'xtashda joriy bo'lakni tugatish uchun maksimal vaqt (soniya)
+STOP_TIMEOUT = 30
+
+
+class SegmentRefresher:
+    """Segmentlarni fonda davriy yangilash (bot ishga tushganda darhol)"""
+
+    def __init__(self, interval: float = 600):
+        self.interval = interval
+        self._stop = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        """Fon vazifasini ishga tushirish"""
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def _run(self):
+        while not self._stop.is_set():
+            try:
+                await self.refresh_all()
+            except Exception as e:
+                logging.exception(f"Segmentlarni yangilashda xatolik: {e}")
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def refresh_all(self):
+        """Barcha segmentlarni yangilash"""
+        for segment in await get_segments():
+            if self._stop.is_set():
+                return
+            started = time.monotonic()
+            changes = await refresh_segment(segment['key'], self._stop)
+            logging.debug(
+                f"Segment {segment['key']} yangilandi: {changes} ta o'zgarish, "
+                f"{time.monotonic() - started:.2f} s"
+            )
+
+    async def close(self):
+        """To'xtash - joriy bo'lak tugatiladi"""
+        if self._task is None:
+            return
+        self._stop.set()
+        try:
+            await asyncio.wait_for(self._task, STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logging.warning("Segment yangilanishi vaqtida tugamadi")
+        self._task = None
+
+
+segment_refresher = SegmentRefresher(SEGMENT_REFRESH_INTERVAL)
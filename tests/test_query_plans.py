@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+EXPLAIN QUERY PLAN tekshiruvlari - statistika va foydalanuvchi so'rovlari indekslardan foydalanadi
+- Sxema migrations.run_migrations bilan vaqtinchalik bazada quriladi
+- database.py dagi haqiqiy funksiyalar bajariladi, ular yuborgan SQL (trace) EXPLAIN QUERY PLAN bilan tekshiriladi
+
+Ishga tushirish:
+    python -m pytest -q tests
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import migrations
+
+INDEXES = (
+    'idx_statistics_watched_date',
+    'idx_statistics_movie_id',
+    'idx_statistics_user_date',
+    'idx_users_joined_date',
+    'idx_users_referred_by',
+    'idx_premium_subscriptions_user',
+    'idx_withdrawal_requests_status',
+)
+
+
+@pytest.fixture(scope='module')
+def db(tmp_path_factory):
+    """database moduli vaqtinchalik papkadagi bazada (DATABASE_NAME - nisbiy yo'l)"""
+    workdir = tmp_path_factory.mktemp('query_plans')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    import database
+    database.create_tables()
+    yield database
+    database.registry.close_all()
+    os.chdir(cwd)
+
+
+def traced(db, func, *args) -> list:
+    """Funksiyani bajarib, havza ulanishlarida bajarilgan SQL ni yig'ish"""
+    statements = []
+
+    async def run():
+        pool = db.ConnectionPool(db.DATABASE_NAME, 1)
+        open_connection = pool._open
+
+        async def open_traced():
+            conn = await open_connection()
+            await conn.set_trace_callback(statements.append)
+            return conn
+
+        pool._open = open_traced
+        saved, db.pool = db.pool, pool
+        try:
+            await func(*args)
+        finally:
+            db.pool = saved
+            await pool.close()
+
+    asyncio.run(run())
+    return [sql for sql in statements if not sql.lstrip().upper().startswith(('PRAGMA', 'BEGIN', 'COMMIT'))]
+
+
+def query_plan(db, sql: str) -> str:
+    """EXPLAIN QUERY PLAN natijasi (bitta satr)"""
+    conn = db.get_connection()
+    return ' | '.join(row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}'))
+
+
+def assert_uses_index(db, statements: list, table: str, index: str):
+    """Jadvalga tegishli har bir so'rov to'liq skanersiz, berilgan indeks orqali"""
+    relevant = [sql for sql in statements if f' {table}' in sql and not sql.lstrip().upper().startswith('INSERT')]
+    assert relevant, f"{table} bo'yicha so'rov bajarilmadi"
+    for sql in relevant:
+        plan = query_plan(db, sql)
+        assert f'SCAN {table}' not in plan, plan
+        assert ('USING INDEX' in plan or 'USING COVERING INDEX' in plan), plan
+        assert index in plan, plan
+
+
+def test_migrations_create_indexes(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'schema.db')
+    migrations.run_migrations(conn)
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    conn.close()
+    assert set(INDEXES) <= names
+
+
+def test_movie_code_lookup(db):
+    db.movie_cache.invalidate()
+    statements = traced(db, db.get_movie_by_code, '1234')
+    assert_uses_index(db, statements, 'movies', 'sqlite_autoindex_movies')
+
+
+def test_statistics_by_date(db):
+    statements = traced(db, db.get_today_views)
+    assert_uses_index(db, statements, 'statistics', 'idx_statistics_watched_date')
+
+
+def test_user_lookup(db):
+    statements = traced(db, db.add_user, 123456789, 'Test', None)
+    assert_uses_index(db, statements, 'users', 'sqlite_autoindex_users')
+
+
+@pytest.mark.parametrize('func', ('get_today_users', 'get_weekly_users'))
+def test_users_by_joined_date(db, func):
+    statements = traced(db, getattr(db, func))
+    assert_uses_index(db, statements, 'users', 'idx_users_joined_date')
+
+
+def test_daily_stats(db):
+    statements = traced(db, db.get_daily_stats, 2)
+    assert_uses_index(db, [sql for sql in statements if 'FROM users' in sql], 'users', 'idx_users_joined_date')
+    assert_uses_index(
+        db, [sql for sql in statements if 'FROM statistics' in sql], 'statistics', 'idx_statistics_watched_date'
+    )
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+O'zbek matnini qidiruv uchun normallashtirish
+- Kirill -> Lotin (ў -> o, ғ -> g, қ -> q, ҳ -> h, ...)
+- Apostrof variantlari (' ʻ ʼ ‘ ’ ` ´) olib tashlanadi: o'zbek = oʻzbek = ozbek
+- Kichik harflar
+"""
+
+import re
+
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo',
+    'ж': 'j', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'x', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sh', 'ъ': '',
+    'ы': 'i', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+    'ў': 'o', 'қ': 'q', 'ғ': 'g', 'ҳ': 'h',
+}
+
+APOSTROPHES = "'ʻʼ‘’`´"
+
+_TRANSLATION = str.maketrans({
+    **CYRILLIC_TO_LATIN,
+    **{char: '' for char in APOSTROPHES},
+})
+
+_WORD = re.compile(r'\w+')
+
+
+def normalize_text(text: str) -> str:
+    """Matnni qidiruv ko'rinishiga keltirish"""
+    if not text:
+        return ''
+    return str(text).lower().translate(_TRANSLATION)
+
+
+def search_terms(text: str) -> list:
+    """Normallashtirilgan so'zlar ro'yxati"""
+    return _WORD.findall(normalize_text(text))
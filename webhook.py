@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Webhook rejimi (aiohttp)
+- POST WEBHOOK_PATH - Telegram update lari (X-Telegram-Bot-Api-Secret-Token har doim tekshiriladi;
+  WEBHOOK_SECRET berilmasa har ishga tushishda tasodifiy kalit yaratiladi)
+- GET /health - holat, navbat, chiquvchi xabarlar cheklagichi va update boshiga DB so'rovlari ko'rsatkichlari
+- Update lar cheklangan navbatga qo'yiladi va HTTP javob darhol qaytadi;
+  ularni UPDATE_WORKERS ta ishchi qayta ishlaydi.
+  Navbat to'lsa 503 qaytariladi va Telegram update ni keyinroq qayta yuboradi.
+  aiogram SimpleRequestHandler ishlatilmaydi: u update ni so'rov ichida yoki cheklanmagan
+  fon vazifalarida qayta ishlaydi - bu yerda esa cheklangan navbat va 503 kerak
+- SIGTERM/SIGINT da server to'xtaydi, navbat bo'shatiladi va bot.py dagi yopish bloki ishlaydi
+
+Lokal test (WEBHOOK_URL bo'sh - Telegramda webhook o'rnatilmaydi):
+    BOT_MODE=webhook WEBHOOK_SECRET=test python bot.py
+    curl -X POST localhost:8080/webhook \\
+         -H "X-Telegram-Bot-Api-Secret-Token: test" \\
+         -H "Content-Type: application/json" -d @update.json
+"""
+
+import asyncio
+import hmac
+import logging
+import secrets
+import signal
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from config import (
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBAPP_HOST, WEBAPP_PORT,
+    UPDATE_WORKERS, UPDATE_QUEUE_SIZE
+)
+from middlewares import request_context
+from ratelimit import get_rate_limit_stats
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# To'xtashda navbatdagi update larni tugatish uchun maksimal vaqt (soniya)
+DRAIN_TIMEOUT = 10
+
+
+class UpdateQueue:
+    """Cheklangan update navbati va ishchilar"""
+
+    def __init__(self, dp: Dispatcher, bot: Bot, workers: int = 8, maxsize: int = 1000):
+        self.dp = dp
+        self.bot = bot
+        self.workers = workers
+        self._queue = asyncio.Queue(maxsize)
+        self._tasks = []
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self):
+        """Ishchilarni ishga tushirish"""
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    def put(self, update: Update) -> bool:
+        """Update ni navbatga qo'yish - navbat to'la bo'lsa False"""
+        try:
+            self._queue.put_nowait(update)
+            return True
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+
+    async def _worker(self):
+        """Navbatdan update olib dispatcher ga uzatish"""
+        while True:
+            update = await self._queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logging.exception(f"Update {update.update_id} xatolik bilan tugadi: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def close(self):
+        """Navbatni bo'shatish (DRAIN_TIMEOUT gacha) va ishchilarni to'xtatish"""
+        try:
+            await asyncio.wait_for(self._queue.join(), DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logging.warning(f"Navbatda {self._queue.qsize()} ta update qayta ishlanmay qoldi")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        """Navbat ko'rsatkichlari"""
+        return {
+            'queued': self._queue.qsize(),
+            'capacity': self._queue.maxsize,
+            'workers': self.workers,
+            'processed': self.processed,
+            'failed': self.failed,
+            'rejected': self.rejected
+        }
+
+
+def create_app(bot: Bot, updates: UpdateQueue, secret: str) -> web.Application:
+    """aiohttp ilovasi: webhook va health endpointlari (secret - majburiy maxfiy kalit)"""
+    if not secret:
+        raise ValueError("Webhook maxfiy kaliti bo'sh bo'lmasligi kerak")
+
+    async def handle_update(request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), secret):
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": bot})
+        except Exception as e:
+            logging.warning(f"Noto'g'ri update: {e}")
+            return web.Response(status=400)
+        if not updates.put(update):
+            return web.Response(status=503)
+        return web.Response()
+
+    async def handle_health(request: web.Request) -> web.Response:
+        return web.json_response({
+            'status': 'ok', **updates.stats(),
+            'rate_limit': get_rate_limit_stats(),
+            'db_round_trips': request_context.stats()
+        })
+
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, handle_update)
+    app.router.add_get("/health", handle_health)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """Webhook serverini ishga tushirish (SIGTERM/SIGINT kelguncha ishlaydi)"""
+    secret = WEBHOOK_SECRET
+    if not secret:
+        # Kalitsiz webhook ga istalgan kishi soxta update (masalan, admin nomidan) yubora oladi
+        secret = secrets.token_urlsafe(32)
+        logging.warning(
+            "WEBHOOK_SECRET berilmagan - tasodifiy kalit yaratildi (lokal test uchun WEBHOOK_SECRET ni o'rnating)"
+        )
+
+    updates = UpdateQueue(dp, bot, UPDATE_WORKERS, UPDATE_QUEUE_SIZE)
+    updates.start()
+
+    runner = web.AppRunner(create_app(bot, updates, secret))
+    await runner.setup()
+    await web.TCPSite(runner, WEBAPP_HOST, WEBAPP_PORT).start()
+    logging.info(f"🌐 Webhook server: {WEBAPP_HOST}:{WEBAPP_PORT}{WEBHOOK_PATH}")
+
+    if WEBHOOK_URL:
+        # Faqat ishlatiladigan update turlari (chat_member ham shu yerda so'raladi)
+        await bot.set_webhook(
+            WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=secret,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+        logging.info("✅ Telegram webhook o'rnatildi")
+    else:
+        logging.info("WEBHOOK_URL berilmagan - Telegramda webhook o'rnatilmadi (lokal rejim)")
+
+    # Railway/Docker konteynerni SIGTERM bilan to'xtatadi - yopish bloklari ishlashi uchun signal ushlanadi
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    handled_signals = []
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+            handled_signals.append(sig)
+        except (NotImplementedError, RuntimeError):
+            # Windows - faqat KeyboardInterrupt
+            pass
+
+    try:
+        await stop.wait()
+        logging.info("To'xtash signali - webhook server to'xtatilmoqda")
+    finally:
+        for sig in handled_signals:
+            loop.remove_signal_handler(sig)
+        # Avval yangi so'rovlar qabul qilinmaydi, keyin navbat bo'shatiladi.
+        # Webhook o'chirilmaydi - yangi nusxa ishga tushayotgan bo'lishi mumkin
+        await runner.cleanup()
+        await updates.close()